@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the import time of pykit modules, each in a fresh interpreter:
+
+    $ python benchmarks/bench_import.py
+    $ python benchmarks/bench_import.py --check
+
+Heavy dependencies (llvmpy, llvmmath, NumPy, networkx, pycparser) are
+imported on first use. With --check, exit with status 1 if importing a
+module and building an environment loads any of them.
+"""
+
+from __future__ import print_function, division, absolute_import
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+modules = [
+    'pykit',
+    'pykit.types',
+    'pykit.ir',
+    'pykit.ir.interp',
+    'pykit.analysis.cfa',
+    'pykit.environment',
+]
+
+heavy = ['llvm', 'llvmmath', 'numpy', 'networkx', 'pykit.deps.pycparser',
+         'pykit.deps.pycparser_special']
+
+worker = """
+import sys, time, json
+t = time.time()
+import %(module)s
+if %(module)r == 'pykit.environment':
+    pykit.environment.fresh_env()
+t = time.time() - t
+print(json.dumps([t, [m for m in %(heavy)r if m in sys.modules]]))
+"""
+
+def measure(module, repeat):
+    """Return the best import time, and the heavy modules it imports"""
+    times = []
+    for i in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, "-c", worker % dict(module=module, heavy=heavy)],
+            cwd=root)
+        t, loaded = json.loads(output.decode('ascii'))
+        times.append(t)
+    return min(times), loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    status = 0
+    print("%-22s %10s  %s" % ("module", "time (ms)", "heavy imports"))
+    for module in modules:
+        t, loaded = measure(module, args.repeat)
+        print("%-22s %10.1f  %s" % (module, t * 1000, ", ".join(loaded)))
+        if loaded:
+            status = 1
+
+    if args.check:
+        sys.exit(status)
+
+if __name__ == '__main__':
+    main()
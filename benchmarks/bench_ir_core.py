@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the IR core (pykit.adt.linkedlist and pykit.ir.value), comparing
+the Cython extensions built by setup.py with the pure Python modules:
+
+    $ python setup.py build_ext --inplace
+    $ python benchmarks/bench_ir_core.py
+
+Workloads:
+
+    build:      construct functions with the Builder
+    copy:       copy functions (op creation, use tracking)
+    passes:     SSA construction, SCCP and DCE on functions with loops
+"""
+
+from __future__ import print_function, division, absolute_import
+
+import os
+import sys
+import imp
+import json
+import timeit
+import argparse
+import subprocess
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+core_modules = ['pykit.adt.linkedlist', 'pykit.ir.value']
+
+class PureImporter(object):
+    """Import the pure Python versions of the IR core modules"""
+
+    def find_module(self, fullname, path=None):
+        if fullname in core_modules:
+            return self
+
+    def load_module(self, fullname):
+        filename = os.path.join(root, *fullname.split('.')) + '.py'
+        return imp.load_source(fullname, filename)
+
+#===------------------------------------------------------------------===
+# Workloads
+#===------------------------------------------------------------------===
+
+source = """
+#include <pykit_ir.h>
+
+Int32 f(Int32 n) {
+    Int32 i, j, x, y, sum;
+    sum = 0;
+    x = 2;
+    y = 3;
+    for (i = 0; i < n; i = i + 1) {
+        for (j = 0; j < i; j = j + 1) {
+            if (x < y)
+                sum = sum + i * j;
+            else
+                sum = sum - x * y;
+        }
+        sum = sum + x;
+    }
+    return sum;
+}
+"""
+
+def build(nblocks=100, nops=100):
+    from pykit import types
+    from pykit.ir import Function, Builder, Const
+
+    func = Function("f", ["a"], types.Function(types.Int32, [types.Int32],
+                                               False))
+    b = Builder(func)
+    value = func.get_arg("a")
+    for i in range(nblocks):
+        block = func.new_block("block")
+        b.position_at_end(block)
+        for j in range(nops):
+            value = b.add(value, Const(j, types.Int32))
+    return func
+
+def workloads():
+    from pykit.parsing import from_c
+    from pykit.ir import copy_function
+    from pykit.analysis import cfa
+    from pykit.optimizations import sccp
+    from pykit.transform import dce
+
+    func = build()
+    cfunc = from_c(source).get_function("f")
+
+    def passes():
+        f, _ = copy_function(cfunc)
+        cfa.run(f)
+        sccp.run(f)
+        dce.run(f)
+
+    return [
+        ("build",  build),
+        ("copy",   lambda: copy_function(func)),
+        ("passes", passes),
+    ]
+
+def run_workloads(repeat, number):
+    import pykit.ir.value
+    compiled = not pykit.ir.value.__file__.endswith(('.py', '.pyc', '.pyo'))
+    times = dict((name, min(timeit.repeat(f, repeat=repeat, number=number)))
+                     for name, f in workloads())
+    return compiled, times
+
+#===------------------------------------------------------------------===
+# Driver
+#===------------------------------------------------------------------===
+
+def measure(pure, repeat, number):
+    args = [sys.executable, __file__, "--worker",
+            "--repeat", str(repeat), "--number", str(number)]
+    if pure:
+        args.append("--pure")
+    return json.loads(subprocess.check_output(args).decode('ascii'))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--number", type=int, default=5)
+    parser.add_argument("--pure", action="store_true")
+    parser.add_argument("--worker", action="store_true")
+    args = parser.parse_args()
+
+    if args.worker:
+        if args.pure:
+            sys.meta_path.insert(0, PureImporter())
+        print(json.dumps(run_workloads(args.repeat, args.number)))
+        return
+
+    compiled, times = measure(False, args.repeat, args.number)
+    if not compiled:
+        print("The IR core is not compiled, run "
+              "'python setup.py build_ext --inplace' first.")
+    _, pure_times = measure(True, args.repeat, args.number)
+
+    print("%-10s %12s %12s %10s" % ("workload", "pure (s)", "compiled (s)",
+                                    "speedup"))
+    for name, _ in sorted(times.items()):
+        print("%-10s %12.4f %12.4f %9.2fx" % (
+            name, pure_times[name], times[name], pure_times[name] / times[name]))
+
+if __name__ == '__main__':
+    main()
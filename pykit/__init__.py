@@ -2,7 +2,6 @@
 from __future__ import print_function, division, absolute_import
 
 from os.path import dirname, abspath
-import unittest
 #from . import types
 
 from pykit.configuration import config
@@ -20,6 +19,8 @@ pattern = "test_*.py"
 
 def test(root=root, pattern=pattern):
     """Run tests and return exit status"""
+    import unittest
+
     tests =  unittest.TestLoader().discover(root, pattern=pattern)
     runner = unittest.TextTestRunner()
     result = runner.run(tests)
@@ -81,23 +81,49 @@ class LinkedList(object):
         return self._tail._prev if self._tail._prev is not self._head else None
 
     def iter_inplace(self, from_op=None):
+        """
+        Iterate over the items (starting at `from_op`) without copying the
+        list. The next item is looked up before the current item is yielded,
+        so the current item may be removed or moved to another list during
+        iteration, and items inserted directly after it are not visited.
+        Removing the next item is supported as long as the current item stays
+        in the list. For other modifications iterate over a snapshot().
+        """
         cur = from_op or self._head._next
         end = self._tail
         while cur is not end:
-            cur_next = cur._next # 'cur' may be deleted before we advance
+            next_item = cur._next
             yield cur
-            cur = cur._next or cur_next
+            if next_item._prev is None and cur._next is not None:
+                # The next item was removed, continue after the current item
+                next_item = cur._next
+            cur = next_item
+
+    def iter_reversed(self, from_op=None):
+        """Iterate backwards over the items, see iter_inplace()"""
+        cur = from_op or self._tail._prev
+        end = self._head
+        while cur is not end:
+            prev_item = cur._prev
+            yield cur
+            if prev_item._next is None and cur._prev is not None:
+                prev_item = cur._prev
+            cur = prev_item
+
+    def snapshot(self):
+        """Return a list of the items"""
+        return list(self.iter_inplace())
 
-    def __iter__(self, from_op=None):
-        return iter(list(self.iter_inplace(from_op)))
+    iter_from = iter_inplace
 
-    iter_from = __iter__
+    def __iter__(self):
+        return self.iter_inplace()
 
     def __len__(self):
         return self.size
 
     def __reversed__(self):
-        return reversed(iter(self))
+        return self.iter_reversed()
 
     def __repr__(self):
         return "LinkedList([%s])" % ", ".join(map(repr, self))
\ No newline at end of file
@@ -21,4 +21,41 @@ class TestADT(unittest.TestCase):
         expected = ["head", 0, 1, "foo", 2, "bar", 3, 5, "tail"]
         expected = [LinkableItem(x) for x in expected]
         got = list(l)
-        self.assertEqual(got, expected)
\ No newline at end of file
+        self.assertEqual(got, expected)
+
+    def test_reversed(self):
+        items = [LinkableItem(i) for i in range(5)]
+        l = LinkedList(items)
+        self.assertEqual(list(reversed(l)), items[::-1])
+        self.assertEqual(list(reversed(LinkedList())), [])
+
+    def test_remove_while_iterating(self):
+        items = [LinkableItem(i) for i in range(6)]
+        l = LinkedList(items)
+        seen = []
+        for item in l:
+            seen.append(item.data)
+            if item.data % 2 == 0:
+                l.remove(item)              # remove current item
+            if item.data == 3:
+                l.remove(items[4])          # remove next item
+        self.assertEqual(seen, [0, 1, 2, 3, 5])
+        self.assertEqual([item.data for item in l], [1, 3, 5])
+
+        seen = []
+        for item in reversed(l):
+            seen.append(item.data)
+            l.remove(item)
+        self.assertEqual(seen, [5, 3, 1])
+        self.assertEqual(len(l), 0)
+
+    def test_insert_while_iterating(self):
+        items = [LinkableItem(i) for i in range(3)]
+        l = LinkedList(items)
+        seen = []
+        for item in l:
+            seen.append(item.data)
+            l.insert_after(LinkableItem(item.data + 10), item)
+        self.assertEqual(seen, [0, 1, 2])
+        self.assertEqual([item.data for item in l.snapshot()],
+                         [0, 10, 1, 11, 2, 12])
@@ -6,13 +6,13 @@ Build a call graph.
 
 from pykit import ir
 
-import networkx as nx
-
 def callgraph(func, graph=None, seen=None):
     """
-    Eliminate dead code.
+    Build the call graph of `func` as a networkx.DiGraph.
     """
     if seen is None:
+        import networkx as nx
+
         seen = set()
         graph = nx.DiGraph()
 
@@ -29,4 +29,15 @@ def callgraph(func, graph=None, seen=None):
                 graph.add_edge(func, callee)
                 callgraph(callee, graph, seen)
 
-    return graph
\ No newline at end of file
+    return graph
+
+def bottom_up(graph):
+    """
+    Return the strongly connected components of a call graph ([[Function]]),
+    callees before their callers.
+    """
+    import networkx as nx
+
+    sccs = [list(scc) for scc in nx.strongly_connected_components(graph)]
+    dag = nx.condensation(graph, sccs)
+    return [sccs[i] for i in reversed(list(nx.topological_sort(dag)))]
@@ -9,15 +9,14 @@ from __future__ import print_function, division, absolute_import
 import collections
 
 from pykit.ir import ops, Builder, Undef, Op, blocks
-from pykit.transform import dce
-from pykit.utils import mergedicts
-
-import networkx as nx
+from pykit.analysis import dominators
 
 #===------------------------------------------------------------------===
 # Data Flow
 #===------------------------------------------------------------------===
 
+preserves = ("callgraph",)
+
 def run(func, env=None):
     CFG = cfg(func)
     ssa(func, CFG)
@@ -27,17 +26,129 @@ def ssa(func, cfg):
     # transpose_cfg = cfg.reverse() # reverse edges
     allocas = find_allocas(func)
     move_allocas(func, allocas)
-    phis = insert_phis(func, cfg, allocas)
-    compute_dataflow(func, cfg, allocas, phis)
+    domtree = dominators.dominator_tree(func, cfg)
+    phis = insert_phis(func, cfg, allocas, domtree)
+    compute_dataflow(func, cfg, allocas, phis, domtree)
     prune_phis(func, phis)
     simplify(func, cfg)
     return phis
 
+#===------------------------------------------------------------------===
+# Control Flow Graph
+#===------------------------------------------------------------------===
+
+class CFG(object):
+    """
+    Control flow graph of basic blocks. Blocks are numbered densely in the
+    order they are added, and the predecessor and successor lists are kept
+    in arrays indexed by block number:
+
+        blocks:     [Block]             block number -> Block (None if removed)
+        index:      { Block : int }     Block -> block number
+
+    The graph supports the subset of the networkx.DiGraph interface used by
+    the passes, use to_networkx() to get a real networkx graph.
+    """
+
+    def __init__(self, blocks=()):
+        self.blocks = []
+        self.index = {}
+        self._succs = []
+        self._preds = []
+        for block in blocks:
+            self.add_node(block)
+
+    # __________________________________________________________________
+    # Updates
+
+    def add_node(self, block):
+        if block not in self.index:
+            self.index[block] = len(self.blocks)
+            self.blocks.append(block)
+            self._succs.append([])
+            self._preds.append([])
+
+    def remove_node(self, block):
+        """Remove a block and all its incident edges"""
+        for succ in self.successors(block):
+            self.remove_edge(block, succ)
+        for pred in self.predecessors(block):
+            self.remove_edge(pred, block)
+
+        i = self.index.pop(block)
+        self.blocks[i] = None
+
+    def add_edge(self, src, dst):
+        self.add_node(src)
+        self.add_node(dst)
+        succs = self._succs[self.index[src]]
+        if dst not in succs:
+            succs.append(dst)
+            self._preds[self.index[dst]].append(src)
+
+    def remove_edge(self, src, dst):
+        if not self.has_edge(src, dst):
+            raise ValueError("Edge %s -> %s is not in the CFG" % (src, dst))
+        self._succs[self.index[src]].remove(dst)
+        self._preds[self.index[dst]].remove(src)
+
+    # __________________________________________________________________
+    # Queries
+
+    def has_edge(self, src, dst):
+        return src in self.index and dst in self._succs[self.index[src]]
+
+    def predecessors(self, block):
+        return list(self._preds[self.index[block]])
+
+    def successors(self, block):
+        return list(self._succs[self.index[block]])
+
+    neighbors = successors
+
+    def nodes(self):
+        return list(self)
+
+    def edges(self):
+        return [(block, succ) for block in self for succ in self[block]]
+
+    def __getitem__(self, block):
+        """Successors of `block`, this list must not be modified"""
+        return self._succs[self.index[block]]
+
+    def __iter__(self):
+        return (block for block in self.blocks if block is not None)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, block):
+        return block in self.index
+
+    # __________________________________________________________________
+
+    def to_networkx(self):
+        """Export the CFG as a networkx.DiGraph"""
+        import networkx as nx
+
+        graph = nx.DiGraph()
+        graph.add_nodes_from(self)
+        graph.add_edges_from(self.edges())
+        return graph
+
+    def view(self):
+        import networkx as nx
+        import matplotlib.pyplot as plt
+
+        nx.draw(self.to_networkx())
+        plt.draw()
+
+
 def cfg(func, view=False, exceptions=True):
     """
     Compute the control flow graph for `func`
     """
-    cfg = nx.DiGraph()
+    cfg = CFG(func.blocks)
 
     for block in func.blocks:
         # -------------------------------------------------
@@ -54,16 +165,13 @@ def cfg(func, view=False, exceptions=True):
                 targets.extend(exc_handlers)
 
         # -------------------------------------------------
-        # Add node and edges to CFG
+        # Add edges to CFG
 
-        cfg.add_node(block)
         for target in targets:
             cfg.add_edge(block, target)
 
     if view:
-        import matplotlib.pyplot as plt
-        nx.draw(cfg)
-        plt.draw()
+        cfg.view()
 
     return cfg
 
@@ -98,109 +206,188 @@ def move_allocas(func, allocas):
     """Move all allocas to the start block"""
     builder = Builder(func)
     builder.position_at_beginning(func.startblock)
-    for alloca in allocas:
+    for alloca in [op for op in func.ops if op in allocas]:
         if alloca.block != func.startblock:
             alloca.unlink()
             builder.emit(alloca)
 
-def insert_phis(func, cfg, allocas):
-    """Insert φs in the function given the set of promotable stack variables"""
+def find_defs_and_uses(func, allocas):
+    """
+    Find the blocks that store to each alloca, and the blocks that load from
+    an alloca before storing to it (i.e. where the value flows in from a
+    predecessor).
+
+    :return: ({ alloca : set(Block) }, { alloca : set(Block) })
+    """
+    defblocks = dict((alloca, set()) for alloca in allocas)
+    useblocks = dict((alloca, set()) for alloca in allocas)
+
+    for block in func.blocks:
+        stored = set()
+        for op in block.ops:
+            if op.opcode == 'load' and op.args[0] in allocas:
+                alloca, = op.args
+                if alloca not in stored:
+                    useblocks[alloca].add(block)
+            elif op.opcode == 'store' and op.args[1] in allocas:
+                value, alloca = op.args
+                stored.add(alloca)
+                defblocks[alloca].add(block)
+
+    return defblocks, useblocks
+
+def live_in_blocks(cfg, defblocks, useblocks):
+    """
+    Compute the set of blocks where a variable is live on entry, given the
+    blocks that define it and the blocks that use it before any definition.
+    """
+    live = set(useblocks)
+    worklist = list(useblocks)
+    while worklist:
+        block = worklist.pop()
+        for pred in cfg.predecessors(block):
+            if pred not in live and pred not in defblocks:
+                live.add(pred)
+                worklist.append(pred)
+
+    return live
+
+def insert_phis(func, cfg, allocas, domtree=None):
+    """
+    Insert φs in the function given the set of promotable stack variables.
+
+    Phis are placed on the iterated dominance frontier of the blocks storing
+    to a variable, but only where the variable is live (pruned SSA).
+    """
+    if domtree is None:
+        domtree = dominators.dominator_tree(func, cfg)
+
     builder = Builder(func)
     phis = {} # phi -> alloca
-    for block in func.blocks:
-        if len(cfg.predecessors(block)) > 1:
-            with builder.at_front(block):
-                for alloca in allocas:
+    defblocks, useblocks = find_defs_and_uses(func, allocas)
+
+    # Visit allocas in program order, for deterministic output
+    for alloca in [op for op in func.ops if op in allocas]:
+        # The alloca itself defines the variable (as Undef) in the start block
+        defs = defblocks[alloca] | set([func.startblock])
+        live = live_in_blocks(cfg, defs, useblocks[alloca])
+        for block in domtree.iterated_frontier(defs):
+            if block in live:
+                with builder.at_front(block):
                     phi = builder.phi(alloca.type.base, [], [])
-                    phis[phi] = alloca
+                phis[phi] = alloca
 
     return phis
 
-def compute_dataflow(func, cfg, allocas, phis):
+def compute_dataflow(func, cfg, allocas, phis, domtree=None):
     """
     Compute the data flow by eliminating load and store ops (given allocas set)
 
+    Blocks are renamed in dominator tree order, so the value of a variable on
+    entry to a block is the value leaving its immediate dominator, unless a
+    phi was placed for the variable.
+
     :param allocas: set of alloca variables to optimize ({Op})
     :param phis:    { φ Op -> alloca }
     """
-    values = collections.defaultdict(dict) # {block : { stackvar : value }}
+    if domtree is None:
+        domtree = dominators.dominator_tree(func, cfg)
 
-    # Track block values and delete load/store
-    for block in func.blocks:
-        # Copy predecessor outgoing values into current block values
-        preds = cfg.predecessors(block)
-        predvars = [values[pred] for pred in preds]
-        blockvars = mergedicts(*predvars)
+    undefs = dict((alloca, Undef(alloca.type.base)) for alloca in allocas)
+    blockphis = collections.defaultdict(list)   # { block : [φ] }
+    incoming = collections.defaultdict(dict)    # { φ : { pred : value } }
+    for phi, alloca in phis.items():
+        blockphis[phi.block].append(phi)
 
+    def rename(block, values, undo):
         for op in block.ops:
-            if op.opcode == 'alloca' and op in allocas:
-                # Initialize to Undefined
-                blockvars[op] = Undef(op.type.base)
-            elif op.opcode == 'load' and op.args[0] in allocas:
+            if op.opcode == 'load' and op.args[0] in allocas:
                 # Replace load with value
                 alloca, = op.args
-                op.replace_uses(blockvars[alloca])
+                op.replace_uses(values[alloca])
                 op.delete()
             elif op.opcode == 'store' and op.args[1] in allocas:
                 # Delete store and register result
                 value, alloca = op.args
-                blockvars[alloca] = value
+                undo.append((alloca, values[alloca]))
+                values[alloca] = value
                 op.delete()
             elif op.opcode == 'phi' and op in phis:
                 alloca = phis[op]
-                blockvars[alloca] = op
-
-        values[block] = blockvars
+                undo.append((alloca, values[alloca]))
+                values[alloca] = op
+
+        # Record values leaving this block for successor phis
+        for succ in cfg[block]:
+            for phi in blockphis[succ]:
+                incoming[phi][block] = values[phis[phi]]
+
+    # Walk the dominator tree, undoing the definitions of a block after
+    # all blocks it dominates have been renamed
+    values = dict(undefs)
+    stack = [domtree.root]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            for alloca, value in reversed(item):
+                values[alloca] = value
+        else:
+            undo = []
+            rename(item, values, undo)
+            stack.append(undo)
+            stack.extend(reversed(domtree.children[item]))
+
+    # Unreachable blocks see undefined values on entry
+    for block in func.blocks:
+        if block not in domtree:
+            rename(block, dict(undefs), [])
 
     # Update phis incoming values
     for phi in phis:
-        preds = list(cfg.predecessors(phi.block))
-        incoming = []
-        for block in preds:
-            alloca = phis[phi]
-            value = values[block][alloca] # value leaving predecessor block
-            incoming.append(value)
-
-        phi.set_args([preds, incoming])
+        preds = cfg.predecessors(phi.block)
+        phi.set_args([preds, [incoming[phi][pred] for pred in preds]])
 
     # Remove allocas
     for alloca in allocas:
         alloca.delete()
 
 def prune_phis(func, phis):
-    """Delete unnecessary phis (all incoming values equivalent)"""
-    # TODO: Exploit sparsity
-    changed = True
-    while changed:
-        changed = _prune_phis(func, phis)
+    """
+    Delete unnecessary phis (unused, or all incoming values equivalent).
+    Deleting a phi may make its operands or users prunable, so these are
+    revisited through a worklist.
+    """
+    worklist = [op for op in func.ops if op.opcode == 'phi']
+    deleted = set()
 
-    prune_undef(func, phis)
+    while worklist:
+        phi = worklist.pop()
+        if phi in deleted:
+            continue
 
-def _prune_phis(func, phis):
-    changed = []
+        blocks, values = phi.args
+        users = func.uses[phi] - set([phi])
+        incoming = set(values) - set([phi])
+
+        if not users:
+            replacement = None
+        elif len(incoming) == 1:
+            [replacement] = incoming
+        else:
+            continue
+
+        worklist.extend(v for v in incoming
+                            if isinstance(v, Op) and v.opcode == 'phi')
+        if replacement is not None:
+            worklist.extend(u for u in users if u.opcode == 'phi')
+            phi.replace_uses(replacement)
 
-    def delete(op):
-        op.delete()
-        changed.append(op)
-        if op in phis:
-            # Pruning newly introduced phi, delete from phi map
-            del phis[op]
+        phi.set_args([])
+        phi.delete()
+        deleted.add(phi)
+        phis.pop(phi, None)
 
-    for op in func.ops:
-        if op.opcode == 'phi':
-            blocks, args = op.args
-            if not func.uses[op]:
-                delete(op)
-            elif len(set(args)) == 1:
-                [arg] = set(args)
-                op.replace_uses(arg)
-                delete(op)
-            elif len(args) == 2 and op in args:
-                [arg] = set(args) - set([op])
-                op.replace_uses(arg)
-                delete(op)
-
-    return bool(changed)
+    prune_undef(func, phis)
 
 def candidate(v):
     return isinstance(v, Undef) or (isinstance(v, Op) and v.opcode == 'phi')
@@ -216,22 +403,23 @@ def prune_undef(func, phis):
         if all(candidate(val) for val in values):
             candidates.add(phi)
 
-    n = 0
-    while n != len(candidates):
-        n = len(candidates)
-        for phi in list(candidates):
-            blocks, values = phi.args
-            for v in values:
-                if isinstance(v, Op):
-                    assert v.opcode == 'phi'
-                    if v not in candidates:
-                        candidates.remove(phi)
-                        break
+    # Drop phis that depend on a non-candidate phi, and revisit their users
+    worklist = list(candidates)
+    while worklist:
+        phi = worklist.pop()
+        blocks, values = phi.args
+        if phi in candidates and any(isinstance(v, Op) and v not in candidates
+                                         for v in values):
+            candidates.remove(phi)
+            worklist.extend(u for u in func.uses[phi] if u in candidates)
 
     for phi in candidates:
         phi.set_args([])
     for phi in candidates:
+        if phi.uses:
+            phi.replace_uses(Undef(phi.type))
         phi.delete()
+        del phis[phi]
 
 # ______________________________________________________________________
 
@@ -244,29 +432,13 @@ def compute_dominators(func, cfg):
 
         dominators(root) = {root}
         dominators(x) = {x} ∪ (∩ dominators(y) for y ∈ preds(x))
-    """
-    dominators = collections.defaultdict(set) # { block : {dominators} }
-
-    # Initialize
-    dominators[func.startblock] = set([func.startblock])
-    for block in func.blocks:
-        dominators[block] = set(func.blocks)
-
-    blocks = list(cfg)
-    preds = dict((block, cfg.predecessors(block)) for block in blocks)
 
-    # Solve equation
-    changed = True
-    while changed:
-        changed = False
-        for block in blocks:
-            pred_doms = [dominators[pred] for pred in preds[block]]
-            new_doms = set([block]) | set.intersection(*pred_doms or [set()])
-            if new_doms != dominators[block]:
-                dominators[block] = new_doms
-                changed = True
-
-    return dominators
+    This materializes a set for every block, use
+    pykit.analysis.dominators.dominator_tree() for dominance queries instead.
+    """
+    domtree = dominators.dominator_tree(func, cfg)
+    return dict((block, set(domtree.dominators(block)))
+                    for block in func.blocks)
 
 #===------------------------------------------------------------------===
 # Control Flow Simplification
@@ -287,7 +459,7 @@ def simplify(func, cfg):
     Simplify control flow. Merge consecutive blocks where the parent has one
     child, the child one parent, and both have compatible instruction leaders.
     """
-    for block in reversed(list(func.blocks)):
+    for block in reversed(func.blocks):
         if (len(cfg.predecessors(block)) == 1 and not
                 any(l.opcode in unmergable for l in block.leaders)):
             [pred] = cfg.predecessors(block)
@@ -297,9 +469,8 @@ def simplify(func, cfg):
                 blocks.patch_phis(block, pred, successors)
                 del_phis(block)
                 merge_blocks(func, pred, block)
-                cfg.remove_edge(pred, block)
+                cfg.remove_node(block)
                 for succ in successors:
-                    cfg.remove_edge(block, succ)
                     cfg.add_edge(pred, succ)
 
 
@@ -328,8 +499,13 @@ def delete_blocks(func, cfg, deadblocks):
     """
     Remove unreachable code blocks listed by `deadblocks`.
     """
+    from pykit.transform import adce
+
     for block in deadblocks:
         func.del_block(block)
+        for op in block:
+            # Drop the uses of values from the dead code
+            op.set_args([])
         for succ in cfg.successors(block):
             # Remove CFG edge from dead block to successor
             cfg.remove_edge(block, succ)
@@ -344,5 +520,7 @@ def delete_blocks(func, cfg, deadblocks):
                         values.pop(idx)
                     leader.set_args([blocks, values])
 
-    dce.dce(func)
+        cfg.remove_node(block)
+
+    adce.adce(func)
     simplify(func, cfg)
\ No newline at end of file
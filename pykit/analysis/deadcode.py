@@ -4,12 +4,16 @@
 Identify dead code for elimination.
 """
 
+from pykit.ir import Operation
+from pykit.utils import flatten
+
 effect_free = set([
     'alloca', 'load', 'new_exc', 'phi',
     'ptrload', 'ptrcast', 'ptr_isnull', 'getfield', 'getindex',
     'add', 'sub', 'mul', 'div', 'mod', 'lshift', 'rshift', 'bitand', 'bitor',
     'bitxor', 'invert', 'not_', 'uadd', 'usub', 'eq', 'ne', 'lt', 'le',
-    'gt', 'ge', 'addressof',
+    'gt', 'ge', 'addressof', 'sizeof', 'convert', 'bitcast', 'ptradd',
+    'extractfield', 'insertfield',
 ])
 
 def identify_dead_ops(func):
@@ -21,3 +25,54 @@ def identify_dead_ops(func):
         if op.opcode in effect_free and len(func.uses[op]) == 0:
             dead.add(op)
     return dead
+
+# Opcodes that are live only if the code they control is live
+branches = set(['jump', 'cbranch'])
+
+def find_live_ops(func, cfg=None, postdominators=None):
+    """
+    Find the live operations of `func`, starting from operations with side
+    effects and propagating liveness through operands. Dead cycles of phis
+    are never marked live.
+
+    With a post-dominator tree, branches are live only if a live operation
+    is control dependent on them, i.e. if its block is in the post-dominance
+    frontier of the branch. Without, all branches are live.
+    """
+    live = set()
+    liveblocks = set()
+    worklist = []
+
+    def mark(op):
+        if op not in live:
+            live.add(op)
+            worklist.append(op)
+
+    for block in func.blocks:
+        for op in block:
+            if op.opcode not in effect_free and op.opcode not in branches:
+                mark(op)
+
+        if postdominators is None or block not in postdominators or any(
+                succ not in postdominators for succ in cfg[block]):
+            # Blocks that cannot reach the exit keep their control flow
+            mark(block.terminator)
+
+    while worklist:
+        op = worklist.pop()
+        for arg in flatten(op.args):
+            if isinstance(arg, Operation):
+                mark(arg)
+
+        if op.opcode == 'phi':
+            # The incoming edges decide the value
+            for pred in op.args[0]:
+                mark(pred.terminator)
+
+        block = op.block
+        if postdominators is not None and block not in liveblocks:
+            liveblocks.add(block)
+            for branch in postdominators.frontier(block):
+                mark(branch.terminator)
+
+    return live
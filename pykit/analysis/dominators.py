@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+"""
+Dominator trees and dominance frontiers.
+
+Recall that `a dom b` if every path from the root to `b` must go through `a`
+first. The immediate dominator of `b` is the closest strict dominator of `b`,
+and the immediate dominators form a tree rooted at the entry node.
+
+We compute the tree with the iterative algorithm from [1], which stores only
+the immediate dominator of each node. Dominance queries are answered in O(1)
+by numbering the nodes of the tree in pre- and post-order:
+
+    a dom b  <=>  pre(a) <= pre(b) and post(b) <= post(a)
+
+Post-dominators are the dominators of the reversed flow graph, rooted at a
+virtual exit node that succeeds all blocks without successors.
+
+[1]: A Simple, Fast Dominance Algorithm, Cooper, Harvey and Kennedy
+"""
+
+from __future__ import print_function, division, absolute_import
+
+class DominatorTree(object):
+    """
+    Dominator tree of a flow graph. The graph is given by a root node and
+    functions mapping a node to its successors and predecessors. Nodes that
+    are not reachable from the root are not part of the tree.
+
+        root:       entry node
+        idoms:      { node : immediate dominator } (None for the root)
+        children:   { node : [node] } nodes immediately dominated by node
+    """
+
+    def __init__(self, root, successors, predecessors):
+        self.root = root
+        self.successors = successors
+        self.predecessors = predecessors
+
+        self.postorder = _postorder(root, successors)
+        self.idoms = _compute_idoms(root, self.postorder, predecessors)
+        self.children = dict((node, []) for node in self.postorder)
+        for node in reversed(self.postorder):
+            idom = self.idoms[node]
+            if idom is not None:
+                self.children[idom].append(node)
+
+        self._pre, self._post = _number_tree(root, self.children)
+        self._frontiers = None
+
+    # __________________________________________________________________
+    # Queries
+
+    def __contains__(self, node):
+        """Whether `node` is reachable from the root"""
+        return node in self.idoms
+
+    def idom(self, node):
+        """Immediate dominator of `node`, or None for the root and unreachable
+        nodes"""
+        return self.idoms.get(node)
+
+    def dominates(self, a, b):
+        """Whether `a` dominates `b` (every node dominates itself)"""
+        if a is b:
+            return True
+        pre, post = self._pre, self._post
+        if a not in pre or b not in pre:
+            return False
+        return pre[a] <= pre[b] and post[b] <= post[a]
+
+    def strictly_dominates(self, a, b):
+        return a is not b and self.dominates(a, b)
+
+    def dominators(self, node):
+        """Iterate over the dominators of `node`, starting with `node`"""
+        while node is not None:
+            yield node
+            node = self.idoms.get(node)
+
+    def preorder(self):
+        """Iterate over the reachable nodes in dominator tree pre-order"""
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(self.children[node]))
+
+    # __________________________________________________________________
+    # Dominance frontiers
+
+    @property
+    def frontiers(self):
+        """
+        Dominance frontiers: { node : set(nodes) }. The dominance frontier of
+        `a` is the set of nodes `b` such that `a` dominates a predecessor of
+        `b`, but does not strictly dominate `b`.
+        """
+        if self._frontiers is None:
+            self._frontiers = _compute_frontiers(self)
+        return self._frontiers
+
+    def frontier(self, node):
+        return self.frontiers.get(node, set())
+
+    def iterated_frontier(self, nodes):
+        """
+        Compute the iterated dominance frontier DF+(nodes), i.e. the points
+        where phis need to be placed for a variable defined in `nodes`.
+        """
+        frontiers = self.frontiers
+        result = set()
+        worklist = [node for node in nodes if node in frontiers]
+        seen = set(worklist)
+        while worklist:
+            node = worklist.pop()
+            for df in frontiers[node]:
+                if df not in result:
+                    result.add(df)
+                    if df not in seen:
+                        seen.add(df)
+                        worklist.append(df)
+
+        return result
+
+#===------------------------------------------------------------------===
+# Construction
+#===------------------------------------------------------------------===
+
+def _postorder(root, successors):
+    """Depth-first post-order of the nodes reachable from root"""
+    order = []
+    seen = set([root])
+    stack = [(root, iter(successors(root)))]
+    while stack:
+        node, succs = stack[-1]
+        for succ in succs:
+            if succ not in seen:
+                seen.add(succ)
+                stack.append((succ, iter(successors(succ))))
+                break
+        else:
+            stack.pop()
+            order.append(node)
+
+    return order
+
+def _compute_idoms(root, postorder, predecessors):
+    """Solve the dominator equations in reverse post-order"""
+    number = dict((node, i) for i, node in enumerate(postorder))
+    idoms = { root: root }
+
+    def intersect(a, b):
+        while a is not b:
+            while number[a] < number[b]:
+                a = idoms[a]
+            while number[b] < number[a]:
+                b = idoms[b]
+        return a
+
+    rpo = postorder[-2::-1] # skip the root
+    changed = True
+    while changed:
+        changed = False
+        for node in rpo:
+            new_idom = None
+            for pred in predecessors(node):
+                if pred in idoms:
+                    if new_idom is None:
+                        new_idom = pred
+                    else:
+                        new_idom = intersect(pred, new_idom)
+
+            if idoms.get(node) is not new_idom:
+                idoms[node] = new_idom
+                changed = True
+
+    idoms[root] = None
+    return idoms
+
+def _number_tree(root, children):
+    """Number the nodes of the tree in pre-order and post-order"""
+    pre, post = {}, {}
+    stack = [(root, iter(children[root]))]
+    pre[root] = 0
+    while stack:
+        node, kids = stack[-1]
+        for child in kids:
+            pre[child] = len(pre)
+            stack.append((child, iter(children[child])))
+            break
+        else:
+            stack.pop()
+            post[node] = len(post)
+
+    return pre, post
+
+def _compute_frontiers(tree):
+    frontiers = dict((node, set()) for node in tree.idoms)
+    for node in tree.idoms:
+        preds = [p for p in tree.predecessors(node) if p in tree.idoms]
+        if len(preds) < 2 and not (node is tree.root and preds):
+            continue
+
+        idom = tree.idoms[node]
+        for runner in preds:
+            while runner is not idom:
+                frontiers[runner].add(node)
+                if runner is tree.root:
+                    break
+                runner = tree.idoms[runner]
+
+    return frontiers
+
+#===------------------------------------------------------------------===
+# Entry points
+#===------------------------------------------------------------------===
+
+def dominator_tree(func, cfg=None):
+    """Compute the DominatorTree for the basic blocks of `func`"""
+    if cfg is None:
+        from pykit.analysis import cfa
+        cfg = cfa.cfg(func)
+    return DominatorTree(func.startblock, cfg.successors, cfg.predecessors)
+
+class ExitNode(object):
+    """Virtual exit node, the root of post-dominator trees"""
+
+    def __repr__(self):
+        return "ExitNode()"
+
+def post_dominator_tree(func, cfg=None):
+    """
+    Compute the post-dominator tree for the basic blocks of `func`. The root
+    of the tree is an ExitNode. Blocks that cannot reach an exit (e.g. in
+    infinite loops) are not part of the tree.
+    """
+    if cfg is None:
+        from pykit.analysis import cfa
+        cfg = cfa.cfg(func)
+
+    exit = ExitNode()
+    exits = [block for block in cfg if not cfg[block]]
+
+    def successors(node):
+        if node is exit:
+            return exits
+        return cfg.predecessors(node)
+
+    def predecessors(node):
+        if node is exit:
+            return []
+        return cfg.successors(node) or [exit]
+
+    return DominatorTree(exit, successors, predecessors)
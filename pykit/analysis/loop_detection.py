@@ -15,7 +15,7 @@ if it
 """
 
 from __future__ import print_function, division, absolute_import
-from pykit.analysis import cfa
+from pykit.analysis import cfa, dominators
 
 class Loop(object):
     """
@@ -38,17 +38,17 @@ class Loop(object):
         return self.blocks[-1]
 
 
-def find_natural_loops(func, cfg=None):
+def find_natural_loops(func, cfg=None, domtree=None):
     """Return a loop nesting forest for the given function ([Loop])"""
     cfg = cfg or cfa.cfg(func)
-    dominators = cfa.compute_dominators(func, cfg)
+    domtree = domtree or dominators.dominator_tree(func, cfg)
 
     loops = []
     loop_stack = []
     for block in func.blocks:
         ### Look for incoming back-edge
         for pred in cfg.predecessors(block):
-            if block in dominators[pred]:
+            if domtree.dominates(block, pred):
                 # We dominate an incoming block, this means there is a
                 # back-edge (pred, block)
                 loop_stack.append(Loop([block]))
@@ -57,7 +57,7 @@ def find_natural_loops(func, cfg=None):
         if loop_stack:
             loop = loop_stack[-1]
             head = loop.blocks[0]
-            if head in dominators[block] and head != block:
+            if domtree.dominates(head, block) and head != block:
                 # Dominated by loop header, add
                 loop.blocks.append(block)
 
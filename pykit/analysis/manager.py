@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cache analyses of functions between passes.
+
+The analysis manager lives in env["analysis.manager"] and lazily computes
+analyses for functions on request. Analysis results remain valid until a
+pass changes the function. After running a pass, the pipeline invalidates
+all analyses for the function, except for those the pass declares to
+preserve through a `preserves` attribute on the pass module or function:
+
+    preserves = ("cfg", "dominators", "loops")
+
+The analyses of a function are dropped once the function is translated by
+the codegen stage (pipeline.codegen), or when a pass returns a different
+function.
+"""
+
+from __future__ import print_function, division, absolute_import
+
+from pykit.analysis import cfa, dominators, loop_detection, defuse, callgraph
+
+#===------------------------------------------------------------------===
+# Analyses
+#===------------------------------------------------------------------===
+
+def _cfg(func, manager):
+    return cfa.cfg(func)
+
+def _dominators(func, manager):
+    return dominators.dominator_tree(func, manager.get("cfg", func))
+
+def _postdominators(func, manager):
+    return dominators.post_dominator_tree(func, manager.get("cfg", func))
+
+def _loops(func, manager):
+    return loop_detection.find_natural_loops(
+        func, manager.get("cfg", func), manager.get("dominators", func))
+
+def _defuse(func, manager):
+    return defuse.defuse(func)
+
+def _callgraph(func, manager):
+    return callgraph.callgraph(func)
+
+default_analyses = {
+    "cfg":              _cfg,               # cfa.CFG
+    "dominators":       _dominators,        # dominators.DominatorTree
+    "postdominators":   _postdominators,    # dominators.DominatorTree
+    "loops":            _loops,             # [loop_detection.Loop]
+    "defuse":           _defuse,            # { def : set(uses) }
+    "callgraph":        _callgraph,         # networkx.DiGraph
+}
+
+#===------------------------------------------------------------------===
+# Manager
+#===------------------------------------------------------------------===
+
+class AnalysisManager(object):
+    """
+    Compute and cache analyses for functions.
+
+        analyses:   { analysis_name : compute(func, manager) }
+        cache:      { Function : { analysis_name : result } }
+    """
+
+    def __init__(self, analyses=None):
+        self.analyses = dict(default_analyses)
+        self.analyses.update(analyses or {})
+        self.cache = {}
+
+    def get(self, name, func):
+        """Get the result of analysis `name` for `func`"""
+        if name not in self.analyses:
+            raise KeyError("Unknown analysis: %r" % (name,))
+
+        results = self.cache.setdefault(func, {})
+        if name not in results:
+            results[name] = self.analyses[name](func, self)
+        return results[name]
+
+    def cached(self, name, func):
+        """Return the cached result of analysis `name`, or None"""
+        return self.cache.get(func, {}).get(name)
+
+    def invalidate(self, func, preserved=()):
+        """Invalidate all analyses for `func`, except the `preserved` ones"""
+        results = self.cache.get(func)
+        if results:
+            for name in list(results):
+                if name not in preserved:
+                    del results[name]
+
+    def forget(self, func):
+        """Drop all analyses for `func`"""
+        self.cache.pop(func, None)
+
+    def clear(self):
+        self.cache.clear()
+
+
+def preserved_analyses(transform):
+    """Return the analyses preserved by the given pass module or function"""
+    return getattr(transform, "preserves", ())
+
+def get_manager(env):
+    """
+    Return the analysis manager in the environment, or a new manager if
+    there is none. Passes using several analyses should get them from a
+    single manager, so that they are computed for the same CFG.
+    """
+    manager = env.get("analysis.manager") if env else None
+    if manager is None:
+        manager = AnalysisManager()
+    return manager
+
+def get_analysis(env, name, func):
+    """
+    Get analysis `name` for `func` from the analysis manager in the
+    environment, or compute it if there is no manager.
+    """
+    return get_manager(env).get(name, func)
@@ -23,6 +23,12 @@ class TestCallgraph(SourceTestCase):
         assert f in G.successors(g)
         assert not G.successors(f)
 
+    def test_bottom_up(self):
+        g = self.m.get_function('g')
+        f = self.m.get_function('f')
+        G = callgraph.callgraph(g)
+        self.assertEqual(callgraph.bottom_up(G), [[f], [g]])
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
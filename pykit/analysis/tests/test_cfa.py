@@ -30,6 +30,21 @@ double func(double y) {
 
     return y;
 }
+
+Int32 fib(Int32 n) {
+    Int32 a = 1;
+    Int32 b = 1;
+    Int32 t;
+    Int32 i;
+
+    for (i = 0; i < n; i = i + 1) {
+        t = a + b;
+        a = b;
+        b = t;
+    }
+
+    return a;
+}
 """
 
 class TestCFA(unittest.TestCase):
@@ -43,6 +58,25 @@ class TestCFA(unittest.TestCase):
         cond_block = findop(f, 'cbranch').block
         self.assertEqual(len(flow[cond_block]), 2)
 
+    def test_cfg_edges(self):
+        f = from_c(source).get_function('func')
+        flow = cfa.cfg(f)
+
+        self.assertEqual(len(flow), len(f.blocks))
+        self.assertEqual(list(flow), list(f.blocks))
+        for block, succ in flow.edges():
+            self.assertIn(succ, flow.successors(block))
+            self.assertIn(block, flow.predecessors(succ))
+            self.assertTrue(flow.has_edge(block, succ))
+
+        exit = findop(f, 'ret').block
+        preds = flow.predecessors(exit)
+        flow.remove_node(exit)
+        self.assertNotIn(exit, flow)
+        for pred in preds:
+            self.assertNotIn(exit, flow.successors(pred))
+        self.assertRaises(ValueError, flow.remove_edge, preds[0], exit)
+
     def test_ssa(self):
         mod = from_c(source)
         f = mod.get_function('func_simple')
@@ -74,6 +108,24 @@ class TestCFA(unittest.TestCase):
         codes = opcodes(f)
         self.assertEqual(codes.count('phi'), 3)
 
+    def test_pruned_phis(self):
+        mod = from_c(source)
+        f = mod.get_function('fib')
+        CFG = cfa.cfg(f)
+        allocas = cfa.find_allocas(f)
+        cfa.move_allocas(f, allocas)
+
+        # 't' is dead on entry to the loop header, so it doesn't need a phi
+        phis = cfa.insert_phis(f, CFG, allocas)
+        self.assertEqual(len(phis), 3)
+        self.assertEqual(len(set(phi.block for phi in phis)), 1)
+
+        cfa.compute_dataflow(f, CFG, allocas, phis)
+        cfa.prune_phis(f, phis)
+        verify(f)
+        self.assertEqual(opcodes(f).count('phi'), 3)
+        self.assertNotIn('load', opcodes(f))
+
 if __name__ == '__main__':
     #TestCFA('test_cfg').debug()
     unittest.main()
\ No newline at end of file
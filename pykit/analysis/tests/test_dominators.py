@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import
+
+import unittest
+
+from pykit.parsing import from_c
+from pykit.analysis import cfa, dominators
+from pykit.ir import Builder, findop
+
+source = """
+#include <pykit_ir.h>
+
+Int32 f(Int32 i) {
+    Int32 x = 0;
+    while (i < 10) {
+        if (i > 5)
+            x = x + i;
+        else
+            x = x - i;
+        i = i + 1;
+    }
+    return x;
+}
+"""
+
+def naive_dominators(func, cfg):
+    """Solve the dominator equations with sets"""
+    blocks = list(func.blocks)
+    doms = dict((block, set(blocks)) for block in blocks)
+    doms[func.startblock] = set([func.startblock])
+    changed = True
+    while changed:
+        changed = False
+        for block in blocks[1:]:
+            preds = [doms[p] for p in cfg.predecessors(block)]
+            new = set([block]) | set.intersection(*preds)
+            if new != doms[block]:
+                doms[block] = new
+                changed = True
+    return doms
+
+class TestDominators(unittest.TestCase):
+
+    def setUp(self):
+        self.f = from_c(source).get_function('f')
+        cfa.run(self.f)
+        self.cfg = cfa.cfg(self.f)
+        self.domtree = dominators.dominator_tree(self.f, self.cfg)
+
+    def test_dominates(self):
+        expected = naive_dominators(self.f, self.cfg)
+        for a in self.f.blocks:
+            for b in self.f.blocks:
+                self.assertEqual(self.domtree.dominates(a, b),
+                                 a in expected[b], (a, b))
+
+    def test_idoms(self):
+        entry = self.f.startblock
+        self.assertIs(self.domtree.idom(entry), None)
+        for block in self.f.blocks:
+            if block is not entry:
+                idom = self.domtree.idom(block)
+                self.assertTrue(self.domtree.strictly_dominates(idom, block))
+                self.assertIn(block, self.domtree.children[idom])
+
+        self.assertEqual(list(self.domtree.preorder())[0], entry)
+        self.assertEqual(len(list(self.domtree.preorder())),
+                         len(self.f.blocks))
+
+    def test_frontiers(self):
+        doms = naive_dominators(self.f, self.cfg)
+        for a in self.f.blocks:
+            expected = set()
+            for b in self.f.blocks:
+                preds = self.cfg.predecessors(b)
+                if (any(a in doms[p] for p in preds) and
+                        not (a in doms[b] and a != b)):
+                    expected.add(b)
+            self.assertEqual(self.domtree.frontier(a), expected, a)
+
+    def test_unreachable(self):
+        exit = findop(self.f, 'ret').block
+        dead = self.f.new_block('dead')
+        b = Builder(self.f)
+        b.position_at_end(dead)
+        b.jump(exit)
+        domtree = dominators.dominator_tree(self.f, cfa.cfg(self.f))
+        self.assertNotIn(dead, domtree)
+        self.assertIs(domtree.idom(dead), None)
+        self.assertFalse(domtree.dominates(self.f.startblock, dead))
+        self.assertTrue(domtree.dominates(dead, dead))
+
+    def test_post_dominators(self):
+        exit = findop(self.f, 'ret').block
+        postdoms = dominators.post_dominator_tree(self.f, self.cfg)
+        self.assertIs(postdoms.idom(exit), postdoms.root)
+        for block in self.f.blocks:
+            self.assertTrue(postdoms.dominates(exit, block))
+
+        # The branches of the if statement are control dependent on it
+        [cbranch] = [op for op in self.f.ops if op.opcode == 'cbranch'
+                                             and op.args[0].opcode == 'gt']
+        for target in cbranch.args[1:]:
+            self.assertIn(cbranch.block, postdoms.frontier(target))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import
+
+import unittest
+
+from pykit import pipeline
+from pykit.parsing import from_c
+from pykit.ir import Builder, findop
+from pykit.analysis import cfa
+from pykit.analysis.manager import AnalysisManager, get_analysis, get_manager
+from pykit.transform import dce
+
+source = """
+#include <pykit_ir.h>
+
+Int32 f(Int32 i) {
+    Int32 x = 0;
+    while (i < 10) {
+        x = x + i;
+        i = i + 1;
+    }
+    return x;
+}
+"""
+
+def cfg_changing_pass(func, env):
+    b = Builder(func)
+    b.position_at_end(func.new_block("extra"))
+    b.jump(findop(func, 'ret').block)
+
+class TestAnalysisManager(unittest.TestCase):
+
+    def setUp(self):
+        self.f = from_c(source).get_function('f')
+        cfa.run(self.f)
+        self.manager = AnalysisManager()
+        self.env = { "analysis.manager": self.manager }
+
+    def test_caching(self):
+        cfg = self.manager.get("cfg", self.f)
+        domtree = self.manager.get("dominators", self.f)
+        self.assertIs(self.manager.get("cfg", self.f), cfg)
+        self.assertIs(self.manager.get("dominators", self.f), domtree)
+        self.assertIs(get_analysis(self.env, "cfg", self.f), cfg)
+
+        loops = self.manager.get("loops", self.f)
+        self.assertEqual(len(loops), 1)
+        self.assertRaises(KeyError, self.manager.get, "unknown", self.f)
+
+    def test_preserved(self):
+        cfg = self.manager.get("cfg", self.f)
+        defuse = self.manager.get("defuse", self.f)
+
+        pipeline.apply_transform(dce, self.f, self.env)
+        self.assertIs(self.manager.cached("cfg", self.f), cfg)
+        self.assertIs(self.manager.cached("defuse", self.f), None)
+        self.assertIsNot(self.manager.get("defuse", self.f), defuse)
+
+    def test_invalidated(self):
+        cfg = self.manager.get("cfg", self.f)
+        pipeline.apply_transform(cfg_changing_pass, self.f, self.env)
+        self.assertIs(self.manager.cached("cfg", self.f), None)
+
+        cfg = self.manager.get("cfg", self.f)
+        self.assertEqual(len(cfg), len(self.f.blocks))
+
+    def test_get_manager(self):
+        self.assertIs(get_manager(self.env), self.manager)
+        for env in [None, {}]:
+            self.assertIsInstance(get_manager(env), AnalysisManager)
+            self.assertEqual(len(get_analysis(env, "cfg", self.f)),
+                             len(self.f.blocks))
+
+    def test_forget(self):
+        self.manager.get("cfg", self.f)
+        self.env["pipeline.codegen"] = []
+        pipeline.codegen(self.f, self.env)
+        self.assertEqual(self.manager.cache, {})
+
+        g = from_c(source).get_function('f')
+        self.manager.get("cfg", self.f)
+        pipeline.apply_transform(lambda func, env: (g, env), self.f, self.env)
+        self.assertEqual(self.manager.cache, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
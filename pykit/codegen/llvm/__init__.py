@@ -11,13 +11,20 @@ from . import llvm_postpasses
 from . import llvm_codegen
 from .llvm_utils import module, target_machine, link_module, execution_engine
 from . import llvm_utils
+from . import llvm_cache
+from .llvm_cache import CodeCache
 from .. import codegen
 
 name = "llvm"
 
 def install(env, opt=3, llvm_engine=None, llvm_module=None,
-            llvm_target_machine=None, temper=make_temper()):
-    """Install llvm code generator in environment"""
+            llvm_target_machine=None, temper=make_temper(), cache=None):
+    """
+    Install llvm code generator in environment.
+
+    :param cache: persistent code cache: a CodeCache, a cache directory, or
+                  True for the default directory (see llvm_cache)
+    """
     llvm_target_machine = llvm_target_machine or target_machine(opt)
     llvm_module = llvm_module or module(temper("temp_module"))
     llvm_engine = llvm_engine or execution_engine(llvm_module,
@@ -26,12 +33,20 @@ def install(env, opt=3, llvm_engine=None, llvm_module=None,
     # -------------------------------------------------
     # Codegen passes
 
-    env["pipeline.codegen"].extend([
-        "passes.llvm.postpasses",
-        "passes.llvm.ctypes",
-    ])
+    env["pipeline.codegen"].append("passes.llvm.postpasses")
+    if cache:
+        env["pipeline.codegen"].append("passes.llvm.cache")
+    env["pipeline.codegen"].append("passes.llvm.ctypes")
 
     env["passes.codegen"] = codegen
+    if cache:
+        if not isinstance(cache, CodeCache):
+            if cache is True:
+                cache = CodeCache()
+            else:
+                cache = CodeCache(cache)
+        env["passes.codegen"] = llvm_cache
+        env["passes.llvm.cache"] = llvm_cache.store
     env["passes.llvm.postpasses"] = llvm_postpasses
     env["passes.llvm.ctypes"] = get_ctypes
 
@@ -44,6 +59,7 @@ def install(env, opt=3, llvm_engine=None, llvm_module=None,
     env["codegen.llvm.engine"] = llvm_engine
     env["codegen.llvm.module"] = llvm_module
     env["codegen.llvm.machine"] = llvm_target_machine
+    env["codegen.llvm.cache"] = cache or None
 
 def verify(func, env):
     """Verify LLVM function and module"""
@@ -52,6 +68,10 @@ def verify(func, env):
 
 def optimize(func, env):
     """Optimize llvm module"""
+    cache = env.get("codegen.llvm.cache")
+    if cache is not None and cache.is_cached(func):
+        return # optimized by the code cache
+
     llvm_utils.optimize(env["codegen.llvm.module"],
                         env["codegen.llvm.machine"],
                         env["codegen.llvm.opt"])
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+"""
+Persistent cache of optimized LLVM code. Enable it when installing the
+code generator:
+
+    llvm.install(env, cache="~/.cache/pykit/llvm")
+
+Code is keyed by the structural hash of the function and its callees
+(pykit.ir.hashing), the optimization level, the target machine, and the
+LLVM and pykit versions. On a miss the function is translated as usual,
+and the "passes.llvm.cache" pass copies it with the code it references into
+a module of its own, which is optimized, stored as bitcode, and added to the
+execution engine. On a hit the bitcode is loaded into a new module which is
+added to the execution engine, skipping translation and optimization.
+
+Functions other than the entry point are internal to a cached module, so
+modules loaded from the cache do not clash with each other or with the
+module shared by the code generator.
+
+Entries live in a pykit.utils.diskcache.DiskCache, which bounds the size
+of the cache and may be shared by concurrent processes.
+"""
+
+from __future__ import print_function, division, absolute_import
+import io
+import os
+
+import llvm
+import llvm.core
+import llvm.passes
+
+import pykit
+from pykit import ir
+from pykit.ir import hashing
+from pykit.analysis import callgraph
+from pykit.codegen import codegen
+from pykit.utils import flatten
+from pykit.utils.diskcache import DiskCache
+from . import llvm_utils
+
+default_directory = os.path.join("~", ".cache", "pykit", "llvm")
+
+#===------------------------------------------------------------------===
+# Cache keys
+#===------------------------------------------------------------------===
+
+def cache_key(func, env):
+    """
+    Compute the cache key for the optimized code of `func`. Addresses of
+    external symbols are part of the key, since they are specific to the
+    process.
+    """
+    machine = env["codegen.llvm.machine"]
+    hasher = hashing.Hasher()
+    hasher.token("llvm")
+    for field in [pykit.__version__, getattr(llvm, 'version', None),
+                  env["codegen.llvm.opt"], getattr(machine, 'triple', None),
+                  getattr(machine, 'cpu', None),
+                  getattr(machine, 'feature_string', None)]:
+        hasher.encode(field)
+
+    funcs = sorted(callgraph.callgraph(func).node, key=lambda f: f.name)
+    for f in funcs:
+        hasher.reset()
+        hasher.hash_function(f)
+        for name, address in sorted(external_addresses(f).items()):
+            hasher.token(name)
+            hasher.encode_py(address)
+
+    return hasher.hexdigest()
+
+def external_addresses(func):
+    """Return { name : address } for external symbols used by `func`"""
+    result = {}
+    for op in func.ops:
+        for arg in flatten(op.args):
+            if isinstance(arg, (ir.GlobalValue, ir.Function)):
+                address = getattr(arg, 'address', None)
+                if address:
+                    result[arg.name] = address
+    return result
+
+def extract(lfunc):
+    """
+    Copy `lfunc` and the code it references into a new module. Other
+    definitions are made internal and deleted if unused.
+    """
+    buf = io.BytesIO()
+    lfunc.module.to_bitcode(buf)
+    llvm_module = llvm.core.Module.from_bitcode(io.BytesIO(buf.getvalue()))
+
+    for gv in list(llvm_module.functions) + list(llvm_module.global_variables):
+        if not gv.is_declaration and gv.name != lfunc.name:
+            gv.linkage = llvm.core.LINKAGE_INTERNAL
+
+    pm = llvm.passes.PassManager.new()
+    pm.add("globaldce")
+    pm.run(llvm_module)
+    return llvm_module
+
+#===------------------------------------------------------------------===
+# Cache
+#===------------------------------------------------------------------===
+
+class CodeCache(object):
+    """
+    Cache of optimized LLVM modules.
+
+        pending:    { (module id, lfunc name) : (key, func) } of functions
+                    translated by the code generator, until they are stored
+                    by the "passes.llvm.cache" pass
+        loaded:     set([(module id, lfunc name)]) of optimized functions
+                    loaded from or stored in the cache
+    """
+
+    def __init__(self, directory=default_directory, maxsize=256 * 1024 * 1024):
+        self.disk = DiskCache(directory, maxsize)
+        self.pending = {}
+        self.loaded = set()
+
+    def lookup(self, func, env):
+        """
+        Load the code for `func` into the execution engine. Returns the LLVM
+        function and the cache key, or None and the key on a miss.
+        """
+        key = cache_key(func, env)
+        data = self.disk.get(key)
+        if data is None:
+            return None, key
+
+        name, _, bitcode = data.partition(b"\n")
+        llvm_module = llvm.core.Module.from_bitcode(io.BytesIO(bitcode))
+        return self.add(llvm_module, name.decode('utf-8'), func, key, env), key
+
+    def store(self, lfunc, env):
+        """
+        Optimize a function translated by the code generator in a module of
+        its own, and store it. Returns the optimized function, which is
+        added to the execution engine, or None if `lfunc` is not pending.
+        """
+        key, func = self.pending.pop(_ident(lfunc), (None, None))
+        if key is None:
+            return None
+
+        llvm_module = extract(lfunc)
+        llvm_utils.optimize(llvm_module, env["codegen.llvm.machine"],
+                            env["codegen.llvm.opt"])
+        buf = io.BytesIO()
+        llvm_module.to_bitcode(buf)
+        self.disk.put(key, lfunc.name.encode('utf-8') + b"\n" +
+                           buf.getvalue())
+        return self.add(llvm_module, lfunc.name, func, key, env)
+
+    def add(self, llvm_module, name, func, key, env):
+        """Add an optimized module to the execution engine"""
+        llvm_module.id = "cached_" + key
+        engine = env["codegen.llvm.engine"]
+        engine.add_module(llvm_module)
+
+        symbols = dict((gv.name, gv) for gv in
+                           list(llvm_module.functions) +
+                           list(llvm_module.global_variables))
+        for f in callgraph.callgraph(func).node:
+            for symbol, address in external_addresses(f).items():
+                if symbol in symbols and symbols[symbol].is_declaration:
+                    engine.add_global_mapping(symbols[symbol], address)
+
+        lfunc = llvm_module.get_function_named(name)
+        self.loaded.add(_ident(lfunc))
+        return lfunc
+
+    def is_cached(self, lfunc):
+        return _ident(lfunc) in self.loaded
+
+    def __repr__(self):
+        return "CodeCache(%r)" % (self.disk.directory,)
+
+
+def _ident(lfunc):
+    return (lfunc.module.id, lfunc.name)
+
+#===------------------------------------------------------------------===
+# Passes
+#===------------------------------------------------------------------===
+
+def run(func, env):
+    """Code generation pass that loads cached code or translates `func`"""
+    cache = env["codegen.llvm.cache"]
+    try:
+        lfunc, key = cache.lookup(func, env)
+    except hashing.HashError:
+        return codegen.run(func, env) # no stable key, don't cache
+    if lfunc is None:
+        lfunc, env = codegen.run(func, env)
+        cache.pending[_ident(lfunc)] = (key, func)
+    return lfunc, env
+
+def store(lfunc, env):
+    """
+    Pass over the LLVM IR that optimizes and caches newly translated code,
+    substituting the optimized function.
+    """
+    optimized = env["codegen.llvm.cache"].store(lfunc, env)
+    if optimized is not None:
+        return optimized, env
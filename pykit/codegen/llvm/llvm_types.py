@@ -1,6 +1,6 @@
 from pykit.utils import hashable
 from pykit.types import (Boolean, Integral, Float32, Float64, Array, Struct, Pointer,
-                         Function, Vector, VoidT, resolve_typedef)
+                         Function, Vector, VoidT, resolve_typedef, equivalent)
 from llvm.core import Type, TYPE_FUNCTION
 
 from llvmmath import llvm_support
@@ -48,8 +48,9 @@ def llvm_type(type, memo=None):
 opaque_memo = {}
 
 def handle_struct(type, memo):
-    # Check the cache with a hashable struct type
-    key = type
+    # Check the cache with the canonical struct type, structurally equal
+    # (recursive) structs map to the same LLVM type
+    key = equivalent(type)
 
     if key in memo:
         return memo[key]
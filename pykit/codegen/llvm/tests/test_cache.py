@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test the LLVM code cache against a mock of llvmpy, which records the
+modules added to the execution engine.
+"""
+
+from __future__ import print_function, division, absolute_import
+
+import json
+import shutil
+import tempfile
+import unittest
+
+from pykit import types
+from pykit.ir import Function, Builder
+
+try:
+    from pykit.codegen.llvm import llvm_cache
+except ImportError:
+    llvm_cache = None
+
+#===------------------------------------------------------------------===
+# Mock llvmpy
+#===------------------------------------------------------------------===
+
+class LFunction(object):
+    def __init__(self, module, name, is_declaration=False):
+        self.module, self.name = module, name
+        self.is_declaration = is_declaration
+        self.linkage = 'external'
+
+class LModule(object):
+    def __init__(self, id, functions=()):
+        self.id = id
+        self.functions = [LFunction(self, name, decl)
+                              for name, decl in functions]
+        self.global_variables = []
+        self.optimized = False
+
+    def get_function_named(self, name):
+        [lfunc] = [lf for lf in self.functions if lf.name == name]
+        return lfunc
+
+    def to_bitcode(self, buf):
+        data = [(lf.name, lf.is_declaration) for lf in self.functions]
+        buf.write(json.dumps([self.optimized, data]).encode('utf-8'))
+
+    @classmethod
+    def from_bitcode(cls, buf):
+        optimized, data = json.loads(buf.read().decode('utf-8'))
+        result = cls("bitcode", data)
+        result.optimized = optimized
+        return result
+
+class PassManager(object):
+    @classmethod
+    def new(cls):
+        return cls()
+    def add(self, name):
+        assert name == "globaldce"
+    def run(self, module):
+        module.functions = [lf for lf in module.functions
+                                if lf.linkage != 'internal']
+
+class Engine(object):
+    def __init__(self):
+        self.modules = []
+    def add_module(self, module):
+        self.modules.append(module)
+    def add_global_mapping(self, gv, address):
+        pass
+
+class Namespace(object):
+    def __init__(self, **kwds):
+        self.__dict__.update(kwds)
+
+def optimize(module, machine, opt):
+    module.optimized = True
+
+mock_llvm = Namespace(
+    version=(3, 3),
+    core=Namespace(Module=LModule, LINKAGE_INTERNAL='internal'),
+    passes=Namespace(PassManager=PassManager))
+
+mock_llvm_utils = Namespace(optimize=optimize)
+
+#===------------------------------------------------------------------===
+# Tests
+#===------------------------------------------------------------------===
+
+class MockCodegen(object):
+    """Translate functions into the shared module"""
+
+    def __init__(self):
+        self.translated = []
+
+    def run(self, func, env):
+        self.translated.append(func.name)
+        llvm_module = env["codegen.llvm.module"]
+        llvm_module.functions.append(LFunction(llvm_module, func.name))
+        return llvm_module.functions[-1], env
+
+def make_function(name):
+    func = Function(name, ['x'],
+                    types.Function(types.Int32, [types.Int32], False))
+    b = Builder(func)
+    b.position_at_end(func.new_block('entry'))
+    b.ret(b.add(func.get_arg('x'), func.get_arg('x')))
+    return func
+
+@unittest.skipIf(llvm_cache is None, "llvmpy is not installed")
+class TestCodeCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.codegen = MockCodegen()
+        self.saved = llvm_cache.llvm, llvm_cache.llvm_utils, llvm_cache.codegen
+        llvm_cache.llvm = mock_llvm
+        llvm_cache.llvm_utils = mock_llvm_utils
+        llvm_cache.codegen = self.codegen
+
+    def tearDown(self):
+        llvm_cache.llvm, llvm_cache.llvm_utils, llvm_cache.codegen = self.saved
+        shutil.rmtree(self.directory)
+
+    def env(self):
+        """A fresh environment, as in another process"""
+        return {
+            "codegen.llvm.cache": llvm_cache.CodeCache(self.directory),
+            "codegen.llvm.engine": Engine(),
+            "codegen.llvm.module": LModule("shared", [("other", False)]),
+            "codegen.llvm.machine": Namespace(triple="x86_64", cpu="generic",
+                                              feature_string=""),
+            "codegen.llvm.opt": 3,
+        }
+
+    def compile(self, func, env):
+        lfunc, env = llvm_cache.run(func, env)
+        result = llvm_cache.store(lfunc, env)
+        return result[0] if result else lfunc
+
+    def test_miss(self):
+        env = self.env()
+        lfunc = self.compile(make_function("f"), env)
+
+        self.assertEqual(self.codegen.translated, ["f"])
+        self.assertEqual(env["codegen.llvm.cache"].pending, {})
+        self.assertTrue(env["codegen.llvm.cache"].is_cached(lfunc))
+
+        # The function is optimized in a module of its own
+        [llvm_module] = env["codegen.llvm.engine"].modules
+        self.assertIs(lfunc.module, llvm_module)
+        self.assertTrue(llvm_module.optimized)
+        self.assertEqual([lf.name for lf in llvm_module.functions], ["f"])
+        self.assertFalse(env["codegen.llvm.module"].optimized)
+
+    def test_hit(self):
+        self.compile(make_function("f"), self.env())
+
+        env = self.env()
+        lfunc = self.compile(make_function("f"), env)
+        self.assertEqual(self.codegen.translated, ["f"])
+        self.assertTrue(env["codegen.llvm.cache"].is_cached(lfunc))
+        self.assertTrue(lfunc.module.optimized)
+        self.assertEqual([lf.name for lf in lfunc.module.functions], ["f"])
+        self.assertEqual([lf.name for lf in env["codegen.llvm.module"].functions],
+                         ["other"])
+
+    def test_changed(self):
+        self.compile(make_function("f"), self.env())
+        self.compile(make_function("g"), self.env())
+        self.assertEqual(self.codegen.translated, ["f", "g"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,7 +14,8 @@ types = (t.Char, t.Short, t.Int, t.Long, t.LongLong,
          t.UChar, t.UShort, t.UInt, t.ULong, t.ULongLong)
 codes = ('c', 'h', 'i', 'l', 'Q') * 2
 
-typedef_map = {} # { Long: Int32, ... }
+# Keyed by name, since typedefs compare equal to the types they alias
+typedef_map = {} # { "Long": Int32, ... }
 
 for code, typedef in zip(codes, types):
     size = struct.calcsize(code)
@@ -23,7 +24,7 @@ for code, typedef in zip(codes, types):
     else:
         concrete_type = getattr(t, 'Int%d' % (size * 8))
 
-    typedef_map[typedef] = concrete_type
+    typedef_map[typedef.name] = concrete_type
 
 def reconstruct_type(ty, typemap):
     reconstruct = partial(reconstruct_type, typemap=typemap)
@@ -31,12 +32,14 @@ def reconstruct_type(ty, typemap):
         return list(map(reconstruct, ty))
     if not isinstance(ty, t.Type):
         return ty
-    elif ty in typemap:
-        return typemap[ty]
+    elif ty.is_typedef and ty.name in typemap:
+        return typemap[ty.name]
     else:
         ctor = type(ty)
         return ctor(*map(reconstruct, ty))
 
+preserves = ("cfg", "dominators", "loops", "defuse", "callgraph")
+
 def run(func, env):
     """env['types.typedefmap'] should be installed"""
     typemap = env['types.typedefmap']
@@ -105,7 +105,7 @@ class CParser(PLYParser):
         #
         self._scope_stack = [set()]
 
-    def parse(self, text, filename='', debuglevel=0):
+    def parse(self, text, filename='', debuglevel=0, typedefs=None):
         """ Parses C code and returns an AST.
 
             text:
@@ -117,10 +117,15 @@ class CParser(PLYParser):
 
             debuglevel:
                 Debug level to yacc
+
+            typedefs:
+                Set of typedef names of the file scope. It is updated
+                with the typedefs declared in text, pass the same set
+                to parse a file in pieces.
         """
         self.clex.filename = filename
         self.clex.reset_lineno()
-        self._scope_stack = [set()]
+        self._scope_stack = [set() if typedefs is None else typedefs]
         return self.cparser.parse(text, lexer=self.clex, debug=debuglevel)
 
     ######################--   PRIVATE   --######################
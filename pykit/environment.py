@@ -7,10 +7,11 @@ State for pykit pipeline.
 from __future__ import print_function, division, absolute_import
 from os.path import join, abspath, dirname
 import copy
+import importlib
 
-from pykit.analysis import cfa
+from pykit.analysis import cfa, manager
 from pykit.lower import lower_fields
-from pykit.codegen import resolve_typedefs, llvm
+from pykit.codegen import resolve_typedefs
 
 root = abspath(dirname(__file__))
 
@@ -46,6 +47,24 @@ default_passes = {
     "passes.codegen": None, # Use codegen.install()
 }
 
+# ______________________________________________________________________
+# Code generators, imported when installed
+
+backends = {
+    "llvm": "pykit.codegen.llvm",
+    "c":    "pykit.codegen.c",
+}
+
+def get_backend(env, name):
+    """Import the code generator registered as `name`"""
+    return importlib.import_module(env["codegen.backends"][name])
+
+def install_backend(env, name="llvm", **kwds):
+    """Install a code generator in the environment, and return it"""
+    backend = get_backend(env, name)
+    backend.install(env, **kwds)
+    return backend
+
 # ______________________________________________________________________
 
 _codegen_cache = {}
@@ -72,10 +91,20 @@ def fresh_env():
     env["library.threads"] = None
 
     # Misc data
-    # { Long : Int32, ...}
+    # { "Long" : Int32, ...}
     env['types.typedefmap'] = dict(resolve_typedefs.typedef_map)
     env["codegen.impl"] = None
     env["codegen.cache"] = _codegen_cache
+    env["codegen.backends"] = dict(backends)
+
+    # Analyses
+    env["analysis.manager"] = manager.AnalysisManager()
+
+    # Custom opcodes without side effects (see optimizations.gvn)
+    env["optimizations.pure"] = set()
+
+    # Instrumentation (pykit.instrumentation.Instrumentation)
+    env["pipeline.instrument"] = None
 
     return env
 
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+"""
+Pass instrumentation for the pipeline.
+
+Instrumentation is opt-in, install an Instrumentation object in the
+environment to record statistics for every pass run through pipeline.run():
+
+    env["pipeline.instrument"] = Instrumentation()
+    pipeline.optimize(func, env)
+    print(env["pipeline.instrument"].report.to_json())
+
+For each pass we record the wall time, CPU time, the number of operations
+and basic blocks before and after the pass, and the peak memory use of the
+pass in bytes. Reports aggregate statistics per pass, and can be merged
+across compilations.
+
+Peak memory is measured as the peak number of bytes allocated using
+tracemalloc (Python 3.4+). Otherwise, or for nested passes when the peak
+cannot be reset (Python < 3.9), it is measured as the growth of the maximum
+resident set size of the process, which is 0 for passes that stay below an
+earlier peak. The memory_source of each record says which measure was used.
+"""
+
+from __future__ import print_function, division, absolute_import
+import sys
+import json
+import time
+import collections
+
+from pykit.ir import Function
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    cpu_time = time.process_time
+except AttributeError:
+    cpu_time = time.clock
+
+PassRecord = collections.namedtuple('PassRecord', [
+    'name', 'function', 'wall_time', 'cpu_time',
+    'ops_before', 'ops_after', 'blocks_before', 'blocks_after',
+    'peak_memory', 'memory_source',
+])
+
+# ru_maxrss is in bytes on OS X, and in kilobytes elsewhere
+maxrss_unit = 1 if sys.platform == 'darwin' else 1024
+
+def maxrss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * maxrss_unit
+
+def ir_size(func):
+    """Return the (#ops, #blocks) of a pykit function, or (None, None)"""
+    if not isinstance(func, Function):
+        return None, None
+    return sum(len(block.ops) for block in func.blocks), len(func.blocks)
+
+#===------------------------------------------------------------------===
+# Reports
+#===------------------------------------------------------------------===
+
+def _summary():
+    return {
+        "calls": 0,
+        "wall_time": 0.0,
+        "cpu_time": 0.0,
+        "ops_before": 0,
+        "ops_after": 0,
+        "blocks_before": 0,
+        "blocks_after": 0,
+        "peak_memory": None,
+        "memory_source": None,
+    }
+
+def _max(a, b):
+    if a is None or b is None:
+        return b if a is None else a
+    return max(a, b)
+
+def _source(a, b):
+    if a is None or b is None or a == b:
+        return b if a is None else a
+    return "mixed"
+
+class Report(object):
+    """
+    Statistics per pass, aggregated over all runs:
+
+        passes:  { pass_name : { statistic : value } }
+        records: [PassRecord] for each run, if keep_records is set
+    """
+
+    def __init__(self, keep_records=False):
+        self.passes = collections.OrderedDict()
+        self.keep_records = keep_records
+        self.records = []
+
+    def add(self, record):
+        """Add a PassRecord"""
+        if self.keep_records:
+            self.records.append(record)
+
+        summary = self.passes.get(record.name)
+        if summary is None:
+            summary = self.passes[record.name] = _summary()
+
+        summary["calls"] += 1
+        summary["wall_time"] += record.wall_time
+        summary["cpu_time"] += record.cpu_time
+        for stat in ("ops_before", "ops_after", "blocks_before", "blocks_after"):
+            summary[stat] += getattr(record, stat) or 0
+        summary["peak_memory"] = _max(summary["peak_memory"],
+                                      record.peak_memory)
+        summary["memory_source"] = _source(summary["memory_source"],
+                                           record.memory_source)
+
+    def merge(self, other):
+        """Merge the statistics of another Report into this report"""
+        for name, stats in other.passes.items():
+            summary = self.passes.get(name)
+            if summary is None:
+                summary = self.passes[name] = _summary()
+            for stat, value in stats.items():
+                if stat == "peak_memory":
+                    summary[stat] = _max(summary[stat], value)
+                elif stat == "memory_source":
+                    summary[stat] = _source(summary[stat], value)
+                else:
+                    summary[stat] += value
+
+        if self.keep_records:
+            self.records.extend(other.records)
+
+    # __________________________________________________________________
+
+    def to_dict(self):
+        result = { "passes": dict((name, dict(stats))
+                                      for name, stats in self.passes.items()) }
+        if self.keep_records:
+            result["records"] = [dict(record._asdict())
+                                     for record in self.records]
+        return result
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    @classmethod
+    def from_dict(cls, data):
+        report = cls(keep_records="records" in data)
+        for name, stats in data["passes"].items():
+            report.passes[name] = dict(stats)
+        for record in data.get("records", []):
+            report.records.append(PassRecord(**record))
+        return report
+
+    @classmethod
+    def from_json(cls, s):
+        return cls.from_dict(json.loads(s))
+
+    def __repr__(self):
+        return "Report(%s)" % (", ".join(self.passes),)
+
+#===------------------------------------------------------------------===
+# Instrumentation
+#===------------------------------------------------------------------===
+
+class Instrumentation(object):
+    """
+    Measure passes run through the pipeline.
+
+        report:         Report collecting the results
+        track_memory:   whether to measure the peak memory use of passes
+    """
+
+    def __init__(self, report=None, track_memory=True, keep_records=False):
+        self.report = report or Report(keep_records)
+        self.track_memory = track_memory
+        # Peak traced memory observed by nested passes, for each enclosing
+        # pass measured with tracemalloc
+        self.peaks = []
+
+    def memory_source(self):
+        """Return how to measure the peak memory of the next pass, or None"""
+        if not self.track_memory:
+            return None
+        if tracemalloc is not None and (not tracemalloc.is_tracing() or
+                                        hasattr(tracemalloc, 'reset_peak')):
+            return "tracemalloc"
+        if resource is not None:
+            return "rusage"
+        return None
+
+    def run_pass(self, name, func, apply):
+        """
+        Run a pass through apply(), which should return the (func, env)
+        result of the pass.
+        """
+        ops_before, blocks_before = ir_size(func)
+
+        source = self.memory_source()
+        if source == "tracemalloc":
+            started = not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start()
+            else:
+                tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            self.peaks.append(0)
+        elif source == "rusage":
+            baseline = maxrss()
+
+        wall, cpu = time.time(), cpu_time()
+        try:
+            result = apply()
+        finally:
+            wall, cpu = time.time() - wall, cpu_time() - cpu
+            peak = None
+            if source == "tracemalloc":
+                _, peak = tracemalloc.get_traced_memory()
+                # Nested passes reset the peak
+                peak = max(peak, self.peaks.pop())
+                if self.peaks:
+                    self.peaks[-1] = max(self.peaks[-1], peak)
+                peak = max(peak - baseline, 0)
+                if started:
+                    tracemalloc.stop()
+            elif source == "rusage":
+                peak = max(maxrss() - baseline, 0)
+
+        ops_after, blocks_after = ir_size(result[0])
+        self.report.add(PassRecord(
+            name, getattr(func, 'name', None), wall, cpu,
+            ops_before, ops_after, blocks_before, blocks_after,
+            peak, source))
+
+        return result
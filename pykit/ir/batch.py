@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+"""
+Batch interpreter, which evaluates a function for many independent argument
+tuples at once. Arguments are given as NumPy arrays, where each element
+(lane) is a separate invocation:
+
+    >>> run(func, args=[np.arange(10), 2.0])
+    array([...])
+
+Every value in the function is an array with an element for each lane, and
+operations execute on all lanes in a basic block at once, using the same
+evaluation functions as the scalar interpreter (pykit.ir.defs). Lanes may
+diverge at conditional branches: each block is executed with a mask of the
+lanes that branched to it, and the blocks with pending lanes are executed
+lowest block first, so that lanes re-converge at join points.
+
+Integers are evaluated as 64-bit integers, and floats as 64-bit floats.
+"""
+
+from __future__ import print_function, division, absolute_import
+import math
+from itertools import chain
+
+import numpy as np
+
+from pykit import types
+from pykit.ir import Function, Operation, FuncArg, Constant, Undef
+from pykit.ir import defs, ops
+
+#===------------------------------------------------------------------===
+# Definitions
+#===------------------------------------------------------------------===
+
+evaluators = dict(chain(defs.unary.items(), defs.binary.items(),
+                        defs.compare.items()))
+evaluators[ops.not_] = np.logical_not
+
+math_funcs = dict(defs.math_funcs)
+math_funcs[ops.Erfc] = np.vectorize(math.erfc, otypes=[np.float64])
+
+def dtype(type):
+    """Return the NumPy dtype for lanes of a pykit type"""
+    type = types.resolve_typedef(type)
+    if type.is_int:
+        return np.dtype(np.int64)
+    elif type.is_real:
+        return np.dtype(np.float64)
+    elif type.is_bool:
+        return np.dtype(np.bool_)
+    return np.dtype(object)
+
+class Var(object):
+    """Stack variable with a value for each lane"""
+
+    def __init__(self, size, type):
+        self.value = np.zeros(size, dtype(type))
+
+#===------------------------------------------------------------------===
+# Interpreter
+#===------------------------------------------------------------------===
+
+class BatchInterp(object):
+    """
+    Evaluate a function over `size` lanes.
+
+        values:     { result : array | Var } runtime values for all lanes
+        pending:    { block index : lane mask } lanes waiting to execute blocks
+        prevblock:  block index previously executed by each lane
+        result:     return value for each lane
+    """
+
+    def __init__(self, func, args, size, env=None):
+        self.func = func
+        self.env = env
+        self.size = size
+
+        self.blocks = list(func.blocks)
+        self.blockindex = dict((block, i) for i, block in enumerate(self.blocks))
+
+        self.values = {}
+        for name, arg, type in zip(func.argnames, args, func.type.argtypes):
+            self.values[name] = np.asarray(arg).astype(dtype(type))
+
+        self.pending = { 0: np.ones(size, dtype=bool) }
+        self.prevblock = np.full(size, -1, dtype=np.int64)
+
+        restype = func.type.restype
+        if restype.is_void:
+            self.result = None
+        else:
+            self.result = np.zeros(size, dtype(restype))
+
+    # __________________________________________________________________
+
+    def run(self):
+        while self.pending:
+            i = min(self.pending)
+            lanes = np.flatnonzero(self.pending.pop(i))
+            self.execute_block(self.blocks[i], lanes)
+
+        return self.result
+
+    def execute_block(self, block, lanes):
+        self.execute_phis(block, lanes)
+        for op in block.ops:
+            if op.opcode == 'phi':
+                continue
+
+            fn = getattr(self, 'op_' + op.opcode, None)
+            if fn is None:
+                if op.opcode not in evaluators:
+                    raise NotImplementedError(
+                        "Opcode %r is not supported in batch mode" % op.opcode)
+                result = evaluators[op.opcode](*self.load_args(op, lanes))
+            else:
+                result = fn(op, lanes, *self.load_args(op, lanes))
+
+            if not ops.is_void(op.opcode) and op.opcode != 'alloca':
+                self.store_value(op, lanes, result)
+
+    def execute_phis(self, block, lanes):
+        """Execute all phis in parallel for the given lanes"""
+        phis = [op for op in block.leaders if op.opcode == 'phi']
+        prev = self.prevblock[lanes]
+
+        new_values = []
+        for phi in phis:
+            value = np.zeros(len(lanes), dtype(phi.type))
+            for pred, arg in zip(*phi.args):
+                selected = prev == self.blockindex[pred]
+                if selected.any():
+                    value[selected] = self.load(arg, lanes[selected])
+            new_values.append(value)
+
+        for phi, value in zip(phis, new_values):
+            self.store_value(phi, lanes, value)
+
+    # __________________________________________________________________
+    # Values
+
+    def load(self, arg, lanes):
+        if isinstance(arg, (Operation, FuncArg)):
+            value = self.values[arg.result]
+            return value if isinstance(value, Var) else value[lanes]
+        elif isinstance(arg, Constant):
+            return arg.const
+        elif isinstance(arg, Undef):
+            return np.zeros(len(lanes), dtype(arg.type))
+        elif isinstance(arg, list):
+            return [self.load(x, lanes) for x in arg]
+        return arg
+
+    def load_args(self, op, lanes):
+        return [self.load(arg, lanes) for arg in op.args]
+
+    def store_value(self, op, lanes, value):
+        array = self.values.get(op.result)
+        if array is None:
+            array = self.values[op.result] = np.zeros(self.size, dtype(op.type))
+        array[lanes] = value
+
+    def expand(self, value, lanes):
+        """Broadcast a (constant) value to the given lanes"""
+        return np.broadcast_to(value, (len(lanes),))
+
+    # __________________________________________________________________
+    # Operations
+
+    def op_convert(self, op, lanes, arg):
+        return np.asarray(arg).astype(dtype(op.type))
+
+    def op_alloca(self, op, lanes, numitems=None):
+        if op.result not in self.values:
+            self.values[op.result] = Var(self.size, op.type.base)
+
+    def op_load(self, op, lanes, var):
+        return var.value[lanes]
+
+    def op_store(self, op, lanes, value, var):
+        var.value[lanes] = value
+
+    def op_call(self, op, lanes, func, args):
+        args = [self.expand(arg, lanes) for arg in args]
+        if isinstance(func, Function):
+            return run(func, args, len(lanes), self.env)
+        return [func(*lane_args) for lane_args in zip(*args)]
+
+    def op_call_math(self, op, lanes, fname, *args):
+        return math_funcs[fname](*args)
+
+    # __________________________________________________________________
+    # Control flow
+
+    def branch(self, lanes, target):
+        if not len(lanes):
+            return
+        i = self.blockindex[target]
+        mask = self.pending.get(i)
+        if mask is None:
+            mask = self.pending[i] = np.zeros(self.size, dtype=bool)
+        mask[lanes] = True
+
+    def op_jump(self, op, lanes, target):
+        self.prevblock[lanes] = self.blockindex[op.block]
+        self.branch(lanes, target)
+
+    def op_cbranch(self, op, lanes, test, true, false):
+        self.prevblock[lanes] = self.blockindex[op.block]
+        test = self.expand(test, lanes).astype(bool)
+        self.branch(lanes[test], true)
+        self.branch(lanes[~test], false)
+
+    def op_ret(self, op, lanes, value=None):
+        if self.result is not None:
+            self.result[lanes] = value
+
+#===------------------------------------------------------------------===
+# Run
+#===------------------------------------------------------------------===
+
+def run(func, args=(), size=None, env=None):
+    """
+    Evaluate `func` for each lane of the arguments, which are broadcast
+    against each other. Returns an array with the result for each lane.
+
+    :param size: number of lanes, required if the function has no arguments
+    """
+    assert len(func.args) == len(args)
+    if args:
+        args = [np.ravel(arg) for arg in np.broadcast_arrays(*args)]
+        size = len(args[0])
+    elif size is None:
+        raise ValueError("Need the number of lanes for a function without "
+                         "arguments")
+
+    return BatchInterp(func, args, size, env).run()
@@ -315,7 +315,7 @@ class Builder(OpBuilder):
         oldblock = self._curblock
         op = self._lastop
         if op == 'head':
-            trailing = list(self._curblock.ops)
+            trailing = self._curblock.ops.snapshot()
         elif op != 'tail':
             trailing = list(op.block.ops.iter_from(op))[1:]
         else:
@@ -6,11 +6,10 @@ IR definitions.
 
 from __future__ import print_function, division, absolute_import
 
+import sys
 import math
+import numbers
 import operator
-import ctypes.util
-
-import numpy as np
 
 from pykit.ir import ops
 from pykit.utils import invert, mergedicts
@@ -19,14 +18,22 @@ from pykit.utils import invert, mergedicts
 # Python Version Compatibility
 #===------------------------------------------------------------------===
 
+def _is_integral(x):
+    np = sys.modules.get('numpy') # no arrays without numpy
+    if np is not None and isinstance(x, np.ndarray):
+        return x.dtype.kind in 'biu'
+    return isinstance(x, numbers.Integral)
+
 def divide(a, b):
     """
     `a / b` with python 2 semantics:
 
         - floordiv() integer division
         - truediv() float division
+
+    This also applies element-wise to NumPy arrays.
     """
-    if isinstance(a, (int, long)) and isinstance(b, (int, long)):
+    if _is_integral(a) and _is_integral(b):
         return operator.floordiv(a, b)
     else:
         return operator.truediv(a, b)
@@ -38,6 +45,17 @@ def erfc(x):
 
     return math.erfc(x)
 
+def _numpy(name):
+    """
+    Function calling numpy.<name>, NumPy is imported on first use to keep it
+    out of the import of pykit.ir.
+    """
+    def call(*args):
+        import numpy
+        return getattr(numpy, name)(*args)
+    call.__name__ = name
+    return call
+
 #===------------------------------------------------------------------===
 # Definitions -> Evaluation function
 #===------------------------------------------------------------------===
@@ -74,33 +92,33 @@ compare = {
 }
 
 math_funcs = {
-    ops.Sin         : np.sin,
-    ops.Asin        : np.arcsin,
-    ops.Sinh        : np.sinh,
-    ops.Asinh       : np.arcsinh,
-    ops.Cos         : np.cos,
-    ops.Acos        : np.arccos,
-    ops.Cosh        : np.cosh,
-    ops.Acosh       : np.arccosh,
-    ops.Tan         : np.tan,
-    ops.Atan        : np.arctan,
-    ops.Atan2       : np.arctan2,
-    ops.Tanh        : np.tanh,
-    ops.Atanh       : np.arctanh,
-    ops.Log         : np.log,
-    ops.Log2        : np.log2,
-    ops.Log10       : np.log10,
-    ops.Log1p       : np.log1p,
-    ops.Exp         : np.exp,
-    ops.Exp2        : np.exp2,
-    ops.Expm1       : np.expm1,
-    ops.Floor       : np.floor,
-    ops.Ceil        : np.ceil,
-    ops.Abs         : np.abs,
+    ops.Sin         : _numpy('sin'),
+    ops.Asin        : _numpy('arcsin'),
+    ops.Sinh        : _numpy('sinh'),
+    ops.Asinh       : _numpy('arcsinh'),
+    ops.Cos         : _numpy('cos'),
+    ops.Acos        : _numpy('arccos'),
+    ops.Cosh        : _numpy('cosh'),
+    ops.Acosh       : _numpy('arccosh'),
+    ops.Tan         : _numpy('tan'),
+    ops.Atan        : _numpy('arctan'),
+    ops.Atan2       : _numpy('arctan2'),
+    ops.Tanh        : _numpy('tanh'),
+    ops.Atanh       : _numpy('arctanh'),
+    ops.Log         : _numpy('log'),
+    ops.Log2        : _numpy('log2'),
+    ops.Log10       : _numpy('log10'),
+    ops.Log1p       : _numpy('log1p'),
+    ops.Exp         : _numpy('exp'),
+    ops.Exp2        : _numpy('exp2'),
+    ops.Expm1       : _numpy('expm1'),
+    ops.Floor       : _numpy('floor'),
+    ops.Ceil        : _numpy('ceil'),
+    ops.Abs         : _numpy('abs'),
     ops.Erfc        : erfc,
-    ops.Rint        : np.rint,
-    ops.Pow         : np.power,
-    ops.Round       : np.round,
+    ops.Rint        : _numpy('rint'),
+    ops.Pow         : _numpy('power'),
+    ops.Round       : _numpy('round'),
 }
 
 #===------------------------------------------------------------------===
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+
+"""
+Encode functions as plain Python data (tuples, lists, dicts, strings and
+numbers), which can be pickled and sent to another process, and decode them
+again. Types are not picklable, so they are encoded in a table:
+
+    types:  [(type_name, [field])]
+
+Values are encoded as tagged tuples, e.g. ('op', 3) for the fourth
+operation in the function, or ('func', 'foo') for a reference to function
+'foo'. References to functions and globals are resolved by name in the
+module of the decoded function.
+"""
+
+from __future__ import print_function, division, absolute_import
+
+from pykit import types
+from pykit.adt import LinkedList
+from pykit.ir import (Module, Function, GlobalValue, Block, Operation, FuncArg,
+                      Constant, Pointer, Struct, Undef, Op)
+from pykit.utils import Temper
+
+typeclasses = dict((cls.__name__, cls) for cls in types.alltypes)
+typeclasses['Typedef'] = types.Typedef
+
+#===------------------------------------------------------------------===
+# Encoding
+#===------------------------------------------------------------------===
+
+class Encoder(object):
+    """
+    Encode the values of a single function. Encoders may share a type table
+    (types, typeindex) to encode each type once for several functions.
+    """
+
+    def __init__(self, func, typetable=None):
+        self.func = func
+        self.types, self.typeindex = typetable or ([], {})
+        # types:        [(type_name, [field])]
+        # typeindex:    { id(type) : index }
+        self.opindex = {}       # { Op : index }
+        self.blockindex = {}    # { Block : index }
+        self.functions = {}     # { name : (argnames, type) }
+        self.globals = {}       # { name : (type, external, address, value) }
+
+    def encode_type(self, ty):
+        # Types are looked up by identity, typedefs compare equal to the
+        # types they alias
+        key = id(ty)
+        if key not in self.typeindex:
+            self.typeindex[key] = len(self.types)
+            self.types.append(None)
+            fields = [self.encode_field(field) for field in ty]
+            self.types[self.typeindex[key]] = (type(ty).__name__, fields)
+        return self.typeindex[key]
+
+    def encode_field(self, field):
+        if isinstance(field, types.Type):
+            return ('type', self.encode_type(field))
+        elif isinstance(field, (list, tuple)):
+            return (type(field).__name__, [self.encode_field(x) for x in field])
+        return ('py', field)
+
+    def encode(self, value):
+        if isinstance(value, Operation):
+            return ('op', self.opindex[value])
+        elif isinstance(value, Block):
+            return ('block', self.blockindex[value])
+        elif isinstance(value, FuncArg):
+            return ('arg', value.result)
+        elif isinstance(value, Function):
+            if value.name not in self.functions:
+                self.functions[value.name] = (list(value.argnames),
+                                              self.encode_type(value.type))
+            return ('func', value.name)
+        elif isinstance(value, GlobalValue):
+            if value.name not in self.globals:
+                self.globals[value.name] = (
+                    self.encode_type(value.type), value.external,
+                    value.address, self.encode(value.value))
+            return ('global', value.name)
+        elif isinstance(value, Constant):
+            return ('const', self.encode(value.const),
+                    self.encode_type(value.type))
+        elif isinstance(value, Undef):
+            return ('undef', self.encode_type(value.type))
+        elif isinstance(value, Pointer):
+            return ('pointer', self.encode(value.addr),
+                    self.encode_type(value.type))
+        elif isinstance(value, Struct):
+            return ('struct', list(value.names),
+                    [self.encode(x) for x in value.values],
+                    self.encode_type(value.type))
+        elif isinstance(value, types.Type):
+            return ('type', self.encode_type(value))
+        elif isinstance(value, (list, tuple)):
+            return (type(value).__name__, [self.encode(x) for x in value])
+        elif isinstance(value, dict):
+            return ('dict', [(self.encode(k), self.encode(v))
+                                 for k, v in value.items()])
+        return ('py', value)
+
+
+def encode_function(func, typetable=None):
+    """
+    Encode a Function as plain data. Pass a shared type table (see Encoder)
+    to share types between functions.
+    """
+    encoder = Encoder(func, typetable)
+
+    for i, block in enumerate(func.blocks):
+        encoder.blockindex[block] = i
+    for i, op in enumerate(func.ops):
+        encoder.opindex[op] = i
+
+    blocks = []
+    for block in func.blocks:
+        ops = []
+        for op in block.ops:
+            metadata = op._metadata and encoder.encode(op._metadata)
+            ops.append((op.result, op.opcode, encoder.encode_type(op.type),
+                        encoder.encode(op.args), metadata))
+        blocks.append((block.name, ops))
+
+    if not isinstance(func.temp, Temper):
+        raise TypeError("Cannot encode temper of function %s" % (func.name,))
+
+    return {
+        'name':         func.name,
+        'argnames':     list(func.argnames),
+        'type':         encoder.encode_type(func.type),
+        'temper':       (dict(func.temp.temps), sorted(func.temp.seen)),
+        'blocks':       blocks,
+        'types':        encoder.types,
+        'functions':    encoder.functions,
+        'globals':      encoder.globals,
+    }
+
+#===------------------------------------------------------------------===
+# Decoding
+#===------------------------------------------------------------------===
+
+class Decoder(object):
+    """Decode values for a single function, see Encoder"""
+
+    def __init__(self, data, func, module, typemap=None):
+        self.data = data
+        self.func = func
+        self.module = module
+        self.typemap = {} if typemap is None else typemap # { index : type }
+        self.ops = []
+        self.blocks = []
+
+    def decode_type(self, idx):
+        if idx in self.typemap:
+            return self.typemap[idx]
+
+        name, fields = self.data['types'][idx]
+        cls = typeclasses[name]
+        if cls is types.Struct:
+            # Structs may be recursive, register before decoding the fields
+            (_, names), (_, fieldtypes) = fields
+            ty = self.typemap[idx] = types.Struct(
+                [self.decode_field(x) for x in names], [])
+            ty.types.extend(self.decode_field(x) for x in fieldtypes)
+        else:
+            ty = self.typemap[idx] = cls(*map(self.decode_field, fields))
+        return ty
+
+    def decode_field(self, field):
+        tag, value = field
+        if tag == 'type':
+            return self.decode_type(value)
+        elif tag == 'list':
+            return [self.decode_field(x) for x in value]
+        elif tag == 'tuple':
+            return tuple(self.decode_field(x) for x in value)
+        return value
+
+    def decode(self, value):
+        tag = value[0]
+        if tag == 'op':
+            return self.ops[value[1]]
+        elif tag == 'block':
+            return self.blocks[value[1]]
+        elif tag == 'arg':
+            return self.func.get_arg(value[1])
+        elif tag == 'func':
+            return self.lookup_function(value[1])
+        elif tag == 'global':
+            return self.lookup_global(value[1])
+        elif tag == 'const':
+            return Constant(self.decode(value[1]), self.decode_type(value[2]))
+        elif tag == 'undef':
+            return Undef(self.decode_type(value[1]))
+        elif tag == 'pointer':
+            return Pointer(self.decode(value[1]), self.decode_type(value[2]))
+        elif tag == 'struct':
+            return Struct(value[1], [self.decode(x) for x in value[2]],
+                          self.decode_type(value[3]))
+        elif tag == 'type':
+            return self.decode_type(value[1])
+        elif tag == 'list':
+            return [self.decode(x) for x in value[1]]
+        elif tag == 'tuple':
+            return tuple(self.decode(x) for x in value[1])
+        elif tag == 'dict':
+            return dict((self.decode(k), self.decode(v)) for k, v in value[1])
+        else:
+            assert tag == 'py', tag
+            return value[1]
+
+    def lookup_function(self, name):
+        if self.func is not None and name == self.func.name:
+            return self.func
+
+        func = self.module.get_function(name)
+        if func is None:
+            # Declare the function in the module
+            argnames, type = self.data['functions'][name]
+            func = Function(name, list(argnames), self.decode_type(type))
+            self.module.add_function(func)
+        return func
+
+    def lookup_global(self, name):
+        gv = self.module.get_global(name)
+        if gv is None:
+            type, external, address, value = self.data['globals'][name]
+            gv = GlobalValue(name, self.decode_type(type), external, address,
+                             self.decode(value))
+            self.module.add_global(gv)
+        return gv
+
+
+def decode_function(data, func=None, module=None, typemap=None):
+    """
+    Decode a Function from plain data. If `func` is given, the function
+    is updated in place, which keeps references to the function valid.
+    Otherwise a new function is created and added to `module` (if given).
+
+    :param typemap: { index : type } cache of decoded types, which may be
+                    shared between functions with a shared type table
+    """
+    if func is None:
+        func = Function(data['name'], [], None)
+        if module is not None:
+            module.add_function(func)
+    module = module or func.module or Module()
+
+    decoder = Decoder(data, func, module, typemap)
+
+    # Reset function, keeping the FuncArgs that are still valid
+    func.type = decoder.decode_type(data['type'])
+    func.argnames = list(data['argnames'])
+    func.argdict = dict((name, arg) for name, arg in func.argdict.items()
+                            if name in func.argnames)
+    for name, arg in func.argdict.items():
+        arg.type = func.type.argtypes[func.argnames.index(name)]
+
+    func.temp = Temper()
+    func.blocks = LinkedList()
+    func.blockmap = {}
+    for arg in func.argdict.values():
+        arg._uses.clear()
+
+    # Create blocks and operations, arguments may refer to later operations
+    for name, ops in data['blocks']:
+        block = func.add_block(Block(name, func))
+        decoder.blocks.append(block)
+        for result, opcode, type, args, metadata in ops:
+            op = Op(opcode, decoder.decode_type(type), [], result)
+            block.append(op)
+            decoder.ops.append(op)
+
+    allops = (op for name, ops in data['blocks'] for op in ops)
+    for op, (result, opcode, type, args, metadata) in zip(decoder.ops, allops):
+        op.set_args(decoder.decode(args))
+        if metadata:
+            op.metadata = decoder.decode(metadata)
+
+    temps, seen = data['temper']
+    func.temp = Temper(temps, seen)
+    return func
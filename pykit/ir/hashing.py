@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+"""
+Structural hashing of functions and modules, for use as cache keys:
+
+    key = hash_function(func)   # hex digest
+
+The hash covers the structure of the IR: opcodes, types, constants,
+metadata and the shape of the control flow graph. Register names and block
+labels are ignored, operations, arguments and blocks are identified by the
+order in which they are first encountered in the function. Function and
+global names are part of the hash, since they are visible to other code.
+
+Hashes are stable across processes and Python versions. Python objects
+that have no structural encoding (see Hasher.encode_py) are hashed by
+their qualified name, if it refers to them (module-level functions and
+classes), or by the key returned by their stable_key() method. Other
+objects, such as closures and lambdas, raise a HashError: their repr may
+differ between processes (e.g. contain an address), and their name does not
+identify them.
+"""
+
+from __future__ import print_function, division, absolute_import
+import sys
+import numbers
+import hashlib
+
+from pykit import types
+from pykit.ir import (Module, Function, GlobalValue, Block, Operation, FuncArg,
+                      Constant, Pointer, Struct, Undef)
+
+try:
+    string_types = (str, unicode)
+except NameError:
+    string_types = (str,)
+
+class HashError(TypeError):
+    """Raised for values that have no stable hash"""
+
+class _Buffer(object):
+    """Hash object that collects its input"""
+
+    def __init__(self):
+        self.parts = []
+
+    def update(self, s):
+        self.parts.append(s)
+
+#===------------------------------------------------------------------===
+# Hasher
+#===------------------------------------------------------------------===
+
+class Hasher(object):
+    """
+    Feed a canonical encoding of IR values into a hash object.
+
+        numbering:  { Operation | FuncArg | Block : index }
+    """
+
+    def __init__(self, hash=None):
+        self.hash = hash or hashlib.sha1()
+        self.numbering = {}
+        self.counts = { 'op': 0, 'arg': 0, 'block': 0 }
+
+    def write(self, s):
+        if not isinstance(s, bytes):
+            s = s.encode('utf-8')
+        self.hash.update(s)
+
+    def token(self, s):
+        # Length prefix, so that tokens are unambiguous
+        if not isinstance(s, bytes):
+            s = s.encode('utf-8')
+        self.write("%d:" % len(s))
+        self.hash.update(s)
+
+    def hexdigest(self):
+        return self.hash.hexdigest()
+
+    def reset(self):
+        """Start a new numbering of local values, for the next function"""
+        self.numbering, self.counts = {}, dict.fromkeys(self.counts, 0)
+
+    # __________________________________________________________________
+    # Values
+
+    def number(self, value, kind):
+        """Number local values in order of first encounter"""
+        if value not in self.numbering:
+            self.numbering[value] = self.counts[kind]
+            self.counts[kind] += 1
+        return self.numbering[value]
+
+    def encode_type(self, ty):
+        if ty is None:
+            self.token("<none>")
+            return
+
+        # Encode the structural key, which is the same for all ways of
+        # writing out a (recursive) type, and keep it with the canonical type
+        canonical = types.intern(ty)
+        if canonical._encoding is None:
+            hasher = Hasher(_Buffer())
+            hasher._encode_key(types.structural_key(canonical))
+            canonical._encoding = b"".join(hasher.hash.parts)
+        self.hash.update(canonical._encoding)
+
+    def _encode_key(self, key):
+        if key[0] == '<rec>':
+            # Recursive reference to an enclosing type
+            self.token("<rec %d>" % key[1])
+        elif key[0] == '<id>':
+            raise HashError("Cannot hash type field without a stable hash")
+        elif key[0] in ('list', 'tuple'):
+            self.write("[")
+            for x in key[1:]:
+                self._encode_keyfield(x)
+            self.write("]")
+        else:
+            self.token(key[0])
+            self.write("(")
+            for field in key[1:]:
+                self._encode_keyfield(field)
+            self.write(")")
+
+    def _encode_keyfield(self, field):
+        if isinstance(field, tuple):
+            self._encode_key(field)
+        else:
+            self.encode_py(field)
+
+    def encode(self, value):
+        """Encode an argument or metadata value"""
+        if isinstance(value, Operation):
+            self.token("op%d" % self.number(value, 'op'))
+        elif isinstance(value, FuncArg):
+            self.token("arg%d" % self.number(value, 'arg'))
+        elif isinstance(value, Block):
+            self.token("block%d" % self.number(value, 'block'))
+        elif isinstance(value, Function):
+            self.token("func")
+            self.token(value.name)
+            self.encode_type(value.type)
+        elif isinstance(value, GlobalValue):
+            self.token("global")
+            self.token(value.name)
+            self.encode_type(value.type)
+        elif isinstance(value, Constant):
+            self.token("const")
+            self.encode_type(value.type)
+            self.encode(value.const)
+        elif isinstance(value, Undef):
+            self.token("undef")
+            self.encode_type(value.type)
+        elif isinstance(value, Pointer):
+            self.token("pointer")
+            self.encode_type(value.type)
+            self.encode(value.addr)
+        elif isinstance(value, Struct):
+            self.token("struct")
+            self.encode_type(value.type)
+            self.encode(list(value.names))
+            self.encode(list(value.values))
+        elif isinstance(value, types.Type):
+            self.token("type")
+            self.encode_type(value)
+        elif isinstance(value, (list, tuple)):
+            self.write("[" if isinstance(value, list) else "(")
+            for x in value:
+                self.encode(x)
+            self.write("]" if isinstance(value, list) else ")")
+        elif isinstance(value, dict):
+            self.write("{")
+            for k in sorted(value, key=_sortkey):
+                self.encode(k)
+                self.write(":")
+                self.encode(value[k])
+            self.write("}")
+        else:
+            self.encode_py(value)
+
+    def encode_py(self, value):
+        """Encode a Python value"""
+        if value is None or isinstance(value, bool):
+            self.token(repr(value))
+        elif isinstance(value, numbers.Integral):
+            self.token("int:%d" % value)
+        elif isinstance(value, (float, complex)):
+            # repr() of floats is exact, and the same across platforms
+            self.token("%s:%r" % (type(value).__name__, value))
+        elif isinstance(value, string_types):
+            self.write("str")
+            self.token(value)
+        elif _global_name(value):
+            self.token("py:%s" % (_global_name(value),))
+        elif hasattr(value, 'stable_key'):
+            cls = type(value)
+            self.token("py:%s.%s" % (cls.__module__, cls.__name__))
+            self.encode(value.stable_key())
+        else:
+            raise HashError(
+                "Cannot hash %r, %s objects need a stable_key() method" % (
+                    value, type(value).__name__))
+
+    # __________________________________________________________________
+    # Functions and modules
+
+    def hash_function(self, func, name=True):
+        self.token("function")
+        if name:
+            self.token(func.name)
+        self.encode_type(func.type)
+        for arg in func.args:
+            self.encode(arg)
+
+        for block in func.blocks:
+            self.token("block%d" % self.number(block, 'block'))
+            for op in block.ops:
+                self.token("op%d" % self.number(op, 'op'))
+                self.token(op.opcode)
+                self.encode_type(op.type)
+                self.encode(op.args)
+                if op._metadata:
+                    self.encode(op._metadata)
+                self.write(";")
+
+    def hash_module(self, module):
+        self.token("module")
+        for name, gv in sorted(module.globals.items()):
+            self.token("global")
+            self.token(name)
+            self.encode_type(gv.type)
+            self.encode_py(gv.external)
+            self.encode_py(gv.address)
+            self.encode(gv.value)
+
+        for name, func in sorted(module.functions.items()):
+            # Each function has its own numbering
+            self.reset()
+            self.hash_function(func)
+
+
+def _global_name(value):
+    """Return module.name if that is how `value` is found, or None"""
+    module = getattr(value, '__module__', None)
+    name = getattr(value, '__name__', None)
+    if (isinstance(module, string_types) and isinstance(name, string_types)
+            and getattr(sys.modules.get(module), name, None) is value):
+        return "%s.%s" % (module, name)
+    return None
+
+def _sortkey(key):
+    return (type(key).__name__, str(key))
+
+#===------------------------------------------------------------------===
+# API
+#===------------------------------------------------------------------===
+
+def hash_function(func, name=True):
+    """
+    Return a structural hash (hex digest) of `func`. Set name=False to ignore
+    the function name.
+    """
+    hasher = Hasher()
+    hasher.hash_function(func, name)
+    return hasher.hexdigest()
+
+def hash_module(module):
+    """Return a structural hash (hex digest) of `module`"""
+    hasher = Hasher()
+    hasher.hash_module(module)
+    return hasher.hexdigest()
+
+def structural_hash(value):
+    """Hash a Function or Module"""
+    if isinstance(value, Module):
+        return hash_module(value)
+    return hash_function(value)
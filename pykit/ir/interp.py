@@ -7,7 +7,9 @@ IR interpreter.
 from __future__ import print_function, division, absolute_import
 
 import ctypes
+import struct
 import operator
+import types as pytypes
 try:
     import exceptions
 except ImportError:
@@ -16,10 +18,9 @@ from itertools import chain, product
 from collections import namedtuple
 from functools import partial
 
-import numpy as np
-
 from pykit import types
-from pykit.ir import Function, Block, GlobalValue, Const, combine, ArgLoader
+from pykit.ir import (Function, Block, GlobalValue, Const, Operation, FuncArg,
+                      combine, ArgLoader)
 from pykit.ir import ops, linearize, defs, tracing
 from pykit.utils import ValueDict
 
@@ -54,6 +55,7 @@ class Interp(object):
         exc_model:      ExceptionModel that knows how to deal with exceptions
         argloader:      InterpArgloader: knows how pykit Values are associated
                         with runtime (stack) values (loads from the store)
+        program:        Pre-decoded Program for func
         ops:            Flat list of instruction targets (['%0'])
         blockstarts:    Dict mapping block labels to address offsets
         prevblock:      Previously executing basic block
@@ -62,9 +64,12 @@ class Interp(object):
         exc_handlers:   List of exception target blocks to try
         exception:      Currently raised exception
         refs:           { id(obj) : Reference }
+        profile:        profiling.FunctionProfile recording executed blocks
+                        and edges, or None
     """
 
-    def __init__(self, func, env, exc_model, argloader, tracer):
+    def __init__(self, func, env, exc_model, argloader, tracer, program=None,
+                 cache=None, profile=None):
         self.func = func
         self.env = env
         self.exc_model = exc_model
@@ -74,14 +79,17 @@ class Interp(object):
             'env':       env,
             'exc_model': exc_model,
             'tracer':    tracer,
+            'cache':     cache,
         }
 
-        self.ops, self.blockstarts = linearize(func)
+        self.program = program or Program(func)
+        self.ops, self.blockstarts = self.program.ops, self.program.blockstarts
         self.lastpc = 0
         self._pc = 0
         self.prevblock = None
         self.exc_handlers = None
         self.exception = None
+        self.profile = profile
 
     # __________________________________________________________________
     # Utils
@@ -116,6 +124,8 @@ class Interp(object):
     def blockswitch(self, oldblock, newblock, valuemap):
         self.prevblock = oldblock
         self.exc_handlers = []
+        if self.profile is not None:
+            self.profile.record(oldblock, newblock)
 
         self.execute_phis(newblock, valuemap)
 
@@ -124,12 +134,14 @@ class Interp(object):
         Execute all phis in parallel, i.e. execute them before updating the
         store.
         """
-        new_values = {}
-        for op in block.leaders:
-            if op.opcode == 'phi':
-                new_values[op.result] = self.execute_phi(op)
-
-        valuemap.update(new_values)
+        phis = self.program.phis.get(block)
+        if phis:
+            if self.prevblock not in phis:
+                raise RuntimeError(
+                    "Previous block %r not a predecessor of %r!" % (
+                        self.prevblock and self.prevblock.name, block.name))
+            results, keys = phis[self.prevblock]
+            valuemap.update(zip(results, [valuemap[key] for key in keys]))
 
     def execute_phi(self, op):
         for i, block in enumerate(op.args[0]):
@@ -352,68 +364,265 @@ class InterpArgLoader(ArgLoader):
     def load_Undef(self, arg):
         return Undef
 
+#===------------------------------------------------------------------===
+# Pre-decoding
+#===------------------------------------------------------------------===
+
+_interp = ('interp',) # valuemap key of the Interp executing the function
+
+def _constkey(value):
+    """
+    Key of a constant, equal keys denote the same value. Floats are keyed by
+    their bits, since 0.0 == -0.0 and nan != nan.
+    """
+    if isinstance(value, float):
+        return (type(value), struct.pack('<d', value))
+    elif isinstance(value, complex):
+        return (type(value), struct.pack('<dd', value.real, value.imag))
+    try:
+        constkey = (type(value), value)
+        hash(constkey)
+    except TypeError:
+        constkey = id(value)
+    return constkey
+
+class Program(object):
+    """
+    Pre-decoded function, which the interpreter can run without inspecting
+    the IR. Each op is decoded to a tuple (fn, getter, nargs, result):
+
+        fn:         handler executing the op
+        getter:     loads the arguments from the valuemap, this is a single
+                    key for nargs == 1, or a function returning a tuple of
+                    arguments otherwise
+        result:     valuemap key of the result
+
+    Constant arguments are stored in the valuemap under unique keys (see
+    `constants`), and the Interp under the `_interp` key for handlers that
+    need the interpreter.
+
+        ops:        [Op] indexed by pc
+        code:       [(fn, getter, nargs, result)] indexed by pc
+        blockstarts: { block_name : pc }
+        blocks:     [Block] indexed by pc
+        constants:  { key : python value }
+        phis:       { Block : { pred_block : ([phi_result], [value_key]) } }
+    """
+
+    def __init__(self, func, handlers=None):
+        self.func = func
+        self.handlers = handlers or {}
+        self.ops, self.blockstarts = linearize(func)
+        self.blocks = [op.block for op in self.ops]
+        self.constants = {}
+        self._constkeys = {}
+        self._argloader = InterpArgLoader()
+        self.code = [self.decode(op) for op in self.ops]
+        self.phis = self.decode_phis(func)
+
+    def key(self, arg):
+        """valuemap key for an argument"""
+        if isinstance(arg, (Operation, FuncArg)):
+            return arg.result
+
+        value = self._argloader.load_op(arg)
+        constkey = _constkey(value)
+        if constkey not in self._constkeys:
+            key = ('const', len(self._constkeys))
+            self._constkeys[constkey] = key
+            self.constants[key] = value
+        return self._constkeys[constkey]
+
+    def decode(self, op):
+        if op.opcode == 'phi':
+            # Executed on block entry, see Interp.execute_phis
+            fn, pass_interp = _identity, False
+            args = [op]
+        else:
+            fn, pass_interp = self.lookup_handler(op.opcode)
+            args = list(op.args)
+
+        if pass_interp:
+            args.insert(0, _interp)
+
+        keys = [[self.key(x) for x in arg] if isinstance(arg, list) else
+                    (arg if arg is _interp else self.key(arg))
+                        for arg in args]
+
+        if any(isinstance(key, list) for key in keys):
+            getter = _nested_getter(keys)
+        elif len(keys) == 1:
+            [getter] = keys
+        else:
+            getter = _getter(keys)
+
+        return fn, getter, len(keys), op.result
+
+    def lookup_handler(self, opcode):
+        """
+        Find the handler for an opcode, returning (handler, pass_interp)
+        where `pass_interp` indicates that the interpreter needs to be passed
+        as the first argument.
+        """
+        if opcode in self.handlers:
+            return self.handlers[opcode], True
+
+        for cls in Interp.__mro__:
+            if opcode in cls.__dict__:
+                attr = cls.__dict__[opcode]
+                if isinstance(attr, staticmethod):
+                    return getattr(Interp, opcode), False
+                return attr, isinstance(attr, pytypes.FunctionType)
+
+        raise AttributeError("'Interp' object has no attribute %r" % (opcode,))
+
+    def decode_phis(self, func):
+        phis = {}
+        for block in func.blocks:
+            table = {}
+            for op in block.leaders:
+                if op.opcode == 'phi':
+                    for pred, value in zip(*op.args):
+                        results, keys = table.setdefault(pred, ([], []))
+                        results.append(op.result)
+                        keys.append(self.key(value))
+            if table:
+                phis[block] = table
+
+        return phis
+
+def _identity(x):
+    return x
+
+def _getter(keys):
+    if not keys:
+        return None
+    elif len(keys) == 1:
+        # itemgetter() returns a single value for a single key
+        [key] = keys
+        return lambda valuemap: (valuemap[key],)
+    return operator.itemgetter(*keys)
+
+def _nested_getter(keys):
+    def getter(valuemap):
+        return tuple([[valuemap[k] for k in key] if isinstance(key, list) else
+                          valuemap[key] for key in keys])
+    return getter
+
+def get_program(func, env=None, cache=None):
+    """
+    Get the pre-decoded Program for `func`. Programs are cached in `cache`,
+    or env["interp.cache"] if set, as long as the handlers are unchanged.
+    The cache must be cleared when a function is modified.
+    """
+    handlers = env and env.get("interp.handlers") or {}
+    if env and env.get("interp.cache") is not None:
+        cache = env["interp.cache"]
+
+    program = cache.get(func) if cache is not None else None
+    if program is None or program.handlers != handlers:
+        program = Program(func, handlers)
+        if cache is not None:
+            cache[func] = program
+
+    return program
+
+#===------------------------------------------------------------------===
+# Run
+#===------------------------------------------------------------------===
+
 def run(func, env=None, exc_model=None, _state=None, args=(),
-        tracer=tracing.DummyTracer()):
+        tracer=tracing.DummyTracer(), cache=None):
     """
     Interpret function. Raises UncaughtException(exc) for uncaught exceptions
     """
     assert len(func.args) == len(args)
 
-    tracer.push(tracing.Call(func, args))
+    if cache is None:
+        cache = {} # Cache programs of functions called during this run
+    program = get_program(func, env, cache)
 
     # -------------------------------------------------
     # Set up interpreter
 
-
-    valuemap = dict(zip(func.argnames, args)) # { '%0' : pyval }
+    valuemap = dict(program.constants)
+    valuemap.update(zip(func.argnames, args)) # { '%0' : pyval }
     argloader = InterpArgLoader(valuemap)
+    profile = env.get("interp.profile") if env else None
+    if profile is not None:
+        profile = profile.for_function(func)
     interp = Interp(func, env, exc_model or ExceptionModel(),
-                    argloader, tracer)
-    if env:
-        handlers = env.get("interp.handlers") or {}
-    else:
-        handlers = {}
+                    argloader, tracer, program, cache, profile)
+    valuemap[_interp] = interp
 
-    # -------------------------------------------------
-    # Eval loop
+    if type(tracer) is tracing.DummyTracer and not tracer.record:
+        return _run_fast(interp, program, valuemap)
+    return _run_traced(interp, program, valuemap, tracer)
 
-    curblock = None
-    while True:
-        # -------------------------------------------------
-        # Block transitioning
+def _run_fast(interp, program, valuemap):
+    """Eval loop without tracing"""
+    code, blocks = program.code, program.blocks
 
-        op = interp.op
-        if op.block != curblock:
-            interp.blockswitch(curblock, op.block, valuemap)
-            curblock = op.block
+    pc = 0
+    interp.blockswitch(None, blocks[pc], valuemap)
+    while True:
+        fn, getter, nargs, result = code[pc]
+        if nargs == 1:
+            value = fn(valuemap[getter])
+        elif nargs:
+            value = fn(*getter(valuemap))
+        else:
+            value = fn()
+        valuemap[result] = value
 
         # -------------------------------------------------
-        # Find handler
+        # Advance PC
 
-        if op.opcode in handlers:
-            fn = partial(handlers[op.opcode], interp)
+        newpc = interp._pc
+        if newpc == pc:
+            pc += 1
+            interp._pc = pc
+        elif newpc == -1:
+            return value
         else:
-            fn = getattr(interp, op.opcode)
+            interp.blockswitch(blocks[pc], blocks[newpc], valuemap)
+            pc = newpc
+
+def _run_traced(interp, program, valuemap, tracer):
+    """Eval loop pushing trace items to the tracer"""
+    func, argloader = interp.func, interp.argloader
+    tracer.push(tracing.Call(func, [valuemap[name] for name in func.argnames]))
+
+    code, blocks = program.code, program.blocks
+
+    interp.blockswitch(None, blocks[0], valuemap)
+    while True:
+        op = interp.op
+        fn, getter, nargs, result = code[interp.pc]
 
         # -------------------------------------------------
         # Load arguments
 
         args = argloader.load_args(op)
+        tracer.push(tracing.Op(op, args))
 
         # -------------------------------------------------
         # Execute...
 
-        tracer.push(tracing.Op(op, args))
-
         oldpc = interp.pc
         try:
-            result = fn(*args)
-        except UncaughtException, e:
+            if nargs == 1:
+                value = fn(valuemap[getter])
+            elif nargs:
+                value = fn(*getter(valuemap))
+            else:
+                value = fn()
+        except UncaughtException as e:
             tracer.push(tracing.Exc(e))
             raise
-        valuemap[op.result] = result
+        valuemap[result] = value
 
-        tracer.push(tracing.Res(op, args, result))
+        tracer.push(tracing.Res(op, args, value))
 
         # -------------------------------------------------
         # Advance PC
@@ -422,5 +631,7 @@ def run(func, env=None, exc_model=None, _state=None, args=(),
             interp.incr_pc()
         elif interp.pc == -1:
             # Returning...
-            tracer.push(tracing.Ret(result))
-            return result
+            tracer.push(tracing.Ret(value))
+            return value
+        else:
+            interp.blockswitch(blocks[oldpc], blocks[interp.pc], valuemap)
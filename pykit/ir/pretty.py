@@ -5,7 +5,8 @@ Pretty print pykit IR.
 """
 
 from __future__ import print_function, division, absolute_import
-from pykit.utils import hashable
+import re
+
 
 prefix = lambda s: '%' + s
 indent = lambda s: '\n'.join('    ' + s for s in s.splitlines())
@@ -29,6 +30,8 @@ def ffunc(f):
     restype = ftype(f.type.restype)
     types, names = map(ftype, f.type.argtypes), map(prefix, f.argnames)
     args = ajoin(map(sjoin, zip(types, names)))
+    if f.type.varargs:
+        args = ajoin([args, "..."]) if args else "..."
     header = sjoin(["function", restype, f.name + parens(args)])
     return njoin([header + " {", njoin(map(fblock, f.blocks)), "}"])
 
@@ -42,24 +45,41 @@ def fblock(block):
 def _farg(oparg):
     from pykit import ir
 
-    if isinstance(oparg, (ir.Function, ir.Block)):
+    if isinstance(oparg, (ir.Function, ir.Block, ir.GlobalValue)):
         return prefix(oparg.name)
     elif isinstance(oparg, list):
         return "[%s]" % ", ".join(_farg(arg) for arg in oparg)
-    elif isinstance(oparg, ir.Op):
+    elif isinstance(oparg, (ir.Op, ir.FuncArg)):
         return prefix(str(oparg.result))
     else:
-        return str(oparg)
+        return fpyval(oparg)
 
 def fop(op):
     body = "%s(%s)" % (op.opcode, ajoin(map(_farg, op.args)))
     return '%%%-5s = %s -> %s' % (op.result, body, ftype(op.type))
 
+_identifier = re.compile(r"[A-Za-z_][\w.]*$")
+_reserved = set(["None", "True", "False", "inf", "nan", "const", "Undef"])
+
+def fpyval(value):
+    """Format a Python value, such that it can be parsed back"""
+    if isinstance(value, float):
+        return repr(value)
+    elif isinstance(value, str) and not (_identifier.match(value) and
+                                         value not in _reserved):
+        return repr(value)
+    return str(value)
+
 def fconst(c):
-    return 'const(%s, %s)' % (c.const, ftype(c.type))
+    return 'const(%s, %s)' % (fpyval(c.const), ftype(c.type))
 
 def fglobal(val):
-    return "global %{0} = {1}".format(val.name, ftype(val.type))
+    result = "global %{0} = {1}".format(val.name, ftype(val.type))
+    if val.external:
+        result = "external " + result
+    if val.value is not None:
+        result = sjoin([result, str(val.value)])
+    return result
 
 def fundef(val):
     return '((%s) Undef)' % (val.type,)
@@ -77,8 +97,8 @@ def ftype(val, seen=None):
 
     seen.add(id(val))
 
-    if hashable(val) and val in types.type2name:
-        result = types.type2name[val]
+    if types.structural_key(val) in types.type2name:
+        result = types.typename(val)
     elif val.is_struct:
         args = ", ".join('%s:%s' % (name, ftype(ty, seen))
                          for name, ty in zip(val.names, val.types))
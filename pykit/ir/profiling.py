@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+
+"""
+Block and edge execution profiles, collected by the interpreter for
+profile-guided optimization. Install a Profile in the environment to
+profile all functions interpreted with that environment:
+
+    env["interp.profile"] = Profile()
+    interp.run(func, env, args=args)
+    env["interp.profile"].save("prof.json")
+
+For each function we count how often each basic block executed, and how
+often each control flow edge (pred, succ) was taken. Counts are stored in
+flat arrays indexed by block or edge number, and blocks are identified by
+name, so a profile can be saved, loaded and merged across runs and
+processes, and applied to a fresh copy of the function.
+"""
+
+from __future__ import print_function, division, absolute_import
+import json
+from array import array
+from collections import OrderedDict
+
+from pykit.ir import Block, tracing
+
+#===------------------------------------------------------------------===
+# Profiles
+#===------------------------------------------------------------------===
+
+class FunctionProfile(object):
+    """
+    Execution counts for a single function.
+
+        blocks:         [block_name]
+        block_counts:   array of counts, indexed like `blocks`
+        edges:          [(pred_name, succ_name)]
+        edge_counts:    array of counts, indexed like `edges`
+    """
+
+    def __init__(self, name, blocks=(), edges=()):
+        self.name = name
+        self.blocks = []
+        self.blockindex = {}    # { block_name : index }
+        self.block_counts = array('l')
+        self.edges = []
+        self.edgeindex = {}     # { (pred_name, succ_name) : index }
+        self.edge_counts = array('l')
+
+        for block in blocks:
+            self.add_block(block)
+        for pred, succ in edges:
+            self.add_edge(pred, succ)
+
+    @classmethod
+    def from_function(cls, func):
+        """Create an empty profile with all blocks and edges of `func`"""
+        from pykit.analysis import cfa
+
+        cfg = cfa.cfg(func)
+        return cls(func.name,
+                   [block.name for block in func.blocks],
+                   [(pred.name, succ.name) for pred, succ in cfg.edges()])
+
+    def add_block(self, name):
+        if name not in self.blockindex:
+            self.blockindex[name] = len(self.blocks)
+            self.blocks.append(name)
+            self.block_counts.append(0)
+        return self.blockindex[name]
+
+    def add_edge(self, pred, succ):
+        edge = (pred, succ)
+        if edge not in self.edgeindex:
+            self.edgeindex[edge] = len(self.edges)
+            self.edges.append(edge)
+            self.edge_counts.append(0)
+        return self.edgeindex[edge]
+
+    # __________________________________________________________________
+    # Recording
+
+    def record(self, oldblock, newblock, count=1):
+        """Record a transfer of control from oldblock (or entry) to newblock"""
+        succ = newblock.name
+        i = self.blockindex.get(succ)
+        if i is None:
+            i = self.add_block(succ)
+        self.block_counts[i] += count
+
+        if oldblock is not None:
+            edge = (oldblock.name, succ)
+            i = self.edgeindex.get(edge)
+            if i is None:
+                i = self.add_edge(*edge)
+            self.edge_counts[i] += count
+
+    # __________________________________________________________________
+    # Queries
+
+    def block_count(self, block):
+        """Execution count of a Block or block name"""
+        i = self.blockindex.get(getattr(block, 'name', block))
+        return 0 if i is None else self.block_counts[i]
+
+    def edge_count(self, pred, succ):
+        """Number of times control flowed from `pred` to `succ`"""
+        edge = (getattr(pred, 'name', pred), getattr(succ, 'name', succ))
+        i = self.edgeindex.get(edge)
+        return 0 if i is None else self.edge_counts[i]
+
+    def entry_count(self):
+        """Number of times the function was entered"""
+        return self.block_counts[0] if self.blocks else 0
+
+    def branch_weights(self, op):
+        """
+        Return the counts of the targets of a terminator `op` (jump or
+        cbranch), in the order of the targets.
+        """
+        targets = [arg for arg in op.args if isinstance(arg, Block)]
+        return [self.edge_count(op.block, target) for target in targets]
+
+    # __________________________________________________________________
+
+    def merge(self, other):
+        """Add the counts of `other` to this profile"""
+        for name, count in zip(other.blocks, other.block_counts):
+            self.block_counts[self.add_block(name)] += count
+        for edge, count in zip(other.edges, other.edge_counts):
+            self.edge_counts[self.add_edge(*edge)] += count
+
+    def to_dict(self):
+        return {
+            "blocks":       self.blocks,
+            "block_counts": list(self.block_counts),
+            "edges":        [list(edge) for edge in self.edges],
+            "edge_counts":  list(self.edge_counts),
+        }
+
+    @classmethod
+    def from_dict(cls, name, data):
+        fprofile = cls(name, data["blocks"], data["edges"])
+        fprofile.block_counts = array('l', data["block_counts"])
+        fprofile.edge_counts = array('l', data["edge_counts"])
+        return fprofile
+
+    def __repr__(self):
+        return "FunctionProfile(%s, %d blocks)" % (self.name, len(self.blocks))
+
+
+class Profile(object):
+    """
+    Execution profiles for all functions, keyed by function name.
+
+        functions:  { func_name : FunctionProfile }
+    """
+
+    def __init__(self):
+        self.functions = OrderedDict()
+
+    def for_function(self, func):
+        """Get or create the profile for `func`"""
+        fprofile = self.functions.get(func.name)
+        if fprofile is None:
+            fprofile = FunctionProfile.from_function(func)
+            self.functions[func.name] = fprofile
+        return fprofile
+
+    def __getitem__(self, func):
+        return self.functions[getattr(func, 'name', func)]
+
+    def __contains__(self, func):
+        return getattr(func, 'name', func) in self.functions
+
+    def get(self, func):
+        return self.functions.get(getattr(func, 'name', func))
+
+    def merge(self, other):
+        """Add the counts of another Profile to this profile"""
+        for name, fprofile in other.functions.items():
+            if name not in self.functions:
+                self.functions[name] = FunctionProfile(name)
+            self.functions[name].merge(fprofile)
+
+    # __________________________________________________________________
+
+    def to_dict(self):
+        return dict((name, fprofile.to_dict())
+                        for name, fprofile in self.functions.items())
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    @classmethod
+    def from_dict(cls, data):
+        profile = cls()
+        for name in sorted(data):
+            profile.functions[name] = FunctionProfile.from_dict(name, data[name])
+        return profile
+
+    @classmethod
+    def from_json(cls, s):
+        return cls.from_dict(json.loads(s))
+
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            f.write(self.to_json())
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as f:
+            return cls.from_json(f.read())
+
+    def __repr__(self):
+        return "Profile(%s)" % (", ".join(self.functions),)
+
+#===------------------------------------------------------------------===
+# Traces
+#===------------------------------------------------------------------===
+
+def profile_trace(stmts, profile=None):
+    """
+    Build a profile from the trace items recorded by a tracing.Tracer
+    (with record=True).
+    """
+    profile = profile or Profile()
+    stack = [] # [(FunctionProfile, current block)]
+
+    for item in stmts:
+        if isinstance(item, tracing.Call):
+            stack.append([profile.for_function(item.func), None])
+        elif isinstance(item, tracing.Op):
+            frame = stack[-1]
+            block = item.op.block
+            if item.op is block.ops.head:
+                frame[0].record(frame[1], block)
+                frame[1] = block
+        elif isinstance(item, (tracing.Ret, tracing.Exc)):
+            stack.pop()
+
+    return profile
+
+#===------------------------------------------------------------------===
+# Annotation
+#===------------------------------------------------------------------===
+
+def annotate(func, fprofile):
+    """
+    Attach the profile counts to the terminators of `func` as
+    "profile.weights" metadata, for use by later passes and code generation
+    (e.g. LLVM branch weights).
+    """
+    for block in func.blocks:
+        op = block.terminator
+        if op.opcode == 'cbranch':
+            op.add_metadata({"profile.weights": fprofile.branch_weights(op)})
@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+
+"""
+Binary serialization of modules, for shipping precompiled IR and handing
+IR between processes:
+
+    serialize.dump(module, "lib.pykit")
+    module = serialize.load("lib.pykit")
+
+    reader = serialize.open_module("lib.pykit")   # mmap the file
+    func = reader.get_function("f")               # decode only 'f'
+
+Functions are first encoded as plain data (pykit.ir.encoding), which is
+written as a stream of tagged binary records. All strings are interned in a
+string table, and all types in a type table shared by the functions. The
+layout of a file is:
+
+    header:     magic, version, offsets of the sections below
+    functions:  function bodies, as block and operation records
+    globals:    the global values of the module
+    index:      [(name, type, argnames, offset)] for each function
+    types:      offset table, followed by [(type_name, [field])]
+    strings:    offset table, followed by UTF-8 data
+
+The reader declares all functions and globals up front, and decodes
+function bodies on demand. Since tables are read through offset tables,
+opening a file only touches the header, index and globals.
+"""
+
+from __future__ import print_function, division, absolute_import
+import io
+import sys
+import mmap
+import struct
+
+from pykit.ir import Module, Function, GlobalValue
+from pykit.ir import encoding
+
+VERSION = 1
+
+_magic = b'PYKITIR\0'
+_header = struct.Struct('<8sIQQQQ') # magic, version, globals, index, types,
+                                    # strings offsets
+_u32 = struct.Struct('<I')
+_u64 = struct.Struct('<Q')
+_op = struct.Struct('<iII')         # result (-1 for None), opcode, type
+_pair = struct.Struct('<II')
+
+# Value tags
+(NONE, TRUE, FALSE, INT32, INT64, BIGINT, FLOAT, COMPLEX,
+ STR, TEXT, BYTES, LIST, TUPLE, DICT) = range(14)
+
+_tag = struct.Struct('<B')
+_tagged = {
+    INT32:   struct.Struct('<Bi'),
+    INT64:   struct.Struct('<Bq'),
+    FLOAT:   struct.Struct('<Bd'),
+    COMPLEX: struct.Struct('<Bdd'),
+}
+_tagged_index = struct.Struct('<BI') # strings, and lengths of containers
+
+if sys.version_info[0] >= 3:
+    integer_types = (int,)
+    text_type = str
+    native = lambda b: b.decode('utf-8')
+else:
+    integer_types = (int, long)
+    text_type = unicode
+    native = lambda b: b
+
+#===------------------------------------------------------------------===
+# Writing
+#===------------------------------------------------------------------===
+
+class Writer(object):
+    """
+    Write a module to a binary stream.
+
+        strings:    [bytes], interned in stringids { bytes : index }
+        typetable:  type table shared by all encoded functions
+    """
+
+    def __init__(self):
+        self.out = io.BytesIO()
+        self.strings = []
+        self.stringids = {}
+        self.typetable = ([], {})
+
+    def write(self, data):
+        self.out.write(data)
+
+    def string(self, s):
+        if not isinstance(s, bytes):
+            s = s.encode('utf-8')
+        i = self.stringids.get(s)
+        if i is None:
+            i = self.stringids[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+    def value(self, value):
+        """Write plain data (see pykit.ir.encoding)"""
+        if value is None:
+            self.write(_tag.pack(NONE))
+        elif value is True:
+            self.write(_tag.pack(TRUE))
+        elif value is False:
+            self.write(_tag.pack(FALSE))
+        elif isinstance(value, integer_types):
+            if -2**31 <= value < 2**31:
+                self.write(_tagged[INT32].pack(INT32, value))
+            elif -2**63 <= value < 2**63:
+                self.write(_tagged[INT64].pack(INT64, value))
+            else:
+                self.write(_tagged_index.pack(BIGINT, self.string(str(value))))
+        elif isinstance(value, float):
+            self.write(_tagged[FLOAT].pack(FLOAT, value))
+        elif isinstance(value, complex):
+            self.write(_tagged[COMPLEX].pack(COMPLEX, value.real, value.imag))
+        elif isinstance(value, str):
+            self.write(_tagged_index.pack(STR, self.string(value)))
+        elif isinstance(value, bytes):
+            self.write(_tagged_index.pack(BYTES, self.string(value)))
+        elif isinstance(value, text_type):
+            self.write(_tagged_index.pack(TEXT, self.string(value)))
+        elif isinstance(value, (list, tuple)):
+            tag = LIST if isinstance(value, list) else TUPLE
+            self.write(_tagged_index.pack(tag, len(value)))
+            for x in value:
+                self.value(x)
+        elif isinstance(value, dict):
+            self.write(_tagged_index.pack(DICT, len(value)))
+            for k, v in value.items():
+                self.value(k)
+                self.value(v)
+        else:
+            raise TypeError("Cannot serialize value %r of type %s" % (
+                value, type(value).__name__))
+
+    # __________________________________________________________________
+
+    def function(self, func):
+        data = encoding.encode_function(func, self.typetable)
+        self.write(_pair.pack(self.string(data['name']), data['type']))
+        for key in ('argnames', 'temper', 'functions', 'globals'):
+            self.value(data[key])
+
+        self.write(_u32.pack(len(data['blocks'])))
+        for name, ops in data['blocks']:
+            self.write(_pair.pack(self.string(name), len(ops)))
+            for result, opcode, type, args, metadata in ops:
+                result = -1 if result is None else self.string(result)
+                self.write(_op.pack(result, self.string(opcode), type))
+                self.value(args)
+                self.value(metadata or None)
+
+    def module(self, functions, globals):
+        self.write(b'\0' * _header.size)
+
+        index = []
+        for func in functions:
+            offset = self.out.tell()
+            self.function(func)
+            index.append((self.string(func.name),
+                          self.typetable[1][id(func.type)],
+                          list(func.argnames), offset))
+
+        globals_offset = self.out.tell()
+        encoder = encoding.Encoder(None, self.typetable)
+        self.value([(gv.name, encoder.encode_type(gv.type), gv.external,
+                     gv.address, encoder.encode(gv.value))
+                        for gv in globals])
+
+        index_offset = self.out.tell()
+        self.value(index)
+
+        types_offset = self.out.tell()
+        self.table([self.typerecord(ty) for ty in self.typetable[0]])
+
+        strings_offset = self.out.tell()
+        self.table(self.strings)
+
+        self.out.seek(0)
+        self.write(_header.pack(_magic, VERSION, globals_offset, index_offset,
+                                types_offset, strings_offset))
+        return self.out.getvalue()
+
+    def typerecord(self, ty):
+        name, fields = ty
+        out, self.out = self.out, io.BytesIO()
+        self.write(_u32.pack(self.string(name)))
+        self.value(fields)
+        data, self.out = self.out.getvalue(), out
+        return data
+
+    def table(self, entries):
+        """Write an offset table and entries, as (count, [offset], data)"""
+        self.write(_u32.pack(len(entries)))
+        offset = 0
+        for entry in entries:
+            self.write(_u64.pack(offset))
+            offset += len(entry)
+        self.write(_u64.pack(offset))
+        for entry in entries:
+            self.write(entry)
+
+
+def dumps(value):
+    """
+    Serialize a Module, or a single Function, to a byte string. Functions
+    and globals referenced by a single function are declared when loading.
+    """
+    if isinstance(value, Function):
+        functions, globals = [value], []
+    else:
+        functions = [value.functions[name] for name in sorted(value.functions)]
+        globals = [value.globals[name] for name in sorted(value.globals)]
+    return Writer().module(functions, globals)
+
+def dump(value, filename):
+    """Serialize a Module or Function to a file"""
+    data = dumps(value)
+    with open(filename, 'wb') as f:
+        f.write(data)
+
+#===------------------------------------------------------------------===
+# Reading
+#===------------------------------------------------------------------===
+
+class Table(object):
+    """Lazily decoded table of entries, see Writer.table()"""
+
+    def __init__(self, buffer, offset, decode):
+        self.buffer = buffer
+        self.count, = _u32.unpack_from(buffer, offset)
+        self.offsets = offset + _u32.size
+        self.data = self.offsets + (self.count + 1) * _u64.size
+        self.decode = decode
+        self.cache = {}
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i in self.cache:
+            return self.cache[i]
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        start, = _u64.unpack_from(self.buffer, self.offsets + i * _u64.size)
+        end, = _u64.unpack_from(self.buffer,
+                                self.offsets + (i + 1) * _u64.size)
+        result = self.cache[i] = self.decode(self.data + start,
+                                             self.data + end)
+        return result
+
+
+class Reader(object):
+    """
+    Read a module from a buffer (bytes or mmap). All functions and globals
+    are declared in `module`, and function bodies are decoded on demand by
+    get_function() or read_module().
+
+        offsets:    { func_name : offset of function body }, for functions
+                    that are not decoded yet
+        typemap:    { index : type } of decoded types
+    """
+
+    def __init__(self, buffer, file=None):
+        self.buffer = buffer
+        self.file = file
+        if len(buffer) < _header.size:
+            raise ValueError("Not a pykit IR file")
+        (magic, version, globals_offset, index_offset, types_offset,
+         strings_offset) = _header.unpack_from(buffer, 0)
+        if magic != _magic:
+            raise ValueError("Not a pykit IR file")
+        if version != VERSION:
+            raise ValueError("Unsupported pykit IR version %d, expected %d" % (
+                version, VERSION))
+
+        self.strings = Table(buffer, strings_offset,
+                             lambda start, end: bytes(buffer[start:end]))
+        self.types = Table(buffer, types_offset, self.read_type)
+        self.typemap = {}
+        self.module = Module()
+        self.offsets = {}
+
+        decoder = encoding.Decoder({'types': self.types}, None, self.module,
+                                   self.typemap)
+        gvs, _ = self.value(globals_offset)
+        for name, type, external, address, value in gvs:
+            self.module.add_global(GlobalValue(
+                name, decoder.decode_type(type), external, address,
+                decoder.decode(value)))
+
+        index, _ = self.value(index_offset)
+        for name, type, argnames, offset in index:
+            name = self.string(name)
+            func = Function(name, argnames, decoder.decode_type(type))
+            self.module.add_function(func)
+            self.offsets[name] = offset
+
+    # __________________________________________________________________
+
+    def string(self, i, decode=native):
+        return decode(self.strings[i])
+
+    def read_type(self, start, end):
+        name, = _u32.unpack_from(self.buffer, start)
+        fields, _ = self.value(start + _u32.size)
+        return (self.string(name), fields)
+
+    def value(self, offset):
+        """Read plain data at offset, return the value and the next offset"""
+        buffer = self.buffer
+        tag, = _tag.unpack_from(buffer, offset)
+        if tag == NONE:
+            return None, offset + 1
+        elif tag == TRUE:
+            return True, offset + 1
+        elif tag == FALSE:
+            return False, offset + 1
+        elif tag in _tagged:
+            record = _tagged[tag]
+            fields = record.unpack_from(buffer, offset)
+            if tag == COMPLEX:
+                return complex(fields[1], fields[2]), offset + record.size
+            return fields[1], offset + record.size
+
+        _, n = _tagged_index.unpack_from(buffer, offset)
+        offset += _tagged_index.size
+        if tag == STR:
+            return self.string(n), offset
+        elif tag == TEXT:
+            return self.string(n, lambda b: b.decode('utf-8')), offset
+        elif tag == BYTES:
+            return self.strings[n], offset
+        elif tag == BIGINT:
+            return int(self.string(n)), offset
+        elif tag in (LIST, TUPLE):
+            items = []
+            for i in range(n):
+                item, offset = self.value(offset)
+                items.append(item)
+            return (items if tag == LIST else tuple(items)), offset
+        elif tag == DICT:
+            result = {}
+            for i in range(n):
+                k, offset = self.value(offset)
+                result[k], offset = self.value(offset)
+            return result, offset
+        raise ValueError("Invalid value tag %d at offset %d" % (tag, offset))
+
+    # __________________________________________________________________
+
+    def read_function(self, offset):
+        """Read the plain data of a function body (see encoding)"""
+        name, type = _pair.unpack_from(self.buffer, offset)
+        offset += _pair.size
+        data = { 'name': self.string(name), 'type': type, 'types': self.types }
+        for key in ('argnames', 'temper', 'functions', 'globals'):
+            data[key], offset = self.value(offset)
+
+        nblocks, = _u32.unpack_from(self.buffer, offset)
+        offset += _u32.size
+        blocks = data['blocks'] = []
+        for i in range(nblocks):
+            name, nops = _pair.unpack_from(self.buffer, offset)
+            offset += _pair.size
+            ops = []
+            for j in range(nops):
+                result, opcode, type = _op.unpack_from(self.buffer, offset)
+                args, offset = self.value(offset + _op.size)
+                metadata, offset = self.value(offset)
+                result = None if result == -1 else self.string(result)
+                ops.append((result, self.string(opcode), type, args, metadata))
+            blocks.append((self.string(name), ops))
+
+        return data
+
+    def get_function(self, name):
+        """Get a function from the module, decoding it if needed"""
+        func = self.module.get_function(name)
+        offset = self.offsets.pop(name, None)
+        if offset is not None:
+            data = self.read_function(offset)
+            encoding.decode_function(data, func, self.module, self.typemap)
+        return func
+
+    def read_module(self):
+        """Decode all functions, and return the module"""
+        for name in list(self.offsets):
+            self.get_function(name)
+        return self.module
+
+    def close(self):
+        if self.file is not None:
+            self.buffer.close()
+            self.file.close()
+            self.file = None
+
+
+def loads(data):
+    """Load a Module from a byte string"""
+    return Reader(data).read_module()
+
+def open_module(filename):
+    """Memory-map a serialized module, and return a Reader"""
+    f = open(filename, 'rb')
+    try:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except:
+        f.close()
+        raise
+    return Reader(buffer, f)
+
+def load(filename):
+    """Load a Module from a file"""
+    reader = open_module(filename)
+    try:
+        return reader.read_module()
+    finally:
+        reader.close()
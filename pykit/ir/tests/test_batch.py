@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import
+
+import unittest
+
+import numpy as np
+
+from pykit.parsing import from_c
+from pykit.ir import interp, batch
+from pykit.analysis import cfa
+
+source = """
+#include <pykit_ir.h>
+
+Int32 square(Int32 x) {
+    return x * x;
+}
+
+Int32 collatz(Int32 n) {
+    Int32 steps = 0;
+    while (n != 1) {
+        if (n % 2 == 0)
+            n = n / 2;
+        else
+            n = 3 * n + 1;
+        steps = steps + 1;
+    }
+    return steps;
+}
+
+double f(Int32 i, double x) {
+    double result = 0.0;
+    Int32 j;
+    for (j = 0; j < i; j = j + 1) {
+        Int32 sq = square(j);
+        if (x > 2.0)
+            result = result + x / 3.0;
+        else
+            result = result - (double) sq;
+    }
+    return result;
+}
+"""
+
+class TestBatch(unittest.TestCase):
+
+    def check(self, func, *args):
+        expected = [interp.run(func, args=list(lane)) for lane in zip(*args)]
+        result = batch.run(func, args)
+        self.assertEqual(len(result), len(expected))
+        self.assertEqual(list(result), expected)
+
+    def test_divergence(self):
+        mod = from_c(source)
+        self.check(mod.get_function('collatz'), np.arange(1, 50))
+
+    def test_loops_and_calls(self):
+        mod = from_c(source)
+        i = np.arange(0, 12)
+        x = np.linspace(0.0, 5.0, 12)
+        self.check(mod.get_function('f'), i, x)
+
+    def test_ssa(self):
+        mod = from_c(source)
+        for func in mod.functions.values():
+            cfa.run(func)
+        self.check(mod.get_function('collatz'), np.arange(1, 50))
+        self.check(mod.get_function('f'), np.arange(0, 12), np.ones(12) * 3)
+
+    def test_broadcast(self):
+        mod = from_c(source)
+        result = batch.run(mod.get_function('f'), [np.arange(4), 3.0])
+        self.assertEqual(list(result), [0.0, 1.0, 2.0, 3.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import
+
+import pickle
+import unittest
+
+from pykit import types
+from pykit.parsing import from_c
+from pykit.ir import Module, Function, Builder, verify, encoding
+from pykit.analysis import cfa
+
+source = """
+#include <pykit_ir.h>
+
+Int32 f(Int32 i) {
+    Int32 x = 0;
+    while (i < 10) {
+        x = x + i;
+        i = i + 1;
+    }
+    return x;
+}
+"""
+
+class TestEncoding(unittest.TestCase):
+
+    def setUp(self):
+        self.m = from_c(source)
+        self.f = self.m.get_function('f')
+        cfa.run(self.f)
+
+    def roundtrip(self, f, **kwds):
+        data = pickle.loads(pickle.dumps(encoding.encode_function(f), 2))
+        return encoding.decode_function(data, **kwds)
+
+    def test_roundtrip(self):
+        f = self.roundtrip(self.f, module=Module())
+        verify(f)
+        self.assertEqual(str(f), str(self.f))
+
+        # New names must not clash with existing ones
+        self.assertEqual(f.temp("cond"), self.f.temp("cond"))
+
+    def test_inplace(self):
+        arg = self.f.get_arg('i')
+        f = self.roundtrip(self.f, func=self.f)
+        verify(f)
+        self.assertIs(f, self.f)
+        self.assertIs(f.get_arg('i'), arg)
+
+    def test_references(self):
+        struct = types.Struct(['x'], [types.Int32])
+        struct.types.append(types.Pointer(struct)) # recursive type
+        struct.names.append('next')
+
+        g = Function('g', ['a'], types.Function(types.Int32, (types.Int32,),
+                                                False))
+        self.m.add_function(g)
+
+        b = Builder(self.f)
+        b.position_before(self.f.startblock.terminator)
+        p = b.alloca(types.Pointer(struct))
+        b.call(types.Int32, g, [self.f.get_arg('i')])
+
+        m = Module()
+        f = self.roundtrip(self.f, module=m)
+        self.assertIn('g', m.functions)
+        self.assertEqual(str(f), str(self.f))
+
+        [alloca] = [op for op in f.ops if op.opcode == 'alloca']
+        ty = alloca.type.base
+        self.assertIs(ty.types[1].base, ty)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import
+
+import sys
+import copy
+import unittest
+import subprocess
+
+from pykit import types
+from pykit.parsing import from_c
+from pykit.ir import Function, Builder, Const, Op, copy_function
+from pykit.ir.hashing import (hash_function, hash_module, structural_hash,
+                              HashError)
+
+source = """
+#include <pykit_ir.h>
+
+Int32 f(Int32 %(arg)s) {
+    Int32 %(var)s = 0;
+    while (%(var)s < %(arg)s) {
+        %(var)s = %(var)s + %(const)s;
+    }
+    return %(var)s;
+}
+"""
+
+def parse(arg="n", var="i", const="1"):
+    return from_c(source % dict(arg=arg, var=var, const=const))
+
+class Key(object):
+    def __init__(self, key):
+        self.key = key
+    def stable_key(self):
+        return self.key
+
+class TestHashing(unittest.TestCase):
+
+    def test_names_ignored(self):
+        h1 = hash_function(parse().get_function("f"))
+        h2 = hash_function(parse(arg="m", var="x").get_function("f"))
+        self.assertEqual(h1, h2)
+
+        f = parse().get_function("f")
+        g, _ = copy_function(f)
+        for block in g.blocks:
+            block.name = block.name + "_renamed"
+        self.assertEqual(hash_function(f), hash_function(g))
+
+    def test_structure(self):
+        h = hash_function(parse().get_function("f"))
+        self.assertNotEqual(h, hash_function(parse(const="2").get_function("f")))
+
+        f = parse().get_function("f")
+        op = [op for op in f.ops if op.opcode == 'add'][0]
+        op.add_metadata({"nsw": True})
+        self.assertNotEqual(h, hash_function(f))
+
+    def test_function_name(self):
+        f = parse().get_function("f")
+        g, _ = copy_function(f)
+        g.name = "g"
+        self.assertNotEqual(hash_function(f), hash_function(g))
+        self.assertEqual(hash_function(f, name=False),
+                         hash_function(g, name=False))
+
+    def test_recursive_type(self):
+        def func(fieldtype):
+            struct = types.Struct(["x", "next"], [])
+            struct.types.extend([fieldtype, types.Pointer(struct)])
+            f = Function("f", ["s"], types.Function(types.Void,
+                                                    [types.Pointer(struct)],
+                                                    False))
+            b = Builder(f)
+            b.position_at_end(f.new_block("entry"))
+            b.ret(None)
+            return f
+
+        self.assertEqual(hash_function(func(types.Int32)),
+                         hash_function(func(types.Int32)))
+        self.assertNotEqual(hash_function(func(types.Int32)),
+                            hash_function(func(types.Float64)))
+
+        # Independent of the way the canonical type writes out the cycle
+        f = func(types.Int32)
+        h = hash_function(f)
+        types.clear_interned()
+        types.intern(copy.deepcopy(f.type))
+        self.assertEqual(hash_function(func(types.Int32)), h)
+
+    def test_python_objects(self):
+        def hash_with(value):
+            f = parse().get_function("f")
+            [op for op in f.ops if op.opcode == 'add'][0].add_metadata(
+                {"value": value})
+            return hash_function(f)
+
+        self.assertRaises(HashError, hash_with, object())
+        self.assertEqual(hash_with(Key([1, "a"])), hash_with(Key([1, "a"])))
+        self.assertNotEqual(hash_with(Key(1)), hash_with(Key(2)))
+        self.assertEqual(hash_with(types.Int32), hash_with(types.Int32))
+        self.assertEqual(hash_with(parse), hash_with(parse))
+
+        # Closures and lambdas are not identified by their name
+        def make(n):
+            return lambda x: x + n
+        self.assertRaises(HashError, hash_with, make(1))
+        self.assertRaises(HashError, hash_with, lambda x: x)
+
+    def test_module(self):
+        self.assertEqual(hash_module(parse()), hash_module(parse(var="j")))
+        self.assertNotEqual(hash_module(parse()),
+                            hash_module(parse(const="3")))
+        self.assertEqual(structural_hash(parse()), hash_module(parse()))
+
+    def test_stable_across_processes(self):
+        code = ("from pykit.ir.tests.test_hashing import parse; "
+                "from pykit.ir.hashing import hash_module; "
+                "print(hash_module(parse()))")
+        output = subprocess.check_output([sys.executable, "-c", code])
+        self.assertEqual(output.decode('ascii').strip(), hash_module(parse()))
+
+
+if __name__ == '__main__':
+    unittest.main()
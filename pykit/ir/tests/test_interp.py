@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division, absolute_import
 
+import math
 import unittest
+from pykit import types
 from pykit.parsing import cirparser
-from pykit.ir import verify, interp
+from pykit.ir import verify, interp, tracing, Function, Builder, Const
 
 source = """
 #include <pykit_ir.h>
@@ -44,6 +46,39 @@ class TestInterp(unittest.TestCase):
         result = interp.run(loop)
         assert result == 45, result
 
+    def test_tracing(self):
+        loop = mod.get_function('loop')
+        tracer = tracing.Tracer(record=True)
+        tracer.format_item = lambda item: None
+        result = interp.run(loop, tracer=tracer)
+        self.assertEqual(result, 45)
+        self.assertIsInstance(tracer.stmts[0], tracing.Call)
+        self.assertIsInstance(tracer.stmts[-1], tracing.Ret)
+
+    def test_program_cache(self):
+        loop = mod.get_function('loop')
+        env = { "interp.cache": {} }
+        self.assertEqual(interp.run(loop, env), 45)
+        program = env["interp.cache"][loop]
+        self.assertEqual(interp.run(loop, env), 45)
+        self.assertIs(env["interp.cache"][loop], program)
+
+        # Changing handlers invalidates the program
+        env["interp.handlers"] = { "add": lambda interp, x, y: x + y + 1 }
+        self.assertEqual(interp.run(loop, env), 1 + 3 + 5 + 7 + 9)
+        self.assertIsNot(env["interp.cache"][loop], program)
+
+    def test_signed_zero(self):
+        # 0.0 and -0.0 are distinct constants
+        f = Function("f", ['x'],
+                     types.Function(types.Float64, [types.Float64], False))
+        b = Builder(f)
+        b.position_at_end(f.new_block('entry'))
+        x = b.mul(f.get_arg('x'), Const(0.0, types.Float64))
+        b.ret(b.mul(x, Const(-0.0, types.Float64)))
+        result = interp.run(f, args=[1.0])
+        self.assertEqual(math.copysign(1.0, result), -1.0)
+
     def test_exceptions(self):
         f = mod.get_function('raise')
         try:
@@ -5,8 +5,8 @@ import unittest
 
 from pykit import types
 from pykit.parsing import from_c
-from pykit.ir import Builder, ops, opcodes
-from pykit.analysis import cfa
+from pykit.ir import Builder, ops, opcodes, findop, verify
+from pykit.analysis import cfa, defuse
 
 source = """
 float testfunc(int a) {
@@ -34,6 +34,46 @@ class TestIR(unittest.TestCase):
         cfa.run(self.f)
         self.assertEqual(opcodes(self.f), ['mul', 'add', 'convert', 'convert', 'ret'])
 
+    def test_uses(self):
+        cfa.run(self.f)
+        a = self.f.get_arg('a')
+        mul = findop(self.f, 'mul')
+        self.assertEqual(a.uses, set([mul]))
+
+        # Duplicate arguments, removing one occurrence keeps the use
+        mul.set_args([a, mul.args[1]])
+        mul.set_args([a, mul.args[1], a])
+        self.assertEqual(a.uses, set([mul]))
+
+        convert = findop(self.f, 'convert')
+        add = self.b.add(a, mul)
+        add.insert_before(convert)
+        self.assertEqual(a.uses, set([mul, add]))
+        self.assertEqual(mul.uses, set([add, convert]))
+
+        add.replace_uses(mul)
+        add.delete()
+        self.assertEqual(a.uses, set([mul]))
+        self.assertEqual(set(self.f.uses), set(defuse.defuse(self.f)))
+
+    def test_replace_uses(self):
+        cfa.run(self.f)
+        a = self.f.get_arg('a')
+        mul = findop(self.f, 'mul')
+        self.b.position_before(mul)
+        b = self.b.add(a, a)
+        c = self.b.add(b, b)
+        mul.set_args([b, [b, c]])
+
+        b.replace_uses(a)
+        self.assertEqual(mul.args, [a, [a, c]])
+        self.assertEqual(c.args, [a, a])
+        self.assertEqual(a.uses, set([b, c, mul]))
+        self.assertEqual(b.uses, set())
+        self.assertEqual(c.uses, set([mul]))
+        self.assertEqual(dict(self.f.uses.items()),
+                         dict(defuse.defuse(self.f)))
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
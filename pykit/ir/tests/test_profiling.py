@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pykit.parsing import cirparser
+from pykit.ir import verify, interp, tracing
+from pykit.ir.profiling import Profile, FunctionProfile, profile_trace, annotate
+
+source = """
+#include <pykit_ir.h>
+
+Int32 loop(Int32 n) {
+    Int32 i, sum = 0;
+    for (i = 0; i < n; i = i + 1) {
+        sum = sum + i;
+    }
+    return sum;
+}
+
+Int32 twice(Int32 n) {
+    Int32 a = loop(n);
+    Int32 b = loop(n);
+    return a + b;
+}
+"""
+
+mod = cirparser.from_c(source)
+verify(mod)
+loop = mod.get_function('loop')
+twice = mod.get_function('twice')
+
+def cbranch_block(func):
+    [block] = [b for b in func.blocks if b.terminator.opcode == 'cbranch']
+    return block
+
+def profile(func, args):
+    env = { "interp.profile": Profile() }
+    interp.run(func, env, args=args)
+    return env["interp.profile"]
+
+class TestProfiling(unittest.TestCase):
+
+    def test_block_counts(self):
+        fprofile = profile(loop, [10])[loop]
+        self.assertEqual(fprofile.entry_count(), 1)
+        self.assertEqual(fprofile.block_count(loop.startblock), 1)
+        self.assertEqual(fprofile.block_count(cbranch_block(loop)), 11)
+
+    def test_branch_weights(self):
+        fprofile = profile(loop, [10])[loop]
+        op = cbranch_block(loop).terminator
+        self.assertEqual(fprofile.branch_weights(op), [10, 1])
+
+        total = sum(fprofile.edge_count(pred, cbranch_block(loop))
+                        for pred in fprofile.blocks)
+        self.assertEqual(total, 11)
+
+    def test_calls(self):
+        prof = profile(twice, [5])
+        self.assertEqual(prof[twice].entry_count(), 1)
+        self.assertEqual(prof[loop].entry_count(), 2)
+        self.assertEqual(prof[loop].block_count(cbranch_block(loop)), 12)
+
+    def test_trace(self):
+        tracer = tracing.Tracer(record=True)
+        tracer.format_item = lambda item: None
+        interp.run(twice, args=[5], tracer=tracer)
+        self.assertEqual(profile_trace(tracer.stmts).to_dict(),
+                         profile(twice, [5]).to_dict())
+
+    def test_merge(self):
+        prof = profile(loop, [3])
+        prof.merge(profile(twice, [4]))
+        self.assertEqual(prof[loop].entry_count(), 3)
+        self.assertEqual(prof[loop].block_count(cbranch_block(loop)), 4 + 10)
+
+    def test_save_load(self):
+        prof = profile(twice, [5])
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, "profile.json")
+            prof.save(filename)
+            loaded = Profile.load(filename)
+        finally:
+            shutil.rmtree(tmpdir)
+
+        self.assertEqual(loaded.to_dict(), prof.to_dict())
+        self.assertIsInstance(loaded[loop], FunctionProfile)
+        op = cbranch_block(loop).terminator
+        self.assertEqual(loaded[loop].branch_weights(op), [10, 2])
+
+    def test_annotate(self):
+        fprofile = profile(loop, [7])[loop]
+        annotate(loop, fprofile)
+        op = cbranch_block(loop).terminator
+        try:
+            self.assertEqual(op.metadata["profile.weights"], [7, 1])
+        finally:
+            del op.metadata["profile.weights"]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pykit import types
+from pykit.parsing import from_c
+from pykit.ir import (Function, GlobalValue, Builder, Const, verify,
+                      serialize)
+from pykit.analysis import cfa
+
+source = """
+#include <pykit_ir.h>
+
+Int32 g(Int32 i) {
+    return i * 2;
+}
+
+Int32 f(Int32 i) {
+    Int32 x = 0;
+    Int32 y;
+    while (i < 10) {
+        y = g(i);
+        x = x + y;
+        i = i + 1;
+    }
+    return x;
+}
+"""
+
+class TestSerialize(unittest.TestCase):
+
+    def setUp(self):
+        self.m = from_c(source)
+        for func in self.m.functions.values():
+            cfa.run(func)
+        self.f = self.m.get_function('f')
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_roundtrip(self):
+        m = serialize.loads(serialize.dumps(self.m))
+        self.assertEqual(sorted(m.functions), sorted(self.m.functions))
+        for name, func in m.functions.items():
+            verify(func)
+            self.assertEqual(str(func), str(self.m.get_function(name)))
+
+        # Calls refer to functions in the loaded module
+        [call] = [op for op in m.get_function('f').ops if op.opcode == 'call']
+        self.assertIs(call.args[0], m.get_function('g'))
+
+    def test_values(self):
+        struct = types.Struct(['x'], [types.Int32])
+        struct.types.append(types.Pointer(struct)) # recursive type
+        struct.names.append('next')
+        self.m.add_global(GlobalValue('gv', types.Int64, value=Const(2**40)))
+
+        b = Builder(self.f)
+        b.position_before(self.f.startblock.terminator)
+        p = b.alloca(types.Pointer(struct))
+        p.add_metadata({'name': u'\xfc', 'weights': [1, 2**70, 0.5, None]})
+
+        m = serialize.loads(serialize.dumps(self.m))
+        gv = m.get_global('gv')
+        self.assertEqual(gv.type, types.Int64)
+        self.assertEqual(gv.value.const, 2**40)
+
+        [alloca] = [op for op in m.get_function('f').ops
+                           if op.opcode == 'alloca' and op.metadata]
+        ty = alloca.type.base
+        self.assertIs(ty.types[1].base, ty)
+        self.assertEqual(alloca.metadata, p.metadata)
+
+    def test_lazy(self):
+        filename = os.path.join(self.dir, 'm.pykit')
+        serialize.dump(self.m, filename)
+
+        reader = serialize.open_module(filename)
+        try:
+            self.assertEqual(reader.module.get_function('f').blocks.head, None)
+            f = reader.get_function('f')
+            self.assertEqual(str(f), str(self.f))
+            self.assertEqual(reader.module.get_function('g').blocks.head, None)
+            self.assertIn('g', reader.offsets)
+        finally:
+            reader.close()
+
+        m = serialize.load(filename)
+        self.assertEqual(str(m.get_function('g')), str(self.m.get_function('g')))
+
+    def test_errors(self):
+        self.assertRaises(ValueError, serialize.loads, b'PYKTRACE' + b'\0' * 40)
+        data = bytearray(serialize.dumps(self.m))
+        data[8] = 99 # version
+        self.assertRaises(ValueError, serialize.loads, bytes(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from io import StringIO, BytesIO
+
+from pykit.parsing import cirparser
+from pykit.ir import verify, interp, tracing
+
+source = """
+#include <pykit_ir.h>
+
+double square(double x) {
+    return x * x;
+}
+
+double loop(Int32 n) {
+    Int32 i;
+    double sum = 0.0;
+    for (i = 0; i < n; i = i + 1) {
+        double x = (double) i;
+        double y = square(x);
+        sum = sum + y;
+    }
+    return sum;
+}
+"""
+
+mod = cirparser.from_c(source)
+verify(mod)
+loop = mod.get_function('loop')
+
+def capture(f, *args):
+    stdout = sys.stdout
+    sys.stdout = out = BytesIO() if sys.version_info[0] == 2 else StringIO()
+    try:
+        f(*args)
+    finally:
+        sys.stdout = stdout
+    return out.getvalue()
+
+def formatted(stream):
+    return capture(tracing.format_stream, stream)
+
+def trace(tracer, n=4):
+    result = interp.run(loop, args=[n], tracer=tracer)
+    assert result == sum(i * i for i in range(n)), result
+    return tracer
+
+class TestBinaryTracer(unittest.TestCase):
+
+    def test_format(self):
+        # Values are formatted at the time they are traced
+        expected = capture(trace, tracing.Tracer())
+        tracer = trace(tracing.BinaryTracer())
+        self.assertEqual(formatted(tracer.items()), expected)
+
+    def test_items(self):
+        tracer = tracing.Tracer(record=True)
+        tracer.format_item = lambda item: None
+        stmts = trace(tracer).stmts
+        items = list(trace(tracing.BinaryTracer()).items())
+        self.assertEqual([type(item) for item in items],
+                         [type(item) for item in stmts])
+        for item, stmt in zip(items, stmts):
+            if isinstance(stmt, tracing.Op):
+                self.assertEqual(item.op.opcode, stmt.op.opcode)
+                self.assertEqual(item.op.result, stmt.op.result)
+            elif isinstance(stmt, tracing.Res) and \
+                    isinstance(stmt.result, (int, float)):
+                self.assertEqual(item.result, stmt.result)
+
+    def test_ring_buffer(self):
+        tracer = trace(tracing.BinaryTracer(capacity=50), n=20)
+        self.assertGreater(tracer.count, 50)
+        items = list(tracer.items())
+        self.assertIsInstance(items[0], tracing.Call)
+        self.assertIsInstance(items[-1], tracing.Ret)
+        self.assertEqual(items[-1].result, sum(i * i for i in range(20)))
+        formatted(items)
+
+    def test_tables(self):
+        # Values no longer in the ring buffer are evicted from the tables
+        tracer = trace(tracing.BinaryTracer(capacity=50), n=300)
+        self.assertLessEqual(len(tracer.strings.values), 2 * 50)
+        self.assertLessEqual(len(tracer.objects.values), 2 * 50)
+        items = list(tracer.items())
+        self.assertEqual(items[-1].result, sum(i * i for i in range(300)))
+        self.assertNotIn('None', formatted(items))
+
+    def test_file(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, "trace.bin")
+            tracer = trace(tracing.BinaryTracer(filename=filename))
+            expected = formatted(tracer.items())
+            tracer.close()
+            self.assertEqual(formatted(tracing.read_trace(filename)), expected)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
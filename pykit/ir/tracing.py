@@ -2,15 +2,28 @@
 
 """
 Interpreter tracing of pykit programs.
+
+Tracer formats trace items as they are pushed, and optionally records them
+in a list. BinaryTracer instead encodes trace items as fixed-size records
+in a ring buffer (in memory, or in a memory-mapped file), which can be read
+back lazily as a stream of trace items and formatted with format_stream().
 """
 
 from __future__ import print_function, division, absolute_import
+import json
+import mmap
+import struct
 from collections import namedtuple
 
 from .value import Value
 
 from pykit.utils import nestedmap
 
+try:
+    long_ = long
+except NameError:
+    long_ = int
+
 #===------------------------------------------------------------------===
 # Trace Items
 #===------------------------------------------------------------------===
@@ -128,6 +141,343 @@ class DummyTracer(Tracer):
     def format_item(self, item):
         pass
 
+#===------------------------------------------------------------------===
+# Binary Traces
+#===------------------------------------------------------------------===
+
+# Record layout: kind, value tag, #args, function or operation id, payload
+_record = struct.Struct('<BBHiq')
+_record_float = struct.Struct('<BBHid')
+_header = struct.Struct('<8sQQQ')   # magic, capacity, #records, tables offset
+_magic = b'PYKTRACE'
+
+RECORD_SIZE = _record.size
+
+# Record kinds
+CALL, OP, ARG, RES, RET, EXC = range(1, 7)
+
+# Value tags
+NONE, INT, FLOAT, BOOL, STR, OBJ = range(6)
+
+_int64_min, _int64_max = -2**63, 2**63 - 1
+
+FuncInfo  = namedtuple('FuncInfo',  ['name'])
+BlockInfo = namedtuple('BlockInfo', ['name'])
+OpInfo    = namedtuple('OpInfo',    ['opcode', 'result', 'block', 'func'])
+
+class Formatted(object):
+    """Value in a binary trace, of which we only keep the formatted string"""
+
+    def __init__(self, s):
+        self.s = s
+
+    def __str__(self):
+        return self.s
+
+    __repr__ = __str__
+
+def _format_nested(arg):
+    # Format an argument like _format_args() does
+    if isinstance(arg, list):
+        return str(list(map(_format_arg, arg)))
+    return _format_arg(arg)
+
+class ValueTable(object):
+    """
+    Table of the values referenced by records in a ring buffer of
+    `capacity` records. Once the table fills up, values no longer
+    referenced from the ring are evicted and their ids reused, so the
+    table holds at most 2 * capacity values.
+
+        values:     [value], None for free ids
+        ids:        { key : id }
+        keys:       [key]
+        lastuse:    [index of the last record referencing the value]
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.limit = capacity
+        self.values = []
+        self.ids = {}
+        self.keys = []
+        self.lastuse = []
+        self.free = []
+
+    def id(self, key, value, index):
+        """Return the id of `value`, referenced by record number `index`"""
+        i = self.ids.get(key)
+        if i is None:
+            if not self.free and len(self.values) >= self.limit:
+                self.evict(index - self.capacity)
+            if self.free:
+                i = self.free.pop()
+                self.values[i], self.keys[i] = value, key
+            else:
+                i = len(self.values)
+                self.values.append(value)
+                self.keys.append(key)
+                self.lastuse.append(index)
+            self.ids[key] = i
+        self.lastuse[i] = index
+        return i
+
+    def evict(self, start):
+        """Evict the values not referenced by records from `start` onwards"""
+        for i, key in enumerate(self.keys):
+            if self.lastuse[i] < start and self.values[i] is not None:
+                del self.ids[key]
+                self.values[i] = self.keys[i] = None
+                self.free.append(i)
+        self.limit = max(self.capacity, 2 * len(self.ids))
+
+
+class BinaryTracer(Tracer):
+    """
+    Record trace items as 16-byte records in a ring buffer of `capacity`
+    records. Once the buffer is full, the oldest records are overwritten.
+    Functions and operations are recorded by integer id, and integers,
+    floats, booleans and None are stored inline. IR values are kept by
+    reference and formatted when the trace is read, other values are
+    formatted when they are recorded. Values are kept in tables, which
+    only hold on to the values referenced from the buffer (see ValueTable).
+
+    If `filename` is given, the buffer is a memory-mapped file, which can
+    be read back with read_trace() after close().
+    """
+
+    def __init__(self, capacity=1 << 20, filename=None):
+        super(BinaryTracer, self).__init__(record=False)
+        self.capacity = capacity
+        self.count = 0          # total number of records written
+        self.filename = filename
+        self.frames = []        # stack of function ids
+
+        self.funcs = []         # [FuncInfo]
+        self.funcids = {}       # { Function : id }
+        self.ops = []           # [OpInfo]
+        self.opids = {}         # { Operation : id }
+        self.strings = ValueTable(capacity) # formatted values, by value
+        self.objects = ValueTable(capacity) # IR values, by id()
+
+        size = capacity * RECORD_SIZE
+        if filename is None:
+            self.file = None
+            self.buffer = bytearray(size)
+            self.offset = 0
+        else:
+            self.file = open(filename, 'w+b')
+            self.file.truncate(_header.size + size)
+            self.buffer = mmap.mmap(self.file.fileno(), _header.size + size)
+            self.offset = _header.size
+
+    # __________________________________________________________________
+    # Tables
+
+    def funcid(self, func):
+        i = self.funcids.get(func)
+        if i is None:
+            i = self.funcids[func] = len(self.funcs)
+            self.funcs.append(FuncInfo(func.name))
+        return i
+
+    def opid(self, op):
+        i = self.opids.get(op)
+        if i is None:
+            i = self.opids[op] = len(self.ops)
+            self.ops.append(OpInfo(op.opcode, op.result,
+                                   BlockInfo(op.block.name),
+                                   self.funcid(op.function)))
+        return i
+
+    def stringid(self, s):
+        return self.strings.id(s, s, self.count - 1)
+
+    def objectid(self, obj):
+        # The table keeps a reference, so the id stays valid
+        return self.objects.id(id(obj), obj, self.count - 1)
+
+    # __________________________________________________________________
+    # Writing
+
+    def write(self, kind, id, value=None, nargs=0, format=_format_arg):
+        offset = self.offset + (self.count % self.capacity) * RECORD_SIZE
+        self.count += 1
+
+        t = type(value)
+        if value is None:
+            _record.pack_into(self.buffer, offset, kind, NONE, nargs, id, 0)
+        elif t is bool:
+            _record.pack_into(self.buffer, offset, kind, BOOL, nargs, id, value)
+        elif t is float:
+            _record_float.pack_into(self.buffer, offset, kind, FLOAT, nargs,
+                                    id, value)
+        elif (t is int or t is long_) and _int64_min <= value <= _int64_max:
+            _record.pack_into(self.buffer, offset, kind, INT, nargs, id, value)
+        elif isinstance(value, Value):
+            _record.pack_into(self.buffer, offset, kind, OBJ, nargs, id,
+                              self.objectid(value))
+        else:
+            _record.pack_into(self.buffer, offset, kind, STR, nargs, id,
+                              self.stringid(format(value)))
+
+    def push(self, item):
+        if isinstance(item, Op):
+            self.write(OP, self.opid(item.op), nargs=len(item.args))
+            for arg in item.args:
+                self.write(ARG, 0, arg, format=_format_nested)
+        elif isinstance(item, Res):
+            self.write(RES, self.opid(item.op), item.result)
+        elif isinstance(item, Call):
+            funcid = self.funcid(item.func)
+            self.frames.append(funcid)
+            self.write(CALL, funcid, nargs=len(item.args))
+            for arg in item.args:
+                self.write(ARG, 0, arg, format=_format_nested)
+        elif isinstance(item, Ret):
+            self.write(RET, self.frames.pop(), item.result)
+        elif isinstance(item, Exc):
+            self.write(EXC, self.frames.pop(), item.exc, format=str)
+
+    # __________________________________________________________________
+    # Reading
+
+    def tables(self):
+        """Return the tables needed to decode the records"""
+        return {
+            'funcs':   self.funcs,
+            'ops':     self.ops,
+            'strings': self.strings.values,
+            'objects': self.objects.values,
+        }
+
+    def items(self):
+        """Iterate over the recorded trace items"""
+        return read_records(self.buffer, self.offset, self.capacity,
+                            self.count, self.tables())
+
+    def close(self):
+        """Write the tables and close the trace file"""
+        if self.file is None:
+            return
+
+        size = _header.size + self.capacity * RECORD_SIZE
+        _header.pack_into(self.buffer, 0, _magic, self.capacity, self.count,
+                          size)
+        self.buffer.close()
+
+        tables = {
+            'funcs':   [info.name for info in self.funcs],
+            'ops':     [(info.opcode, info.result, info.block.name, info.func)
+                            for info in self.ops],
+            'strings': self.strings.values,
+            'objects': [_format_nested(obj) for obj in self.objects.values],
+        }
+        self.file.seek(size)
+        self.file.write(json.dumps(tables).encode('utf-8'))
+        self.file.close()
+        self.file = None
+
+
+def _kind(buffer, offset, capacity, i):
+    return _record.unpack_from(buffer, offset + (i % capacity) * RECORD_SIZE)[0]
+
+def read_records(buffer, offset, capacity, count, tables):
+    """
+    Decode records from a ring buffer as trace items. If the buffer wrapped
+    around, the trace starts in the middle of the execution: records of
+    partially overwritten items are skipped, and Call items are inserted
+    for functions that were already executing.
+    """
+    funcs, ops = tables['funcs'], tables['ops']
+    strings, objects = tables['strings'], tables['objects']
+
+    def decode(tag, pos):
+        if tag == NONE:
+            return None
+        elif tag == FLOAT:
+            return _record_float.unpack_from(buffer, pos)[4]
+
+        value = _record.unpack_from(buffer, pos)[4]
+        if tag == INT:
+            return value
+        elif tag == BOOL:
+            return bool(value)
+        elif tag == STR:
+            return Formatted(strings[value])
+        else:
+            assert tag == OBJ, tag
+            return Formatted(_format_nested(objects[value]))
+
+    # Skip the records of a partially overwritten item
+    i = max(count - capacity, 0)
+    while i < count and _kind(buffer, offset, capacity, i) in (ARG, RES):
+        i += 1
+
+    depth = 0
+    while i < count:
+        pos = offset + (i % capacity) * RECORD_SIZE
+        kind, tag, nargs, id, _ = _record.unpack_from(buffer, pos)
+        i += 1
+
+        if kind in (CALL, OP):
+            args = []
+            for j in range(i, min(i + nargs, count)):
+                argpos = offset + (j % capacity) * RECORD_SIZE
+                args.append(decode(_record.unpack_from(buffer, argpos)[1],
+                                   argpos))
+            i += nargs
+
+        if kind == CALL:
+            depth += 1
+            yield Call(funcs[id], args)
+            continue
+
+        # Insert calls for frames that started before the trace
+        funcid = ops[id].func if kind in (OP, RES) else id
+        if depth == 0:
+            depth += 1
+            yield Call(funcs[funcid], [])
+
+        if kind == OP:
+            yield Op(ops[id], args)
+        elif kind == RES:
+            yield Res(ops[id], (), decode(tag, pos))
+        elif kind == RET:
+            depth -= 1
+            yield Ret(decode(tag, pos))
+        else:
+            assert kind == EXC, kind
+            depth -= 1
+            yield Exc(decode(tag, pos))
+
+
+def read_trace(filename):
+    """Lazily read the trace items from a trace file written by BinaryTracer"""
+    with open(filename, 'rb') as f:
+        header = f.read(_header.size)
+        magic, capacity, count, tables_offset = _header.unpack(header)
+        if magic != _magic:
+            raise ValueError("Not a pykit trace file: %r" % (filename,))
+
+        f.seek(tables_offset)
+        data = json.loads(f.read().decode('utf-8'))
+        buffer = mmap.mmap(f.fileno(), tables_offset, access=mmap.ACCESS_READ)
+
+    tables = {
+        'funcs':   [FuncInfo(str(name)) for name in data['funcs']],
+        'ops':     [OpInfo(str(opcode), str(result), BlockInfo(str(block)),
+                           func)
+                        for opcode, result, block, func in data['ops']],
+        'strings': [str(s) for s in data['strings']],
+        'objects': [Formatted(str(s)) for s in data['objects']],
+    }
+    try:
+        for item in read_records(buffer, _header.size, capacity, count, tables):
+            yield item
+    finally:
+        buffer.close()
+
 #===------------------------------------------------------------------===
 # Utils
 #===------------------------------------------------------------------===
@@ -1,42 +1,36 @@
 cimport cython
-from pykit.adt.linkedlist cimport LinkedList
 
 cdef class Value(object):
     pass
 
 cdef class Module(Value):
-    pass
+    cdef public globals, functions, temp
 
 cdef class Function(Value):
-    cdef public Module module
-    cdef public str name
-    cdef public LinkedList blocks
-    cdef public list argnames
-    cdef public dict blockmap, argdict, uses
-    cdef public object temp
+    cdef public module, name, type, temp, blocks, argnames
+    cdef public dict blockmap, argdict
+
+cdef class GlobalValue(Value):
+    cdef public module, name, type, external, address, value
 
 cdef class Block(Value):
-    cdef public str name
-    cdef public Module parent
-    cdef public LinkedList ops
+    cdef public name, parent, ops, _prev, _next
+    cdef public set _uses
 
 cdef class Local(Value):
-    cdef public str opcode
-    cdef public object type
+    pass
 
 cdef class FuncArg(Local):
-    cdef public Function parent
-    cdef public str result
+    cdef public parent, opcode, type, result
+    cdef public set _uses
 
-cdef class Operation(Value):
-    cdef public Function parent
-    cdef public str result
-
-    cdef object _args, _prev, _next, _metadata
+cdef class Operation(Local):
+    cdef public parent, opcode, type, result
+    cdef public _args, _prev, _next, _metadata
+    cdef public set _uses
 
 cdef class Constant(Value):
-    cdef public str opcode
-    cdef public type, args, result
+    cdef public opcode, type, args, result
 
 cdef class Pointer(Value):
     cdef public addr, type
@@ -45,4 +39,7 @@ cdef class Struct(Value):
     cdef public names, values, type
 
 cdef class Undef(Value):
-    cdef public type
\ No newline at end of file
+    cdef public type
+
+cdef class UseMap(object):
+    cdef public Function func
@@ -8,20 +8,20 @@ An operation is
 from __future__ import print_function, division, absolute_import
 from itertools import chain
 from functools import partial
-from collections import defaultdict
 
 from pykit import error, types
 from pykit.adt import LinkedList
 from pykit.ir import ops
 from pykit.ir.pretty import pretty
-from pykit.utils import (flatten, nestedmap, match, Delegate, traits, listify,
-                         make_temper)
+from pykit.utils import flatten, nestedmap, Delegate, make_temper
 
 class Value(object):
-    __str__ = pretty
-
     __slots__ = ()
 
+    def __str__(self):
+        # Defined as a method, so it fills the tp_str slot when compiled
+        return pretty(self)
+
 class Module(Value):
     """
     A module containing global values and functions. This defines the scope
@@ -88,15 +88,16 @@ class Function(Value):
 
     values:  { op_name: Operation }
 
-    uses: { Operation : [Operation] }
-        Operations that refer to this operation in their 'args' list
+    uses: { Value : {Operation} }
+        Operations that refer to a value in their 'args' list. This is a
+        view of the use sets kept on the values (see Local.uses)
 
     temp: function, name -> tempname
         allocate a temporary name
     """
 
     __slots__ = ('module', 'name', 'type', 'temp', 'blocks', 'blockmap',
-                 'argnames', 'argdict', 'uses')
+                 'argnames', 'argdict')
 
     def __init__(self, name, argnames, type, temper=None):
         self.module = None
@@ -109,8 +110,6 @@ class Function(Value):
         self.argnames = argnames
         self.argdict = {}
 
-        self.uses = defaultdict(set)
-
         # reserve names
         for argname in argnames:
             self.temp(argname)
@@ -127,10 +126,18 @@ class Function(Value):
     def exitblock(self):
         return self.blocks.tail
 
+    @property
+    def uses(self):
+        return UseMap(self)
+
     @property
     def ops(self):
-        """Get a flat iterable of all Ops in this function"""
-        return chain(*self.blocks)
+        """
+        Iterate over all Ops in this function, without copying the blocks.
+        The current Op may be deleted or replaced during iteration, see
+        LinkedList.iter_inplace().
+        """
+        return (op for block in self.blocks for op in block.ops)
 
     def new_block(self, label, ops=None, after=None):
         """Create a new block with name `label` and append it"""
@@ -194,11 +201,18 @@ class Function(Value):
 
         Does NOT insert the Op in any basic block
         """
-        _add_args(self.uses, op, op.args)
+        _add_args(op, op.args)
 
     def reset_uses(self):
-        from pykit.analysis import defuse
-        self.uses = defuse.defuse(self)
+        """Recompute the uses of all values in the function"""
+        for arg in self.argdict.values():
+            arg._uses.clear()
+        for block in self.blocks:
+            block._uses.clear()
+            for op in block:
+                op._uses.clear()
+        for op in self.ops:
+            _add_args(op, op.args)
 
     def delete_all(self, delete):
         """
@@ -242,18 +256,18 @@ class GlobalValue(Value):
         return self.name
 
 
-@traits
 class Block(Value):
     """
     Basic block of Operations.
 
         name:   Name of block (unique within function)
         parent: Function owning block
+        uses:   Set of Operations referring to this block (e.g. branches)
     """
 
-    head, tail = Delegate('ops'), Delegate('ops')
+    head, tail = Delegate('ops', 'head'), Delegate('ops', 'tail')
 
-    __slots__ = ('name', 'parent', 'ops', '_prev', '_next')
+    __slots__ = ('name', 'parent', 'ops', '_prev', '_next', '_uses')
 
     def __init__(self, name, parent=None, ops=None):
         self.name   = name
@@ -261,6 +275,11 @@ class Block(Value):
         self.ops = LinkedList(ops or [])
         self._prev = None
         self._next = None
+        self._uses = set()
+
+    @property
+    def uses(self):
+        return self._uses
 
     @property
     def opcodes(self):
@@ -277,6 +296,9 @@ class Block(Value):
     def __iter__(self):
         return iter(self.ops)
 
+    def __reversed__(self):
+        return reversed(self.ops)
+
     def append(self, op):
         """Append op to block"""
         self.ops.append(op)
@@ -294,16 +316,16 @@ class Block(Value):
         return self.name
 
     @property
-    @listify
     def leaders(self):
         """
-        Return an iterator of basic block leaders
+        Return a list of basic block leaders
         """
+        leaders = []
         for op in self.ops:
-            if ops.is_leader(op.opcode):
-                yield op
-            else:
+            if not ops.is_leader(op.opcode):
                 break
+            leaders.append(op)
+        return leaders
 
     @property
     def terminator(self):
@@ -318,6 +340,9 @@ class Block(Value):
     def __lt__(self, other):
         return self.name < other.name
 
+    def __hash__(self):
+        return object.__hash__(self)
+
     def __repr__(self):
         return "Block(%s)" % self.name
 
@@ -326,6 +351,9 @@ class Local(Value):
     """
     Local value in a Function. This is either a FuncArg or an Operation.
     Constants do not belong to any function.
+
+    Local values keep the set of Operations that use them (`_uses`), which is
+    updated when operations are added, deleted or change their arguments.
     """
 
     __slots__ = ()
@@ -335,21 +363,18 @@ class Local(Value):
         """The Function owning this local value"""
         raise NotImplementedError
 
+    @property
+    def uses(self):
+        "Enumerate all Operations referring to this value"
+        return self._uses
+
     def replace_uses(self, dst):
         """
         Replace all uses of `self` with `dst`. This does not invalidate this
         Operation!
         """
-        src = self
-
-        # Replace src with dst in use sites
-        for use in set(self.function.uses[src]):
-            def replace(op):
-                if op == src:
-                    return dst
-                return op
-            newargs = nestedmap(replace, use.args)
-            use.set_args(newargs)
+        for use in list(self._uses):
+            use._replace_arg(self, dst)
 
 
 class FuncArg(Local):
@@ -357,13 +382,14 @@ class FuncArg(Local):
     Argument to the function. Use Function.get_arg()
     """
 
-    __slots__ = ('parent', 'opcode', 'type', 'result')
+    __slots__ = ('parent', 'opcode', 'type', 'result', '_uses')
 
     def __init__(self, func, name, type):
         self.parent = func
         self.opcode = 'arg'
         self.type   = type
         self.result = name
+        self._uses  = set()
 
     @property
     def function(self):
@@ -401,7 +427,7 @@ class Operation(Local):
     """
 
     __slots__ = ("parent", "opcode", "type", "result",
-                  "_prev", "_next", "_args", "_metadata")
+                  "_prev", "_next", "_args", "_metadata", "_uses")
 
     def __init__(self, opcode, type, args, result=None, parent=None,
                  metadata=None):
@@ -413,6 +439,7 @@ class Operation(Local):
         self._metadata = None
         self._prev     = None
         self._next     = None
+        self._uses     = set()
         if metadata:
             self.add_metadata(metadata)
 
@@ -426,11 +453,6 @@ class Operation(Local):
 
     metadata = property(get_metadata, set_metadata)
 
-    @property
-    def uses(self):
-        "Enumerate all Operations referring to this value"
-        return self.function.uses[self]
-
     @property
     def args(self):
         """Operands to this Operation (readonly)"""
@@ -474,16 +496,18 @@ class Operation(Local):
             newargs = nestedmap(lambda arg: replacements.get(arg, arg), self.args)
             self.set_args(newargs)
 
-    @match
     def replace(self, op):
         """
         Replace this operation with a new operation, changing this operation.
+        If `op` is a list of operations, see replace_list().
         """
+        if isinstance(op, list):
+            return self.replace_list(op)
+
         assert op.result is not None and op.result == self.result
         self.replace_op(op.opcode, op.args, op.type)
         self.add_metadata(op.metadata)
 
-    @replace.case(op=list)
     def replace_list(self, op):
         """
         Replace this Op with a list of other Ops. If no Op has the same
@@ -523,20 +547,37 @@ class Operation(Local):
 
     def set_args(self, args):
         """Set a new argslist"""
-        _del_args(self.function.uses, self, self.args)
-        _add_args(self.function.uses, self, args)
+        if self.parent is not None:
+            old, new = set(_operands(self._args)), set(_operands(args))
+            for arg in old - new:
+                arg._uses.discard(self)
+            for arg in new - old:
+                arg._uses.add(self)
+        self._args = args
+
+    def _replace_arg(self, src, dst):
+        """Replace all occurrences of `src` in the args with `dst`"""
+        args = list(self._args)
+        for i, arg in enumerate(args):
+            if arg is src:
+                args[i] = dst
+            elif isinstance(arg, list) and any(x is src for x in arg):
+                args[i] = [dst if x is src else x for x in arg]
         self._args = args
 
+        src._uses.discard(self)
+        if isinstance(dst, _usable):
+            dst._uses.add(self)
+
     # ______________________________________________________________________
 
     def delete(self):
         """Delete this operation"""
-        if self.uses:
+        if self._uses:
             raise error.IRError(
                 "Operation %s is still in use and cannot be deleted" % (self,))
 
-        _del_args(self.function.uses, self, self.args)
-        del self.function.uses[self]
+        _del_args(self, self.args)
         self.unlink()
         self.result = "deleted(%s)" % (self.result,)
 
@@ -601,21 +642,73 @@ class Operation(Local):
 
 
 
-def _add_args(uses, newop, args):
+_usable = (Operation, FuncArg, Block)
+
+def _operands(args):
+    "Iterate over the values in (one level nested) args that track uses"
+    for arg in args:
+        if isinstance(arg, list):
+            for x in arg:
+                if isinstance(x, _usable):
+                    yield x
+        elif isinstance(arg, _usable):
+            yield arg
+
+def _add_args(newop, args):
     "Update uses when a new instruction is inserted"
-    def add(arg):
-        if isinstance(arg, (Op, FuncArg, Block)):
-            uses[arg].add(newop)
-    nestedmap(add, args)
+    for arg in _operands(args):
+        arg._uses.add(newop)
 
-def _del_args(uses, oldop, args):
+def _del_args(oldop, args):
     "Delete uses when an instruction is removed"
-    seen = set() # Guard against duplicates in 'args'
-    def remove(arg):
-        if isinstance(arg, (FuncArg, Operation)) and arg not in seen:
-            uses[arg].remove(oldop)
-            seen.add(arg)
-    nestedmap(remove, args)
+    for arg in _operands(args):
+        arg._uses.discard(oldop)
+
+
+class UseMap(object):
+    """
+    Map the values of a function to the set of Operations using them:
+
+        { Value : {Operation} }
+
+    Values without uses map to an empty set, and are left out when
+    iterating.
+    """
+
+    __slots__ = ('func',)
+
+    def __init__(self, func):
+        self.func = func
+
+    def __getitem__(self, value):
+        uses = getattr(value, '_uses', None)
+        return set() if uses is None else uses
+
+    def __contains__(self, value):
+        return bool(self[value])
+
+    def __iter__(self):
+        for arg in self.func.argdict.values():
+            if arg._uses:
+                yield arg
+        for block in self.func.blocks:
+            if block._uses:
+                yield block
+            for op in block:
+                if op._uses:
+                    yield op
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [value._uses for value in self]
+
+    def items(self):
+        return [(value, value._uses) for value in self]
 
 
 class Constant(Value):
@@ -103,18 +103,20 @@ def verify_uniqueness(func):
 
 def verify_block_order(func):
     """Verify block order according to dominator tree"""
-    from pykit.analysis import cfa
+    from pykit.analysis import cfa, dominators
 
     flow = cfa.cfg(func)
-    dominators = cfa.compute_dominators(func, flow)
+    domtree = dominators.dominator_tree(func, flow)
 
+    # Each block is preceded by its immediate dominator, and hence by all
+    # its dominators
     visited = set()
     for block in func.blocks:
-        visited.add(block.name)
-        for dominator in dominators[block.name]:
-            if dominator not in visited:
-                raise VerifyError("Dominator %s does not precede block %s" % (
-                                                        dominator, block.name))
+        idom = domtree.idom(block)
+        if idom is not None and idom not in visited:
+            raise VerifyError("Dominator %s does not precede block %s" % (
+                                                    idom.name, block.name))
+        visited.add(block)
 
 def verify_operations(func_or_block):
     """Verify all operations in the function or block"""
@@ -41,4 +41,5 @@ def lower_fields(func, env):
         op.replace(newop)
 
 
-run = lower_fields
\ No newline at end of file
+run = lower_fields
+preserves = ("cfg", "dominators", "loops", "callgraph")
\ No newline at end of file
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+"""
+Global value numbering: eliminate redundant computations.
+
+We walk the dominator tree in pre-order, keeping a scoped table mapping
+
+    (opcode, type, operands) -> Op
+
+for the operations that are available on entry to the current block, i.e.
+those in the block's dominators. An operation whose key is already in the
+table is redundant: its uses are replaced by the dominating operation, and
+the operation is deleted. Since uses are replaced eagerly, operands of
+later operations already refer to their value number.
+
+Only operations without side effects are numbered (analysis.deadcode), and
+operations that produce a fresh value every time (alloca, new_exc, phi) are
+left alone. Operations reading memory (load, ptrload, and field accesses
+through pointers) are only reused within a block, up to the next operation
+that may have side effects.
+
+Front ends can declare custom opcodes as pure through the environment:
+
+    env["optimizations.pure"].add("my_opcode")
+"""
+
+from __future__ import print_function, division, absolute_import
+
+from pykit.analysis import deadcode, manager
+from pykit.ir import Const
+from pykit.utils import hashable
+
+# Analyses that remain valid after running this pass
+preserves = ("cfg", "dominators", "loops")
+
+# Effect-free opcodes that produce a new value every time
+unique = set(['alloca', 'new_exc', 'phi'])
+
+# Opcodes that read memory
+memory_reads = set(['load', 'ptrload'])
+field_reads = set(['getfield', 'getindex'])
+
+commutative = set(['add', 'mul', 'bitand', 'bitor', 'bitxor', 'eq', 'ne'])
+
+#===------------------------------------------------------------------===
+# Keys
+#===------------------------------------------------------------------===
+
+def operand_key(arg):
+    """Key of an operand, equal keys denote the same value"""
+    if isinstance(arg, Const):
+        const = arg.const
+        if isinstance(const, (float, complex)):
+            const = repr(const) # distinguish -0.0 and 0.0, equate nans
+        if hashable(const):
+            return ('const', arg.type, type(const), const)
+    elif isinstance(arg, list):
+        return tuple(map(operand_key, arg))
+    return arg
+
+def value_key(op):
+    """Key of an operation: (opcode, type, operands)"""
+    args = [operand_key(arg) for arg in op.args]
+    if op.opcode in commutative:
+        args.sort(key=hash)
+    return (op.opcode, op.type, tuple(args))
+
+def reads_memory(op):
+    return op.opcode in memory_reads or (op.opcode in field_reads and
+                                         op.args[0].type.is_pointer)
+
+#===------------------------------------------------------------------===
+# GVN
+#===------------------------------------------------------------------===
+
+def gvn(func, dominators, pure=()):
+    """
+    Replace operations by equivalent operations that dominate them.
+    Opcodes in `pure` are treated as effect-free. Returns the number of
+    eliminated operations.
+    """
+    numbered = (deadcode.effect_free | set(pure)) - unique
+    available = {}  # { key : Op }
+    eliminated = 0
+
+    # Stack of (block, keys to remove when leaving the block's subtree)
+    stack = [(dominators.root, None)]
+    while stack:
+        block, added = stack.pop()
+        if added is not None:
+            for key in added:
+                del available[key]
+            continue
+
+        added = []
+        memory = {} # memory reads, valid until the next side effect
+        for op in block.ops:
+            if op.opcode not in numbered:
+                memory.clear()
+                continue
+
+            key = value_key(op)
+            if not hashable(key):
+                continue
+
+            table = memory if reads_memory(op) else available
+            leader = table.get(key)
+            if leader is None:
+                table[key] = op
+                if table is available:
+                    added.append(key)
+            else:
+                op.replace_uses(leader)
+                op.delete()
+                eliminated += 1
+
+        stack.append((block, added))
+        stack.extend((child, None)
+                         for child in reversed(dominators.children[block]))
+
+    return eliminated
+
+def run(func, env=None):
+    dominators = manager.get_analysis(env, "dominators", func)
+    pure = env and env.get("optimizations.pure") or ()
+    gvn(func, dominators, pure)
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+"""
+Loop-invariant code motion.
+
+For each natural loop (analysis.loop_detection), innermost first, we hoist
+operations whose operands are all defined outside the loop into the loop
+preheader. The preheader is the single block outside the loop that jumps to
+the loop head, we create one if there is no such block:
+
+        pred1  pred2                  pred1  pred2
+            \  /                          \  /
+            head  <-.        =>         preheader
+             |      |                       |
+            body ---'                      head  <-.
+                                            |      |
+                                           body ---'
+
+Operations hoisted out of an inner loop end up in the inner preheader,
+which is part of the enclosing loop, and may be hoisted further from there.
+
+Hoisted operations execute even if the loop body does not, so we only hoist
+operations that are free of side effects and cannot trap (see
+optimizations.gvn for the memory model). Loads are hoisted only from
+allocas that are not stored to inside the loop and whose address does
+not escape.
+"""
+
+from __future__ import print_function, division, absolute_import
+
+from pykit import types
+from pykit.analysis import deadcode, manager
+from pykit.ir import Op, Operation
+from pykit.optimizations import gvn
+from pykit.utils import flatten
+
+# The CFG is updated when preheaders are inserted
+preserves = ("cfg",)
+
+# Opcodes that may trap for integer operands
+trapping = set(['div', 'mod'])
+
+#===------------------------------------------------------------------===
+# Preheaders
+#===------------------------------------------------------------------===
+
+def find_preheader(func, cfg, loop):
+    """
+    Return the preheader of `loop`, creating one if needed. Returns None if
+    the loop head cannot have a preheader (e.g. it is the entry block or is
+    entered through an exception edge).
+    """
+    head = loop.head
+    blocks = set(loop.blocks)
+    outside = [pred for pred in cfg.predecessors(head) if pred not in blocks]
+    if not outside:
+        return None
+    elif len(outside) == 1 and cfg.successors(outside[0]) == [head]:
+        return outside[0]
+
+    for pred in outside:
+        if head not in flatten(pred.terminator.args):
+            return None # exceptional edge
+
+    order = list(func.blocks)
+    after = order[order.index(head) - 1]
+    preheader = func.new_block("preheader", after=after)
+
+    # Move the incoming values from outside the loop to the preheader
+    for phi in list(head.leaders):
+        if phi.opcode != 'phi':
+            continue
+        preds, values = phi.args
+        incoming = [(p, v) for p, v in zip(preds, values) if p in outside]
+        inside = [(p, v) for p, v in zip(preds, values) if p not in outside]
+        if len(incoming) == 1:
+            [(_, value)] = incoming
+        else:
+            value = Op('phi', phi.type, [[p for p, v in incoming],
+                                         [v for p, v in incoming]],
+                       result=func.temp("phi"))
+            preheader.append(value)
+        inside.append((preheader, value))
+        phi.set_args([[p for p, v in inside], [v for p, v in inside]])
+
+    preheader.append(Op('jump', types.Void, [head], result=func.temp("jump")))
+    for pred in outside:
+        pred.terminator.replace_args({head: preheader})
+        cfg.remove_edge(pred, head)
+        cfg.add_edge(pred, preheader)
+    cfg.add_edge(preheader, head)
+
+    return preheader
+
+#===------------------------------------------------------------------===
+# Hoisting
+#===------------------------------------------------------------------===
+
+def private_allocas(func):
+    """Allocas that are only loaded from and stored to"""
+    result = set()
+    for op in func.ops:
+        if op.opcode == 'alloca' and all(
+                use.opcode == 'load' or (use.opcode == 'store' and
+                                         use.args[0] is not op)
+                    for use in op.uses):
+            result.add(op)
+    return result
+
+def hoistable(op, loopblocks, stored, allocas, pure):
+    """Whether `op` may be hoisted out of the loop"""
+    if op.opcode == 'load':
+        var = op.args[0]
+        if var not in allocas or var in stored:
+            return False
+    elif (op.opcode not in pure or op.opcode in gvn.unique or
+              gvn.reads_memory(op) or
+              (op.opcode in trapping and not op.type.is_real)):
+        return False
+
+    return all(not isinstance(arg, Operation) or arg.block not in loopblocks
+                   for arg in flatten(op.args))
+
+def hoist(loop, preheader, allocas, pure):
+    """Hoist loop-invariant operations into the preheader"""
+    loopblocks = set(loop.blocks)
+    stored = set(op.args[1] for block in loop.blocks
+                                for op in block.ops if op.opcode == 'store')
+
+    hoisted = 0
+    changed = True
+    while changed:
+        changed = False
+        for block in loop.blocks:
+            for op in list(block.ops):
+                if hoistable(op, loopblocks, stored, allocas, pure):
+                    op.unlink()
+                    op.insert_before(preheader.terminator)
+                    hoisted += 1
+                    changed = True
+
+    return hoisted
+
+#===------------------------------------------------------------------===
+# LICM
+#===------------------------------------------------------------------===
+
+def innermost_first(loops, parents=()):
+    """Iterate over (loop, enclosing loops), innermost loops first"""
+    for loop in loops:
+        for item in innermost_first(loop.children, parents + (loop,)):
+            yield item
+        yield loop, parents
+
+def licm(func, cfg, loops, pure=()):
+    """
+    Hoist loop-invariant code out of `loops` (a loop nesting forest).
+    Returns the number of hoisted operations.
+    """
+    pure = deadcode.effect_free | set(pure)
+    allocas = private_allocas(func)
+
+    hoisted = 0
+    for loop, parents in innermost_first(loops):
+        preheader = find_preheader(func, cfg, loop)
+        if preheader is None:
+            continue
+        for parent in parents:
+            if preheader not in parent.blocks:
+                parent.blocks.append(preheader)
+        hoisted += hoist(loop, preheader, allocas, pure)
+
+    return hoisted
+
+def run(func, env=None):
+    analyses = manager.get_manager(env)
+    cfg = analyses.get("cfg", func)
+    loops = analyses.get("loops", func)
+    pure = env and env.get("optimizations.pure") or ()
+    licm(func, cfg, loops, pure)
@@ -36,4 +36,5 @@ def rewrite_exceptions(func, env, exc_model=interp.ExceptionModel()):
             op.replace(b.jump(handler, result=op.result))
 
 
-run = rewrite_exceptions
\ No newline at end of file
+run = rewrite_exceptions
+preserves = ("callgraph",)
\ No newline at end of file
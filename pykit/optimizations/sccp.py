@@ -32,7 +32,7 @@ from functools import partial
 from collections import defaultdict, deque
 
 from pykit import types
-from pykit.analysis import cfa
+from pykit.analysis import cfa, manager
 from pykit.ir import Op, Const, vmap
 
 #===------------------------------------------------------------------===
@@ -55,7 +55,7 @@ cell = lambda: top
 isconst = lambda x: x not in (top, bottom)
 unwrap = lambda x: x.const if isinstance(x, Const) else x
 
-def sccp(func, constantfolder=None):
+def sccp(func, constantfolder=None, cfg=None):
     """
     Perform Sparse conditional constant propagation. The idea is to have two
     queues, one for blocks and one for SSA variables (Ops).
@@ -83,8 +83,8 @@ def sccp(func, constantfolder=None):
     # Object that folds operations with constant inputs
     constantfolder = constantfolder or SCCPFolder(executable)
 
-    # Control flow graph (networkx.DiGraph)
-    cfg = cfa.cfg(func)
+    # Control flow graph (pykit.analysis.cfa.CFG)
+    cfg = cfg or cfa.cfg(func)
 
     cfedges = deque([(None, func.startblock)]) # remaining cfg edges
     ssavars = deque()           # SSA edges: (Op, Op)
@@ -368,5 +368,6 @@ def apply_result(func, cfg, deadblocks, cells):
 #===------------------------------------------------------------------===
 
 def run(func, env=None, constantfolder=None):
-    deadblocks, cells, cfg = sccp(func, constantfolder)
+    cfg = manager.get_analysis(env, "cfg", func)
+    deadblocks, cells, cfg = sccp(func, constantfolder, cfg)
     apply_result(func, cfg, deadblocks, cells)
\ No newline at end of file
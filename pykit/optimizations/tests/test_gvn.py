@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import
+
+import unittest
+import textwrap
+
+from pykit import types
+from pykit.analysis import cfa
+from pykit.parsing import from_c
+from pykit.optimizations import gvn
+from pykit.ir import Builder, Function, Op, verify, interp
+
+opcodes = lambda f: [op.opcode for op in f.ops]
+
+source = textwrap.dedent("""
+    #include <pykit_ir.h>
+
+    Int32 f(Int32 x, Int32 y) {
+        Int32 a, b, c;
+        a = x + y;
+        b = y + x;
+        if (x < y)
+            c = x + y;
+        else
+            c = x * y;
+        return a + b + c;
+    }
+
+    Int32 g(Int32 x, Int32 y) {
+        Int32 a;
+        if (x < y)
+            a = x - y;
+        else
+            a = x - y;
+        return a;
+    }
+""")
+
+class TestGVN(unittest.TestCase):
+
+    def setUp(self):
+        self.mod = from_c(source)
+
+    def test_gvn(self):
+        f = self.mod.get_function("f")
+        cfa.run(f)
+        expected = interp.run(f, args=[2, 5])
+        gvn.run(f)
+        verify(f)
+
+        self.assertEqual(opcodes(f).count('add'), 3)
+        self.assertEqual(interp.run(f, args=[2, 5]), expected)
+
+    def test_not_dominated(self):
+        g = self.mod.get_function("g")
+        cfa.run(g)
+        gvn.run(g)
+        verify(g)
+        self.assertEqual(opcodes(g).count('sub'), 2)
+
+
+class TestMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.f = Function("f", ['x'],
+                          types.Function(types.Int32, [types.Int32], False))
+        self.b = Builder(self.f)
+        self.b.position_at_end(self.f.new_block('entry'))
+        self.x = self.f.get_arg('x')
+
+    def test_loads(self):
+        p = self.b.alloca(types.Pointer(types.Int32))
+        self.b.store(self.x, p)
+        a = self.b.load(p)
+        b = self.b.load(p)
+        self.b.store(self.b.add(a, b), p)
+        c = self.b.load(p)
+        self.b.ret(self.b.add(a, c))
+
+        gvn.run(self.f)
+        verify(self.f)
+        self.assertEqual(opcodes(self.f).count('load'), 2)
+        self.assertEqual(interp.run(self.f, args=[3]), 9)
+
+    def test_pure(self):
+        ops = [Op('my_op', types.Int32, [self.x]) for i in range(2)]
+        for op in ops:
+            self.b.emit(op)
+        self.b.ret(self.b.add(*ops))
+
+        gvn.run(self.f, {"optimizations.pure": set()})
+        self.assertEqual(opcodes(self.f).count('my_op'), 2)
+        gvn.run(self.f, {"optimizations.pure": set(['my_op'])})
+        verify(self.f)
+        self.assertEqual(opcodes(self.f).count('my_op'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
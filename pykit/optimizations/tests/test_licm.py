@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import
+
+import unittest
+import textwrap
+
+from pykit import types
+from pykit.analysis import cfa, loop_detection
+from pykit.parsing import from_c
+from pykit.optimizations import licm
+from pykit.ir import Builder, Function, Const, verify, interp
+
+source = textwrap.dedent("""
+    #include <pykit_ir.h>
+
+    Int32 f(Int32 n, Int32 a, Int32 b) {
+        Int32 i, j, s;
+        s = 0;
+        for (i = 0; i < n; i = i + 1) {
+            for (j = 0; j < n; j = j + 1) {
+                s = s + a * b + i / (j + 1);
+            }
+        }
+        return s;
+    }
+""")
+
+def loop_blocks(func):
+    loops = loop_detection.find_natural_loops(func)
+    return set(block for loop in loop_detection.flatloops(loops)
+                         for block in loop.blocks)
+
+class TestLICM(unittest.TestCase):
+
+    def test_licm(self):
+        f = from_c(source).get_function("f")
+        cfa.run(f)
+        expected = interp.run(f, args=[3, 2, 5])
+        licm.run(f)
+        verify(f)
+
+        inloop = loop_blocks(f)
+        [mul] = [op for op in f.ops if op.opcode == 'mul']
+        [div] = [op for op in f.ops if op.opcode == 'div']
+        self.assertNotIn(mul.block, inloop)
+        self.assertIn(div.block, inloop) # may trap
+        self.assertEqual(interp.run(f, args=[3, 2, 5]), expected)
+
+    def test_loads(self):
+        f = Function("f", ['n', 'x'],
+                     types.Function(types.Int32, [types.Int32] * 2, False))
+        b = Builder(f)
+        b.position_at_end(f.new_block('entry'))
+        n, x = f.get_arg('n'), f.get_arg('x')
+        var = b.alloca(types.Pointer(types.Int32))
+        acc = b.alloca(types.Pointer(types.Int32))
+        b.store(x, var)
+        b.store(Const(0, types.Int32), acc)
+        cond, body, exit = b.gen_loop(stop=n)
+        value = b.load(var)
+        b.store(b.add(b.load(acc), b.mul(value, value)), acc)
+        b.position_at_end(exit)
+        b.ret(b.load(acc))
+
+        licm.run(f)
+        verify(f)
+
+        opcodes = [op.opcode for op in body.ops]
+        self.assertEqual(opcodes, ['load', 'add', 'store', 'jump'])
+        self.assertEqual(interp.run(f, args=[4, 3]), 36)
+
+    def test_preheader(self):
+        f = Function("f", ['n', 'x'],
+                     types.Function(types.Int32, [types.Int32] * 2, False))
+        b = Builder(f)
+        entry, other, head, body, exit = [
+            f.new_block(name)
+                for name in ['entry', 'other', 'head', 'body', 'exit']]
+        n, x = f.get_arg('n'), f.get_arg('x')
+        zero, one = Const(0, types.Int32), Const(1, types.Int32)
+
+        b.position_at_end(entry)
+        b.cbranch(b.lt(x, zero), head, other)
+        b.position_at_end(other)
+        b.jump(head)
+
+        b.position_at_end(head)
+        i = b.phi(types.Int32, [entry, other], [zero, one])
+        b.cbranch(b.lt(i, n), body, exit)
+
+        b.position_at_end(body)
+        i_next = b.add(i, b.mul(x, x))
+        i.set_args([[entry, other, body], [zero, one, i_next]])
+        b.jump(head)
+
+        b.position_at_end(exit)
+        b.ret(i)
+
+        licm.run(f)
+        verify(f)
+
+        preds = cfa.cfg(f).predecessors(head)
+        self.assertEqual(len(preds), 2)
+        [preheader] = [pred for pred in preds if pred is not body]
+        self.assertEqual([op.opcode for op in preheader.ops],
+                         ['phi', 'mul', 'jump'])
+        self.assertEqual(interp.run(f, args=[10, 3]), 10)
+        self.assertEqual(interp.run(f, args=[10, -3]), 18)
+
+
+if __name__ == '__main__':
+    unittest.main()
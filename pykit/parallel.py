@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+Run the function-local pipeline stages for all functions in a module in
+parallel, using a pool of processes.
+
+Functions are encoded as plain data (pykit.ir.encoding) and sent to worker
+processes, which build a fresh environment through a picklable
+`env_factory` and run the stages. The results are decoded in place into the
+original Function objects, so references to these functions stay valid.
+
+Each function is transformed in isolation, in a module of its own: workers
+do not see the other functions of the module, transformed or not. Only
+function-local stages are supported, i.e. passes that do not inspect or
+change other functions (no inlining or interprocedural analyses).
+"""
+
+from __future__ import print_function, division, absolute_import
+
+from pykit import pipeline
+from pykit.ir import Module
+from pykit.ir import encoding
+
+function_stages = ["pipeline.analyze", "pipeline.optimize", "pipeline.lower"]
+
+def default_env():
+    from pykit import environment
+    return environment.fresh_env()
+
+#===------------------------------------------------------------------===
+# Workers
+#===------------------------------------------------------------------===
+
+def run_stages(args):
+    """Worker: run the pipeline stages on an encoded function"""
+    data, env_factory, stages = args
+    env = env_factory()
+    func = encoding.decode_function(data, module=Module())
+    for stage in stages:
+        func, env = pipeline.run(func, env, env[stage])
+    return encoding.encode_function(func)
+
+def make_executor(processes=None):
+    """Create a process pool, using concurrent.futures where available"""
+    try:
+        from concurrent.futures import ProcessPoolExecutor
+    except ImportError:
+        import multiprocessing
+        return multiprocessing.Pool(processes)
+    else:
+        return ProcessPoolExecutor(processes)
+
+def _shutdown(executor):
+    if hasattr(executor, 'shutdown'):
+        executor.shutdown()
+    else:
+        executor.close()
+        executor.join()
+
+#===------------------------------------------------------------------===
+# Driver
+#===------------------------------------------------------------------===
+
+def run_module(module, env_factory=default_env, stages=function_stages,
+               processes=None, executor=None):
+    """
+    Run the given function-local pipeline stages on all functions in the
+    module.
+
+    :param env_factory: picklable callable returning a fresh environment
+    :param processes: number of worker processes, 1 runs in this process
+    :param executor: object with a map() method to run the workers, e.g.
+                     a concurrent.futures.Executor or multiprocessing.Pool
+    """
+    if executor is None and processes == 1:
+        mapper = map
+    else:
+        pool = executor or make_executor(processes)
+        mapper = pool.map
+
+    functions = [func for name, func in sorted(module.functions.items())
+                          if func.blocks]
+    try:
+        work = [(encoding.encode_function(func), env_factory, stages)
+                    for func in functions]
+        for func, result in zip(functions, mapper(run_stages, work)):
+            encoding.decode_function(result, func)
+    finally:
+        if executor is None and processes != 1:
+            _shutdown(pool)
+
+    return module
@@ -1 +1,2 @@
-from .cirparser import from_c
+from .cirparser import from_c, iter_c
+from .irparser import from_text
@@ -2,21 +2,31 @@
 
 """
 Parse pykit IR in the form of C.
+
+Source is preprocessed in-process by ply's cpp, with the output of the
+pykit_ir.h prelude cached, and parsed by a shared CParser. Parsed modules
+are cached by a hash of the source, and invalidated when the headers they
+include change.
 """
 
 from __future__ import print_function, division, absolute_import
 
 from io import StringIO
 from os.path import dirname, abspath, join
+import os
+import re
 import tempfile
 import json
 import tokenize
+import threading
+import collections
 from functools import partial
 from collections import defaultdict, namedtuple
 
 from pykit import types
 from pykit.ir import (defs, Module, Function, Builder, Const, GlobalValue,
                       ops, Op)
+from pykit.ir import serialize, hashing
 
 from pykit.deps.pycparser_special import preprocess_file, c_ast, CParser
 
@@ -205,7 +215,7 @@ class PykitIRVisitor(c_ast.NodeVisitor):
         else:
             # Global variable
             type = self.global_vars[varname]
-            self.mod.add_global(GlobalValue(varname, type=self.type,
+            self.mod.add_global(GlobalValue(varname, type=type,
                                             value=self.visit(rhs, type=type)))
 
     # ______________________________________________________________________
@@ -420,25 +430,219 @@ class PykitIRVisitor(c_ast.NodeVisitor):
 
 debug_args = dict(lex_optimize=False, yacc_optimize=False, yacc_debug=True)
 
-def parse(source, filename):
-    return CParser().parse(source, filename)
+#===------------------------------------------------------------------===
+# C preprocessing
+#===------------------------------------------------------------------===
 
-def from_c(source, filename="<string>"):
-    # TODO: process metadata
-    # metadata = preprocess(source)
+def preprocess_source(source, filename="<string>"):
+    """Run the C preprocessor on `source` in-process"""
+    from pykit.parsing import preprocessor
+    return preprocessor.preprocess(source, filename)
 
-    # Preprocess...
+def preprocess_cpp(source):
+    """Preprocess with the system's C preprocessor"""
     f = tempfile.NamedTemporaryFile('w+t')
     try:
         f.write(source)
         f.flush()
-        source = preprocess_file(f.name, cpp_args=['-I' + ir_root])
+        return preprocess_file(f.name, cpp_args=['-I' + ir_root])
     finally:
         f.close()
 
+_include_directive = re.compile(r'^#\s*\d+\s+"([^"]*)"', re.MULTILINE)
+
+def included_files(source, filename="<string>"):
+    """Return the files included by preprocessed source"""
+    return sorted(set(name for name in _include_directive.findall(source)
+                               if name != filename and os.path.isfile(name)))
+
+def file_signature(filenames):
+    """Modification times and sizes of files, to detect changes"""
+    result = []
+    for filename in filenames:
+        try:
+            st = os.stat(filename)
+        except OSError:
+            result.append((filename, None, None))
+        else:
+            result.append((filename, st.st_mtime, st.st_size))
+    return result
+
+#===------------------------------------------------------------------===
+# Front end
+#===------------------------------------------------------------------===
+
+_parser = None
+_lock = threading.Lock()
+
+# LRU cache of parsed modules:
+#     { key : (included files, file_signature(files), serialized module) }
+_module_cache = collections.OrderedDict()
+cache_size = 256
+
+# Keys of sources parsed once. Modules are serialized and cached when their
+# source is parsed again, so one-off sources do not pay for serialization
+_parsed = collections.OrderedDict()
+
+def parse(source, filename, typedefs=None):
+    """Parse preprocessed source with a shared CParser"""
+    global _parser
+    with _lock:
+        if _parser is None:
+            _parser = CParser()
+        return _parser.parse(source, filename, typedefs=typedefs)
+
+def clear_cache():
+    """Clear the cache of parsed modules"""
+    with _lock:
+        _module_cache.clear()
+        _parsed.clear()
+
+def _trim(lru):
+    while len(lru) > cache_size:
+        lru.popitem(last=False)
+
+def _lookup(key):
+    """Return the cached module data, unless an included file changed"""
+    with _lock:
+        entry = _module_cache.pop(key, None)
+        if entry is None:
+            return None
+        files, signature, data = entry
+        if file_signature(files) != signature:
+            return None
+        _module_cache[key] = entry
+        return data
+
+def _store(key, files, mod):
+    """Cache a module if it was parsed before"""
+    with _lock:
+        if _parsed.pop(key, None) is None:
+            _parsed[key] = True
+            _trim(_parsed)
+            return
+
+    try:
+        data = serialize.dumps(mod)
+    except TypeError:
+        return # unserializable constants, don't cache
+
+    signature = file_signature(files)
+    with _lock:
+        _module_cache[key] = files, signature, data
+        _trim(_module_cache)
+
+def from_c(source, filename="<string>", use_cpp=False, cache=True):
+    """
+    Parse C source into a Module. Modules are cached by the hash of the
+    source once they are parsed a second time, a hit returns a fresh copy of
+    the cached module. Preprocessing happens in-process, set use_cpp=True to
+    run the system's cpp instead.
+    """
+    # TODO: process metadata
+    # metadata = preprocess(source)
+
+    key = None
+    if cache:
+        hasher = hashing.Hasher()
+        for field in [filename, use_cpp, source]:
+            hasher.encode_py(field)
+        key = hasher.hexdigest()
+        data = _lookup(key)
+        if data is not None:
+            return serialize.loads(data)
+
+    # Preprocess...
+    if use_cpp:
+        source = preprocess_cpp(source)
+    else:
+        source = preprocess_source(source, filename)
+
     # Parse
     ast = parse(source, filename)
     # ast.show()
     visitor = PykitIRVisitor(dict(type_env))
     visitor.visit(ast)
-    return visitor.mod
+    mod = visitor.mod
+
+    if key is not None:
+        _store(key, included_files(source, filename), mod)
+
+    return mod
+
+#===------------------------------------------------------------------===
+# Streaming
+#===------------------------------------------------------------------===
+
+_decl_token = re.compile(r"""
+    "(?:[^"\\\n]|\\.)*" | '(?:[^'\\\n]|\\.)*'  # literals
+  | ^[ \t]*\#[^\n]*                             # line directives
+  | [{}()]
+""", re.VERBOSE | re.MULTILINE)
+
+_line_directive = re.compile(r'[ \t]*#\s*(?:line\s+)?(\d+)(?:\s+"([^"]*)")?')
+
+def split_functions(source, filename="<string>"):
+    """
+    Split preprocessed source after each function definition. Yields chunks
+    of source, each starting with a line directive for its location.
+    """
+    depth = 0
+    start = 0
+    head = '# 1 "%s"\n' % (filename,) # directive for the current chunk
+    body = False        # whether the open brace at depth 0 starts a body
+    last = None         # last match at depth 0
+    lineno, pos = 1, 0  # line number at `pos`
+
+    for m in _decl_token.finditer(source):
+        tok = m.group()
+        if tok[0] in '"\'':
+            continue
+        elif tok.lstrip()[0] == '#':
+            directive = _line_directive.match(tok)
+            if directive:
+                lineno, pos = int(directive.group(1)), m.end() + 1
+                filename = directive.group(2) or filename
+            continue
+        elif tok == '{':
+            if depth == 0:
+                body = (last is not None and last.group() == ')' and
+                        not source[last.end():m.start()].strip())
+            depth += 1
+        elif tok == '}':
+            depth -= 1
+            if depth == 0 and body:
+                yield head + source[start:m.end()]
+                lineno += source.count('\n', pos, m.end())
+                start = pos = m.end()
+                # Pad the line, to keep columns
+                column = start - (source.rfind('\n', 0, start) + 1)
+                head = '# %d "%s"\n%s' % (lineno, filename, ' ' * column)
+        if depth == 0:
+            last = m
+
+    if source[start:].strip():
+        yield head + source[start:]
+
+def iter_c(source, filename="<string>", use_cpp=False):
+    """
+    Parse C source one function at a time, yielding each Function as soon as
+    it is built. Functions are added to the same module (func.module), which
+    holds the functions and globals declared so far. Only the AST of the
+    current function is kept in memory.
+    """
+    if use_cpp:
+        source = preprocess_cpp(source)
+    else:
+        source = preprocess_source(source, filename)
+
+    visitor = PykitIRVisitor(dict(type_env))
+    typedefs = set()
+    for chunk in split_functions(source, filename):
+        ast = parse(chunk, filename, typedefs)
+        names = [node.decl.name for node in ast.ext
+                     if isinstance(node, c_ast.FuncDef)]
+        visitor.visit(ast)
+        del ast
+        for name in names:
+            yield visitor.mod.get_function(name)
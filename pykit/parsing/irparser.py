@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parse the textual IR printed by pykit.ir.pretty:
+
+    global %gv = Int32 const(0, Int32)
+
+    function Int32 f(Int32 %i) {
+    entry:
+        %0     = add(%i, const(1, Int32)) -> Int32
+        %1     = ret(%0) -> Void
+
+    }
+
+This is a hand-written single-pass parser, which builds Module and Function
+objects directly. Operands may refer to operations, blocks, functions and
+globals defined later in the text, references are resolved when the module
+is complete: %name is looked up as an operation or argument, a block of the
+function, and a function or global of the module, in that order.
+
+Values printed without a parseable representation (e.g. arbitrary Python
+objects) and operation metadata are not supported.
+"""
+
+from __future__ import print_function, division, absolute_import
+import re
+import ast
+import collections
+
+from pykit import types
+from pykit.ir import (Module, Function, GlobalValue, Block, Op, Constant,
+                      Pointer, Struct, Undef)
+from pykit.utils import Temper
+
+#===------------------------------------------------------------------===
+# Tokens
+#===------------------------------------------------------------------===
+
+_token = re.compile(r"""
+    (?:\s+|\#[^\n]*)*
+    (   %[\w.]+                                         # local
+      | [-+]?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?[lLjJ]?      # number
+      | [-+](?:inf|nan)                                 # infinity
+      | [uUbB]?(?:'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*")  # string
+      | [A-Za-z_][\w.]*                                 # name
+      | ->|\.\.\.|[()\[\]{},:=*]                        # punctuation
+      | \S                                              # invalid
+    )
+""", re.VERBOSE)
+
+def tokenize(text):
+    """
+    Return a list of tokens (strings), skipping whitespace and comments.
+    The list is terminated by None.
+    """
+    tokens = _token.findall(text)
+    tokens.append(None)
+    return tokens
+
+def token_kind(token):
+    """Return the kind of a token"""
+    if token is None:
+        return 'eof'
+    c = token[0]
+    if c == '%':
+        return 'local'
+    elif c.isdigit() or (c in '+-' and len(token) > 1):
+        return 'number'
+    elif token[-1] in '\'"':
+        return 'string'
+    elif c.isalpha() or c == '_':
+        return 'name'
+    return 'punct'
+
+#===------------------------------------------------------------------===
+# Parser
+#===------------------------------------------------------------------===
+
+typenames = dict((name, ty) for name, ty in vars(types).items()
+                                if isinstance(ty, types.Type))
+typeclasses = dict((cls.__name__, cls) for cls in types.alltypes)
+typeclasses['Typedef'] = types.Typedef
+
+pyconsts = { 'None': None, 'True': True, 'False': False,
+             'inf': float('inf'), 'nan': float('nan') }
+
+class Ref(object):
+    """Unresolved reference to a value (%name) at a token index"""
+
+    __slots__ = ('name', 'index')
+
+    def __init__(self, name, index):
+        self.name = name
+        self.index = index
+
+class StructLiteral(object):
+    """Struct constant before we know its type"""
+
+    def __init__(self, names, values):
+        self.names = names
+        self.values = values
+
+
+class Parser(object):
+    """
+    Parse IR text into a module.
+
+        fixups:     [(Operation, args, { name : value })] operations with
+                    unresolved arguments
+    """
+
+    def __init__(self, text, module=None):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.index = 0
+        self.module = module or Module()
+        self.fixups = []
+
+    # __________________________________________________________________
+    # Tokens
+
+    def peek(self):
+        return self.tokens[self.index]
+
+    def next(self):
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def accept(self, value):
+        """Consume the next token if it has the given value"""
+        if self.tokens[self.index] == value:
+            self.index += 1
+            return True
+        return False
+
+    def expect(self, value=None, kind=None):
+        token = self.next()
+        if (value is not None and token != value or
+                kind is not None and token_kind(token) != kind):
+            self.error("Expected %s, got %r" % (value or kind, token),
+                       self.index - 1)
+        return token
+
+    def error(self, msg, index=None):
+        """Raise a SyntaxError for the token at `index`"""
+        if index is None:
+            index = self.index - 1
+        pos = len(self.text)
+        for i, m in enumerate(_token.finditer(self.text)):
+            if i == index:
+                pos = m.start(1)
+                break
+        line = self.text.count("\n", 0, pos) + 1
+        raise SyntaxError("line %d: %s" % (line, msg))
+
+    # __________________________________________________________________
+    # Module
+
+    def parse_module(self):
+        while self.peek() is not None:
+            token = self.peek()
+            if token == 'function':
+                self.parse_function()
+            elif token in ('global', 'external'):
+                self.parse_global()
+            else:
+                self.error("Expected a function or global, got %r" % (token,),
+                           self.index)
+
+        self.resolve()
+        return self.module
+
+    def parse_global(self):
+        external = self.accept('external')
+        self.expect('global')
+        name = self.expect(kind='local')[1:]
+        self.expect('=')
+        type = self.parse_type()
+
+        value = None
+        token = self.peek()
+        if token is not None and token not in ('function', 'global',
+                                               'external'):
+            value = self.parse_arg()
+
+        self.module.add_global(GlobalValue(name, type, external, value=value))
+
+    def parse_function(self):
+        self.expect('function')
+        restype = self.parse_type()
+        name = self.expect(kind='name')
+
+        argtypes, argnames, varargs = [], [], False
+        self.expect('(')
+        while not self.accept(')'):
+            if argtypes or varargs:
+                self.expect(',')
+            if self.accept('...'):
+                varargs = True
+                continue
+            argtypes.append(self.parse_type())
+            argnames.append(self.expect(kind='local')[1:])
+
+        func = Function(name, argnames,
+                        types.Function(restype, argtypes, varargs))
+        self.module.add_function(func)
+        values = dict((name, func.get_arg(name)) for name in argnames)
+
+        block = None
+        self.expect('{')
+        while not self.accept('}'):
+            token = self.next()
+            kind = token_kind(token)
+            if kind == 'name':
+                self.expect(':')
+                block = func.add_block(Block(token, func))
+            elif kind == 'local' and block is not None:
+                self.expect('=')
+                opcode = self.expect(kind='name')
+                args = self.parse_args('(', ')')
+                self.expect('->')
+                op = Op(opcode, self.parse_type(), [], token[1:])
+                block.append(op)
+                values[op.result] = op
+                self.fixups.append((op, args, values))
+            else:
+                self.error("Expected a block label or operation, got %r" % (
+                    token,))
+
+        func.temp = make_temper(local_names(func))
+
+    # __________________________________________________________________
+    # Types
+
+    def parse_type(self):
+        token = self.next()
+        if token == '{':
+            names, fieldtypes = [], []
+            while not self.accept('}'):
+                if names:
+                    self.expect(',')
+                names.append(self.expect(kind='name'))
+                self.expect(':')
+                fieldtypes.append(self.parse_type())
+            type = types.Struct(names, fieldtypes)
+        elif token_kind(token) == 'name' and self.peek() == '(':
+            cls = typeclasses.get(token)
+            if cls is None:
+                self.error("Unknown type %r" % (token,))
+            elif cls is types.Typedef:
+                self.expect('(')
+                name = self.expect(kind='name')
+                self.expect(',')
+                type = types.Typedef(name, self.parse_type())
+                self.expect(')')
+            else:
+                type = cls(*self.parse_typeargs('(', ')'))
+        elif token_kind(token) == 'name' and token in typenames:
+            type = typenames[token]
+        else:
+            self.error("Expected a type, got %r" % (token,))
+
+        while self.accept('*'):
+            type = types.Pointer(type)
+        return type
+
+    def parse_typeargs(self, open, close):
+        self.expect(open)
+        args = []
+        while not self.accept(close):
+            if args:
+                self.expect(',')
+                if self.accept(close):
+                    break # trailing comma of a tuple
+            args.append(self.parse_typearg())
+        return args
+
+    def parse_typearg(self):
+        """Parse a field of a type: a type, list, tuple or Python value"""
+        token = self.peek()
+        if token == '[':
+            return self.parse_typeargs('[', ']')
+        elif token == '(':
+            return tuple(self.parse_typeargs('(', ')'))
+        elif token == '{' or token_kind(token) == 'name' and (
+                token in typenames or
+                token in typeclasses and
+                self.tokens[self.index + 1] == '('):
+            return self.parse_type()
+        return self.parse_pyvalue()
+
+    # __________________________________________________________________
+    # Values
+
+    def parse_args(self, open, close):
+        self.expect(open)
+        args = []
+        while not self.accept(close):
+            if args:
+                self.expect(',')
+            args.append(self.parse_arg())
+        return args
+
+    def parse_arg(self):
+        token = self.peek()
+        if token_kind(token) == 'local':
+            self.next()
+            return Ref(token[1:], self.index - 1)
+        elif token == '[':
+            return self.parse_args('[', ']')
+        elif token == 'const' and self.tokens[self.index + 1] == '(':
+            return self.parse_const()
+        elif token == '(':
+            # ((type) Undef) or ((type) address)
+            self.next()
+            self.expect('(')
+            type = self.parse_type()
+            self.expect(')')
+            if self.accept('Undef'):
+                value = Undef(type)
+            else:
+                value = Pointer(self.parse_pyvalue(), type)
+            self.expect(')')
+            return value
+        elif token == '{':
+            return self.parse_struct()
+        return self.parse_pyvalue()
+
+    def parse_const(self):
+        self.expect('const')
+        self.expect('(')
+        token = self.peek()
+        if token == '{':
+            value = self.parse_struct()
+        else:
+            value = self.parse_pyvalue()
+        self.expect(',')
+        type = self.parse_type()
+        self.expect(')')
+
+        if isinstance(value, StructLiteral):
+            value = Struct(value.names, value.values, type)
+        return Constant(value, type)
+
+    def parse_struct(self):
+        self.expect('{')
+        names, values = [], []
+        while not self.accept('}'):
+            if names:
+                self.expect(',')
+            names.append(self.expect(kind='name'))
+            self.expect(':')
+            values.append(self.parse_arg())
+        return StructLiteral(names, values)
+
+    def parse_pyvalue(self):
+        token = self.next()
+        kind = token_kind(token)
+        if kind == 'number':
+            return parse_number(token)
+        elif kind == 'string':
+            return ast.literal_eval(token)
+        elif kind == 'name':
+            return pyconsts.get(token, token)
+        self.error("Expected a value, got %r" % (token,))
+
+    # __________________________________________________________________
+    # References
+
+    def resolve(self):
+        for op, args, values in self.fixups:
+            op.set_args(self.resolve_args(args, values, op.function))
+        self.fixups = []
+
+    def resolve_args(self, args, values, func):
+        result = []
+        for arg in args:
+            if isinstance(arg, list):
+                arg = self.resolve_args(arg, values, func)
+            elif isinstance(arg, Ref):
+                arg = self.lookup(arg, values, func)
+            result.append(arg)
+        return result
+
+    def lookup(self, ref, values, func):
+        name = ref.name
+        if name in values:
+            return values[name]
+        elif name in func.blockmap:
+            return func.blockmap[name]
+        elif name in self.module.functions:
+            return self.module.functions[name]
+        elif name in self.module.globals:
+            return self.module.globals[name]
+        self.error("Undefined value %%%s in function %s" % (name, func.name),
+                   ref.index)
+
+#===------------------------------------------------------------------===
+# Helpers
+#===------------------------------------------------------------------===
+
+def parse_number(s):
+    if s[-1] in 'jJ':
+        return complex(s)
+    try:
+        return int(s.rstrip('lL'))
+    except ValueError:
+        return float(s)
+
+def local_names(func):
+    """All local names of a function"""
+    names = list(func.argnames)
+    for block in func.blocks:
+        names.append(block.name)
+        names.extend(op.result for op in block.ops)
+    return names
+
+def make_temper(names):
+    """Create a Temper that does not hand out any of the given names"""
+    temps = collections.defaultdict(int)
+    for name in names:
+        base, dot, tail = name.rpartition('.')
+        if dot and tail.isdigit():
+            temps[base] = max(temps[base], int(tail) + 1)
+        else:
+            temps[name] = max(temps[name], 1)
+    return Temper(temps, names)
+
+#===------------------------------------------------------------------===
+# API
+#===------------------------------------------------------------------===
+
+def from_text(text, module=None):
+    """Parse IR text into a (new or given) Module"""
+    return Parser(text, module).parse_module()
+
+def parse_type(text):
+    """Parse a type, e.g. 'Int32*' or '{ x:Float64, y:Float64 }'"""
+    parser = Parser(text)
+    type = parser.parse_type()
+    parser.expect(kind='eof')
+    return type
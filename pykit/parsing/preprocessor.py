@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+"""
+In-process C preprocessor for pykit IR in the form of C, based on ply's cpp.
+The output of the pykit_ir.h prelude is cached, and line directives are
+emitted around included headers, so that coordinates refer to the original
+source. Directives name the included files by path, so that callers can
+tell which files the output depends on.
+
+This module is imported on first use, since importing the vendored ply
+imports all of the vendored pycparser.
+"""
+
+from __future__ import print_function, division, absolute_import
+import os
+import copy
+
+from pykit.parsing.cirparser import ir_root
+from pykit.deps.pycparser.ply import lex, cpp
+
+prelude = "<pykit_ir.h>" # headers preprocessed only once
+
+_cpp_lexer = None
+_header_cache = {} # { prelude : (stat, tokens, { name : Macro }) }
+
+class Preprocessor(cpp.Preprocessor):
+    """C preprocessor, which caches the output of the prelude"""
+
+    def __init__(self, filename):
+        global _cpp_lexer
+        if _cpp_lexer is None:
+            _cpp_lexer = lex.lex(module=cpp)
+        cpp.Preprocessor.__init__(self, _cpp_lexer.clone())
+        self.add_path(ir_root)
+        self.filename = filename
+
+    def include(self, tokens):
+        if not tokens:
+            return
+
+        name = "".join(tok.value for tok in tokens)
+        line = tokens[0].lineno
+        path = self.find_include(name)
+        stat = _stat(path)
+        if name in _header_cache and _header_cache[name][0] == stat:
+            _, toks, macros = _header_cache[name]
+            self.macros.update(macros)
+        else:
+            before = dict(self.macros)
+            toks = list(cpp.Preprocessor.include(self, tokens))
+            if name == prelude:
+                macros = dict((k, m) for k, m in self.macros.items()
+                                         if before.get(k) is not m and
+                                            k != '__FILE__')
+                _header_cache[name] = stat, toks, macros
+
+        yield self.directive(1, path or name.strip('<>"'), tokens)
+        for tok in toks:
+            yield tok
+        yield self.directive(line + 1, self.filename, tokens)
+
+    def find_include(self, name):
+        """Return the path of an included file, or None"""
+        if name.startswith('<'):
+            path = self.path + [""] + self.temp_path
+        elif name.startswith('"'):
+            path = self.temp_path + [""] + self.path
+        else:
+            return None # include of a macro
+
+        for dirname in path:
+            filename = os.path.join(dirname, name[1:-1])
+            if os.path.isfile(filename):
+                return os.path.abspath(filename)
+        return None
+
+    def group_lines(self, input):
+        # Lines end in whitespace which may span blank lines. Split it, so
+        # that directives do not swallow the newlines of the lines after them
+        for line in cpp.Preprocessor.group_lines(self, input):
+            tok = line[-1]
+            if tok.type in self.t_WS and tok.value.count('\n') > 1:
+                end = tok.value.index('\n') + 1
+                rest = copy.copy(tok)
+                rest.value = tok.value[end:]
+                tok.value = tok.value[:end]
+                yield line
+                yield [rest]
+            else:
+                yield line
+
+    def directive(self, line, filename, tokens):
+        """Create a line directive token"""
+        tok = copy.copy(tokens[0])
+        tok.type = self.t_NEWLINE
+        tok.value = '\n# %d "%s"\n' % (line, filename)
+        return tok
+
+    def error(self, file, line, msg):
+        raise SyntaxError("%s:%d: %s" % (file, line, msg))
+
+
+def _stat(path):
+    if path is None:
+        return None
+    st = os.stat(path)
+    return st.st_mtime, st.st_size
+
+def preprocess(source, filename="<string>"):
+    """Run the C preprocessor on `source`, and return the result"""
+    p = Preprocessor(filename)
+    p.parse(source, filename)
+    result = []
+    while True:
+        tok = p.token()
+        if tok is None:
+            break
+        result.append(tok.value)
+    return "".join(result)
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division, absolute_import
 
+import os
+import shutil
+import tempfile
 import unittest
 from pykit.parsing import cirparser
 from pykit.ir import verify, interp
@@ -32,6 +35,105 @@ class TestParser(unittest.TestCase):
         result = interp.run(func, args=[10.0])
         self.assertEqual(result, 12)
 
+    def test_cpp(self):
+        mod = cirparser.from_c(source, cache=False)
+        cpp_mod = cirparser.from_c(source, use_cpp=True, cache=False)
+        self.assertEqual(str(mod), str(cpp_mod))
+
+
+class TestPreprocessor(unittest.TestCase):
+    def test_macros(self):
+        result = cirparser.preprocess_source(
+            "#include <pykit_ir.h>\n"
+            "#define N 10 // comment\n"
+            "Int32 x = N; /* comment */\n")
+        self.assertIn("typedef Type Int32;", result)
+        self.assertIn("Int32 x = 10;", result)
+        self.assertNotIn("comment", result)
+
+    def test_coordinates(self):
+        src = source.replace("y = 4;", "y = 4 +;")
+        for use_cpp in [False, True]:
+            try:
+                cirparser.from_c(src, "test.c", use_cpp=use_cpp, cache=False)
+            except Exception as e:
+                self.assertIn(":10:", str(e))
+            else:
+                self.fail("Expected a parse error")
+
+
+class TestCache(unittest.TestCase):
+    def test_cache(self):
+        cirparser.clear_cache()
+        mod1 = cirparser.from_c(source)
+        mod2 = cirparser.from_c(source)
+        self.assertIsNot(mod1, mod2)
+        self.assertEqual(str(mod1), str(mod2))
+
+        # Cached modules are copies
+        mod1.get_function('myfunc').name = 'changed'
+        self.assertEqual(str(cirparser.from_c(source)), str(mod2))
+
+        func = mod2.get_function('myfunc')
+        self.assertEqual(interp.run(func, args=[10.0]), 12)
+
+    def test_lazy(self):
+        # Modules are cached when parsed a second time
+        cirparser.clear_cache()
+        cirparser.from_c(source)
+        self.assertEqual(len(cirparser._module_cache), 0)
+        cirparser.from_c(source)
+        self.assertEqual(len(cirparser._module_cache), 1)
+
+    def test_headers(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            header = os.path.join(tmpdir, "header.h")
+            src = ('#include <pykit_ir.h>\n#include "%s"\n'
+                   'Int32 f(Int32 x) { return x + N; }\n' % header)
+
+            def run(use_cpp):
+                mod = cirparser.from_c(src, use_cpp=use_cpp)
+                return interp.run(mod.get_function('f'), args=[1])
+
+            for use_cpp in [False, True]:
+                with open(header, "w") as f:
+                    f.write("#define N 1\n")
+                self.assertEqual([run(use_cpp), run(use_cpp)], [2, 2])
+                with open(header, "w") as f:
+                    f.write("#define N 100\n")
+                self.assertEqual(run(use_cpp), 101)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestStreaming(unittest.TestCase):
+    source = source + """
+Int32 g(Int32 a) { if (a < 2) { return 1; } return a * 2; } Int32 h(Int32 b) {
+    return b + 1;
+}
+"""
+
+    def test_iter_c(self):
+        funcs = list(cirparser.iter_c(self.source))
+        self.assertEqual([f.name for f in funcs], ['myfunc', 'g', 'h'])
+        mod = funcs[0].module
+        verify(mod)
+        self.assertEqual(str(mod), str(cirparser.from_c(self.source)))
+        self.assertEqual(interp.run(mod.get_function('g'), args=[3]), 6)
+
+    def test_incremental(self):
+        # Functions are available before the rest of the source is parsed
+        funcs = cirparser.iter_c(self.source.replace("b + 1", "b +"), "t.c")
+        self.assertEqual(next(funcs).name, 'myfunc')
+        self.assertEqual(next(funcs).name, 'g')
+        try:
+            next(funcs)
+        except Exception as e:
+            self.assertIn("t.c:20:15", str(e))
+        else:
+            self.fail("Expected a parse error")
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import
+
+import unittest
+
+from pykit import types
+from pykit.parsing import from_c, from_text
+from pykit.parsing.irparser import parse_type
+from pykit.ir import (Function, GlobalValue, Builder, Const, Pointer, Struct,
+                      Undef, verify, interp)
+from pykit.analysis import cfa
+
+source = """
+#include <pykit_ir.h>
+
+Int32 myglobal = 10;
+
+Int32 g(Int32 i) {
+    return i * 2;
+}
+
+Int32 f(Int32 i) {
+    Int32 x = 0;
+    Int32 y;
+    while (i < 10) {
+        y = g(i);
+        x = x + y;
+        i = i + 1;
+    }
+    return x;
+}
+"""
+
+class TestIRParser(unittest.TestCase):
+
+    def setUp(self):
+        self.m = from_c(source)
+        for func in self.m.functions.values():
+            cfa.run(func)
+
+    def roundtrip(self, m):
+        text = str(m)
+        m2 = from_text(text)
+        self.assertEqual(sorted(m2.functions), sorted(m.functions))
+        self.assertEqual(sorted(m2.globals), sorted(m.globals))
+        for name, func in m2.functions.items():
+            if func.blocks.head is not None:
+                verify(func)
+            self.assertEqual(str(func), str(m.get_function(name)))
+        return m2
+
+    def test_roundtrip(self):
+        m = self.roundtrip(self.m)
+        f = m.get_function('f')
+        self.assertEqual(interp.run(f, args=[1]), 90)
+        self.assertEqual(m.get_global('myglobal').type,
+                         self.m.get_global('myglobal').type)
+
+        # New names must not clash with parsed names
+        for name in ['cond', '', 'i']:
+            self.assertNotIn(f.temp(name), set(op.result for op in f.ops) |
+                             set(block.name for block in f.blocks) | set('i'))
+
+    def test_values(self):
+        f = self.m.get_function('f')
+        point = types.Struct(['x', 'y'], [types.Float64, types.Int32])
+        b = Builder(f)
+        b.position_before(f.startblock.terminator)
+        b.convert(types.Float64, Const(0.1, types.Float64))
+        b.ptrcast(types.Pointer(types.Int8),
+                  Pointer(0x1000, types.Pointer(types.Int32)))
+        b.convert(types.Int32, Undef(types.Int32))
+        p = b.alloca(types.Pointer(point))
+        b.setfield(p, 'y', Const(3, types.Int32))
+        b.ptrstore(Const(Struct(['x', 'y'], [Const(1.5, types.Float64),
+                                             Const(2, types.Int32)], point),
+                         point),
+                   b.alloca(types.Pointer(point)))
+        self.roundtrip(self.m)
+
+    def test_declarations(self):
+        ty = types.Function(types.Void, [types.Pointer(types.Int8)], True)
+        self.m.add_function(Function('printf', ['fmt'], ty))
+        self.m.add_global(GlobalValue('ext', types.Int64, external=True))
+        m = self.roundtrip(self.m)
+        self.assertEqual(m.get_function('printf').type, ty)
+        self.assertTrue(m.get_global('ext').external)
+
+    def test_parse_type(self):
+        for ty in [types.Int32, types.Pointer(types.Pointer(types.Float64)),
+                   types.Struct(['a', 'b'], [types.Int8, types.Bool]),
+                   types.Vector(types.Float32, 4),
+                   types.Array(types.Int64, 10),
+                   types.Function(types.Int32, [types.Int32, types.Bytes],
+                                  False),
+                   types.Typedef('Foo', types.UInt16)]:
+            self.assertEqual(parse_type(str(ty)), ty)
+        self.assertEqual(types.parse_type("Int32*"),
+                         types.Pointer(types.Int32))
+
+    def test_errors(self):
+        self.assertRaises(SyntaxError, from_text, "function Int32 f() { x }")
+        self.assertRaises(SyntaxError, from_text, """
+            function Void f() {
+            entry:
+                %0 = jump(%missing) -> Void
+            }""")
+        self.assertRaises(SyntaxError, parse_type, "Int32 Int32")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -26,15 +26,39 @@ def apply_transform(transform, func, env):
         result = transform(func, env)
 
     _check_transform_result(transform, result)
+    _invalidate_analyses(transform, func, env, result)
     return result or (func, env)
 
+def _invalidate_analyses(transform, func, env, result):
+    """Invalidate cached analyses not preserved by the transform"""
+    manager = env.get("analysis.manager")
+    if manager is not None:
+        from pykit.analysis.manager import preserved_analyses
+        preserved = preserved_analyses(transform)
+        if result is not None and result[0] is not func:
+            manager.forget(func)
+            manager.forget(result[0])
+        else:
+            manager.invalidate(func, preserved)
+
 def run(func, env, transforms):
-    """Run a sequence of transforms (given as strings) on the function"""
+    """
+    Run a sequence of transforms (given as strings) on the function.
+
+    If env["pipeline.instrument"] is set, passes are run through the
+    pykit.instrumentation.Instrumentation object.
+    """
+    instrument = env.get("pipeline.instrument")
     for transform in transforms:
         if transform not in env or not env[transform]:
             raise ValueError("Transform %r is not installed" % transform)
 
-        result = apply_transform(env[transform], func, env)
+        if instrument is None:
+            result = apply_transform(env[transform], func, env)
+        else:
+            result = instrument.run_pass(
+                transform, func,
+                lambda: apply_transform(env[transform], func, env))
 
         func, env = result
     return func, env
@@ -42,4 +66,12 @@ def run(func, env, transforms):
 analyze  = lambda func, env: run(func, env, env["pipeline.analyze"])
 optimize = lambda func, env: run(func, env, env["pipeline.optimize"])
 lower    = lambda func, env: run(func, env, env["pipeline.lower"])
-codegen  = lambda func, env: run(func, env, env["pipeline.codegen"])
\ No newline at end of file
+
+def codegen(func, env):
+    """Run the codegen stage, after which the analyses of `func` are dropped"""
+    try:
+        return run(func, env, env["pipeline.codegen"])
+    finally:
+        manager = env.get("analysis.manager")
+        if manager is not None:
+            manager.forget(func)
\ No newline at end of file
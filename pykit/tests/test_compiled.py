@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+"""
+Check the IR core behaves the same whether it is compiled with Cython or
+not. Set PYKIT_REQUIRE_COMPILED to fail when the compiled modules are not
+in use (e.g. when the extensions failed to build).
+"""
+
+from __future__ import print_function, division, absolute_import
+
+import os
+import unittest
+
+from pykit import types
+from pykit.adt import linkedlist
+from pykit.ir import value, Module, Function, Builder, Const, pretty
+
+class TestCompiled(unittest.TestCase):
+
+    @unittest.skipUnless(os.environ.get("PYKIT_REQUIRE_COMPILED"),
+                         "PYKIT_REQUIRE_COMPILED is not set")
+    def test_compiled(self):
+        for module in [linkedlist, value]:
+            self.assertNotIn(os.path.splitext(module.__file__)[1],
+                             ('.py', '.pyc', '.pyo'), module.__name__)
+
+    def test_str(self):
+        mod = Module()
+        func = Function("f", ['x'],
+                        types.Function(types.Int32, [types.Int32], False))
+        mod.add_function(func)
+        b = Builder(func)
+        entry = func.new_block('entry')
+        b.position_at_end(entry)
+        op = b.add(func.get_arg('x'), Const(1, types.Int32))
+        b.ret(op)
+
+        for x in [mod, func, entry, op]:
+            self.assertEqual(str(x), pretty.pretty(x))
+        self.assertIn("function Int32 f(Int32 %x)", str(mod))
+
+
+if __name__ == '__main__':
+    unittest.main()
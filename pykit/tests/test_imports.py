@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+"""
+Check that heavy dependencies are imported on first use only
+(see benchmarks/bench_import.py).
+"""
+
+from __future__ import print_function, division, absolute_import
+
+import os
+import sys
+import unittest
+import subprocess
+
+import pykit
+
+heavy = ['llvm', 'llvmmath', 'numpy', 'networkx', 'pykit.deps.pycparser',
+         'pykit.deps.pycparser_special', 'pykit.codegen.llvm']
+
+source = """
+import sys
+import pykit.ir, pykit.ir.interp, pykit.analysis.cfa, pykit.environment
+pykit.environment.fresh_env()
+print(' '.join(m for m in %r if m in sys.modules))
+""" % (heavy,)
+
+class TestImports(unittest.TestCase):
+
+    def test_lazy_imports(self):
+        root = os.path.dirname(pykit.root)
+        output = subprocess.check_output([sys.executable, "-c", source],
+                                         cwd=root)
+        self.assertEqual(output.decode('ascii').split(), [])
+
+    def test_backends(self):
+        from pykit import environment
+
+        env = environment.fresh_env()
+        self.assertEqual(sorted(env["codegen.backends"]), ["c", "llvm"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import
+
+import unittest
+
+from pykit import pipeline
+from pykit.parsing import from_c
+from pykit.analysis import cfa
+from pykit.transform import dce
+from pykit.instrumentation import Instrumentation, Report
+
+source = """
+#include <pykit_ir.h>
+
+Int32 f(Int32 i) {
+    Int32 x = 0;
+    while (i < 10) {
+        x = x + i;
+        i = i + 1;
+    }
+    return x;
+}
+"""
+
+class TestInstrumentation(unittest.TestCase):
+
+    def run_pipeline(self, instrument):
+        f = from_c(source).get_function('f')
+        env = { "passes.cfa": cfa, "passes.dce": dce,
+                "pipeline.instrument": instrument }
+        pipeline.run(f, env, ["passes.cfa", "passes.dce"])
+        return f
+
+    def test_report(self):
+        instrument = Instrumentation(keep_records=True)
+        f = self.run_pipeline(instrument)
+
+        report = instrument.report
+        self.assertEqual(list(report.passes), ["passes.cfa", "passes.dce"])
+        [cfa_record, dce_record] = report.records
+        self.assertEqual(cfa_record.function, 'f')
+        self.assertTrue(cfa_record.ops_after < cfa_record.ops_before)
+        self.assertEqual(dce_record.blocks_after, len(f.blocks))
+        self.assertTrue(cfa_record.wall_time >= 0)
+
+        summary = report.passes["passes.cfa"]
+        self.assertEqual(summary["calls"], 1)
+        self.assertEqual(summary["ops_after"], cfa_record.ops_after)
+
+    def test_memory(self):
+        instrument = Instrumentation(keep_records=True)
+
+        def nested(func, env):
+            pipeline.run(func, env, ["passes.dce"])
+            data = [0] * 100000
+
+        f = from_c(source).get_function('f')
+        env = { "passes.cfa": cfa, "passes.dce": dce, "passes.nested": nested,
+                "pipeline.instrument": instrument }
+        pipeline.run(f, env, ["passes.cfa", "passes.nested"])
+
+        measure = instrument.memory_source()
+        self.assertIn(measure, ["tracemalloc", "rusage"])
+        [cfa_record, dce_record, nested_record] = instrument.report.records
+        self.assertEqual(dce_record.name, "passes.dce")
+        for record in instrument.report.records:
+            self.assertIsNotNone(record.peak_memory)
+        if measure == "tracemalloc":
+            self.assertTrue(nested_record.peak_memory >= 800000)
+            self.assertTrue(nested_record.peak_memory >=
+                            dce_record.peak_memory)
+
+        summary = instrument.report.passes["passes.nested"]
+        self.assertEqual(summary["memory_source"],
+                         nested_record.memory_source)
+
+    def test_aggregate(self):
+        first, second = Instrumentation(), Instrumentation()
+        self.run_pipeline(first)
+        self.run_pipeline(second)
+
+        report = Report.from_json(first.report.to_json())
+        report.merge(second.report)
+        self.assertEqual(report.passes["passes.dce"]["calls"], 2)
+        self.assertEqual(report.passes["passes.cfa"]["ops_before"],
+                         2 * first.report.passes["passes.cfa"]["ops_before"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import
+
+import unittest
+
+from pykit import pipeline, parallel
+from pykit.parsing import from_c
+from pykit.analysis import cfa
+from pykit.ir import verify
+from pykit.transform import dce
+
+source = """
+#include <pykit_ir.h>
+
+Int32 leaf(Int32 i) {
+    Int32 x = 0;
+    while (i < 10) {
+        x = x + i;
+        i = i + 1;
+    }
+    return x;
+}
+
+Int32 fact(Int32 n) {
+    Int32 result = 1;
+    if (n > 1) {
+        Int32 rest = fact(n - 1);
+        result = n * rest;
+    }
+    return result;
+}
+
+Int32 root(Int32 n) {
+    Int32 x = leaf(n);
+    Int32 y = fact(n);
+    return x + y;
+}
+"""
+
+def make_env():
+    return {
+        "pipeline.analyze": ["passes.cfa", "passes.dce"],
+        "passes.cfa": cfa,
+        "passes.dce": dce,
+    }
+
+class TestParallel(unittest.TestCase):
+
+    def run_parallel(self, **kwds):
+        mod = from_c(source)
+        root = mod.get_function("root")
+        parallel.run_module(mod, make_env, ["pipeline.analyze"], **kwds)
+        verify(mod)
+        self.assertIs(mod.get_function("root"), root)
+
+        expected = from_c(source)
+        for func in expected.functions.values():
+            if func.blocks:
+                pipeline.run(func, make_env(), ["passes.cfa", "passes.dce"])
+                self.assertEqual(str(mod.get_function(func.name)), str(func))
+
+    def test_serial(self):
+        self.run_parallel(processes=1)
+
+    def test_parallel(self):
+        self.run_parallel(processes=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division, absolute_import
 
+import copy
 import unittest
 from pykit import types
 
@@ -51,6 +52,62 @@ class TestEquality(unittest.TestCase):
         self.assertNotEqual(types.Vector(types.Int32, 4),
                             types.Vector(types.Int64, 4))
 
+    def test_typedefs(self):
+        self.assertEqual(types.Int, types.Int32)
+        self.assertEqual(types.Pointer(types.Int), types.Pointer(types.Int32))
+        self.assertNotEqual(types.Pointer(types.Int),
+                            types.Pointer(types.Int64))
+        self.assertEqual({types.Long: types.Int64}[types.Long], types.Int64)
+
+    def test_typedef_hash(self):
+        self.assertEqual(hash(types.Int), hash(types.Int32))
+        self.assertEqual({types.Int32: 1}.get(types.Int), 1)
+        self.assertEqual({types.Pointer(types.Int): 1}.get(
+                            types.Pointer(types.Int32)), 1)
+        self.assertEqual(types.typename(types.Int32), "Int32")
+        self.assertEqual(types.typename(types.Int), "Int")
+
+
+class TestInterning(unittest.TestCase):
+
+    def test_intern(self):
+        t1 = types.Struct(['x', 'y'], [types.Float64, types.Float64])
+        t2 = types.Struct(['x', 'y'], [types.Float64, types.Float64])
+        self.assertIsNot(t1, t2)
+        self.assertIs(types.intern(t1), types.intern(t2))
+        self.assertIsNot(types.intern(types.Int), types.intern(types.Int32))
+
+    def test_recursive_hash(self):
+        t1, t2 = create(), create()
+        self.assertEqual(hash(t1), hash(t2))
+        self.assertIs(types.intern(t1), types.intern(t2))
+        self.assertEqual(len(set([t1, t2, types.Pointer(t1)])), 2)
+
+        t3 = create()
+        t3.names.append('ham')
+        t3.types.append(types.Int32)
+        self.assertNotEqual(hash(t1), hash(t3))
+
+    def test_recursive_deepcopy(self):
+        # The copy writes out the cycle through two structs
+        s = types.Struct(['x', 'next'], [types.Int32, None])
+        s.types[1] = types.Pointer(s)
+        c = copy.deepcopy(s)
+        self.assertIsNot(c.types[1].base, c)
+        self.assertEqual(c, s)
+        self.assertEqual(hash(c), hash(s))
+        self.assertIs(types.intern(c), types.intern(s))
+        self.assertNotEqual(c, create())
+
+    def test_clear(self):
+        t1, t2 = create(), create()
+        self.assertIs(types.intern(t1), types.intern(t2))
+        types.clear_interned()
+        t3 = create()
+        self.assertIs(types.intern(t3), types.intern(t1))
+        self.assertEqual(t2, t3)
+        self.assertEqual({t1: 1}.get(t2), 1)
+
 
 
 
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+"""
+Aggressive dead code elimination.
+
+Unlike transform.dce, which deletes unused effect-free operations, this
+assumes operations are dead until proven live (analysis.deadcode), which
+removes chains of dead operations and dead phi cycles in one go.
+
+Given post-dominators, conditional branches on which no live code depends
+are replaced by a jump to their immediate post-dominator, and the blocks
+that become unreachable are deleted.
+"""
+
+from __future__ import print_function, division, absolute_import
+
+from pykit import types
+from pykit.analysis import deadcode, manager
+from pykit.ir import Op
+
+def adce(func, cfg=None, postdominators=None):
+    """
+    Eliminate dead code. Without post-dominators, all branches are kept.
+    The CFG is updated when branches are removed.
+    """
+    live = deadcode.find_live_ops(func, cfg, postdominators)
+
+    redirected = False
+    if postdominators is not None:
+        for block in func.blocks:
+            op = block.terminator
+            target = postdominators.idom(block)
+            if (op.opcode == 'cbranch' and op not in live and
+                    target is not postdominators.root):
+                op.replace(Op("jump", types.Void, [target], op.result))
+                for succ in cfg.successors(block):
+                    cfg.remove_edge(block, succ)
+                cfg.add_edge(block, target)
+                redirected = True
+
+    func.delete_all([op for op in func.ops
+                         if op not in live and op.opcode not in
+                                                   deadcode.branches])
+
+    if redirected:
+        from pykit.analysis import cfa
+        unreachable = set(func.blocks) - set(reachable(func, cfg))
+        if unreachable:
+            cfa.delete_blocks(func, cfg, [block for block in func.blocks
+                                                if block in unreachable])
+
+def reachable(func, cfg):
+    """Iterate over the blocks reachable from the entry block"""
+    seen = set([func.startblock])
+    stack = [func.startblock]
+    while stack:
+        block = stack.pop()
+        yield block
+        for succ in cfg[block]:
+            if succ not in seen:
+                seen.add(succ)
+                stack.append(succ)
+
+def run(func, env=None):
+    analyses = manager.get_manager(env)
+    cfg = analyses.get("cfg", func)
+    postdominators = analyses.get("postdominators", func)
+    adce(func, cfg, postdominators)
@@ -6,6 +6,9 @@ Dead code elimination.
 
 from pykit.analysis import deadcode
 
+# Analyses that remain valid after running this pass
+preserves = ("cfg", "dominators", "loops")
+
 def dce(func, env=None):
     """
     Eliminate dead code.
@@ -2,14 +2,36 @@
 
 """
 Function inlining.
+
+The inlining pass (run()) visits the strongly connected components of the
+call graph bottom-up, so callees have been inlined into before their
+callers decide whether to inline them. A call site is inlined if its cost,
+the size of the callee minus the expected savings, is within the threshold:
+
+    cost = size(callee) - call_cost - nargs - const_arg_bonus * nconsts
+
+Given a profile (pykit.ir.profiling) the threshold is scaled by the
+execution frequency of the call site relative to the caller's entry, so
+hot call sites are inlined more aggressively, and call sites that never
+executed only if inlining shrinks the code.
+
+Calls within a component (recursion) are never inlined.
 """
 
 from __future__ import print_function, division, absolute_import
 
 from pykit.error import CompileError
-from pykit.ir import Function, Builder, findallops, copy_function, verify
+from pykit.ir import (Function, Builder, Const, findallops, copy_function,
+                      verify)
+from pykit.analysis import cfa, callgraph
 from pykit.transform import ret as ret_normalization
 
+# Cost model, in numbers of operations
+threshold = 50          # inline calls costing at most this much
+call_cost = 5           # overhead of a call, saved by inlining
+const_arg_bonus = 5     # bonus per constant argument, which may fold
+max_profile_scale = 4   # max factor by which a hot call site scales threshold
+
 def rewrite_return(func):
     """Rewrite ret ops to assign to a variable instead, which is returned"""
     ret_normalization.run(func)
@@ -20,7 +42,8 @@ def rewrite_return(func):
 
 def inline(func, call):
     """
-    Inline the call instruction into func.
+    Inline the call instruction into func. Uses of values are updated as
+    the callee is spliced in.
 
     :return: { old_op : new_op }
     """
@@ -39,7 +62,7 @@ def inline(func, call):
         funcarg.replace_uses(arg)
 
     # Copy blocks
-    new_blocks = list(new_callee.blocks)
+    new_blocks = new_callee.blocks.snapshot()
     after = inline_header
     for block in new_blocks:
         block.parent = None
@@ -53,17 +76,11 @@ def inline(func, call):
 
     stretch_exception_block(builder, callblock, new_blocks)
 
-    # Fix up final result of call
+    # Fix up final result of call, the return block dominates the call
     if result is not None:
         # non-void return
-        result.unlink()
-        result.result = call.result
-        call.replace(result)
-    else:
-        call.delete()
-
-    func.reset_uses()
-    #verify(func)
+        call.replace_uses(result)
+    call.delete()
 
     return valuemap
 
@@ -111,3 +128,67 @@ def assert_inlinable(func, call, callee, uses):
     """
     if not isinstance(callee, Function):
         return CompileError("Cannot inline external function: %s" % (callee,))
+
+#===------------------------------------------------------------------===
+# Inlining pass
+#===------------------------------------------------------------------===
+
+def function_size(func):
+    """Size of a function in number of operations"""
+    return sum(1 for op in func.ops)
+
+def inline_cost(call, size):
+    """Cost of inlining a call to a callee of the given size"""
+    callee, args = call.args
+    nconsts = sum(1 for arg in args if isinstance(arg, Const))
+    return size - call_cost - len(args) - const_arg_bonus * nconsts
+
+def profile_scale(call, fprofile):
+    """Execution frequency of a call site relative to its function entry"""
+    if fprofile is None or not fprofile.entry_count():
+        return 1
+    freq = fprofile.block_count(call.block) / fprofile.entry_count()
+    return min(freq, max_profile_scale)
+
+def inlinable(call, scc):
+    callee = call.args[0]
+    return (isinstance(callee, Function) and callee.startblock is not None
+            and callee not in scc and not callee.type.varargs)
+
+def inline_calls(func, sizes, scc=(), threshold=threshold, fprofile=None):
+    """
+    Inline the profitable calls in `func`, given the { Function : size } of
+    the callees. Returns the number of inlined calls.
+    """
+    # Decide first, inlining splits the blocks the profile refers to
+    calls = []
+    for op in func.ops:
+        if op.opcode == 'call' and inlinable(op, scc):
+            limit = threshold * profile_scale(op, fprofile)
+            if inline_cost(op, sizes[op.args[0]]) <= limit:
+                calls.append(op)
+
+    for call in calls:
+        inline(func, call)
+    return len(calls)
+
+def run(func, env=None):
+    """
+    Inline calls bottom-up over the call graph of `func`. Functions we
+    inline into are promoted to SSA form again.
+    """
+    env = env or {}
+    limit = env.get("inline.threshold", threshold)
+    profile = env.get("interp.profile")
+    manager = env.get("analysis.manager")
+
+    sizes = {}
+    for scc in callgraph.bottom_up(callgraph.callgraph(func)):
+        for f in scc:
+            fprofile = profile.get(f) if profile is not None else None
+            if f.startblock is not None and inline_calls(f, sizes, scc,
+                                                         limit, fprofile):
+                cfa.run(f)
+                if manager is not None:
+                    manager.invalidate(f)
+            sizes[f] = function_size(f)
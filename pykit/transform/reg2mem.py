@@ -51,7 +51,7 @@ def split_critical_edges(func, cfg, phis):
     Split critical edges to correctly handle cycles in phis. See 2) above.
     """
     b = Builder(func)
-    for block in cfg.node:
+    for block in list(cfg):
         successors = cfg.neighbors(block)
         if len(successors) > 1:
             # More than one successor, we need to split
@@ -142,5 +142,7 @@ def reg2mem(func, env=None):
     vars, loads = generate_copies(func, find_phis(func))
     return vars, loads
 
+preserves = ("callgraph",)
+
 def run(func, env):
     reg2mem(func, env)
\ No newline at end of file
@@ -7,6 +7,8 @@ Normalize returns so that the only return is in the exit block.
 from pykit import types
 from pykit.ir import Builder, Undef
 
+preserves = ("callgraph",)
+
 def run(func, env=None, return_block=None):
     """
     Rewrite 'ret' operations into jumps to a return block and assignments
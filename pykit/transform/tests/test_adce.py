@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import
+
+import unittest
+import textwrap
+
+from pykit.analysis import cfa
+from pykit.parsing import from_c
+from pykit.transform import adce
+from pykit.ir import verify, interp, opcodes
+
+source = textwrap.dedent("""
+    #include <pykit_ir.h>
+
+    Int32 chain(Int32 a) {
+        Int32 x, y, z;
+        x = a + 1;
+        y = x * 2;
+        z = y - 3;
+        return a;
+    }
+
+    Int32 cycle(Int32 n) {
+        Int32 i, s;
+        s = 0;
+        for (i = 0; i < n; i = i + 1)
+            s = s + i;
+        return i;
+    }
+
+    Int32 branch(Int32 a, Int32 b) {
+        Int32 x;
+        if (a < b)
+            x = a * b;
+        else
+            x = a - b;
+        return a;
+    }
+
+    Int32 live_branch(Int32 a, Int32 b) {
+        if (a < b)
+            return 1;
+        return 2;
+    }
+""")
+
+class TestADCE(unittest.TestCase):
+
+    def setUp(self):
+        self.mod = from_c(source)
+
+    def adce(self, name):
+        func = self.mod.get_function(name)
+        cfa.run(func)
+        adce.run(func)
+        verify(func)
+        return func
+
+    def test_chain(self):
+        f = self.adce("chain")
+        self.assertEqual(opcodes(f), ['convert', 'ret'])
+
+    def test_dead_phis(self):
+        f = self.adce("cycle")
+        ops = opcodes(f)
+        self.assertEqual(ops.count('phi'), 1)
+        self.assertEqual(ops.count('add'), 1)
+        self.assertEqual(interp.run(f, args=[5]), 5)
+
+    def test_dead_branch(self):
+        f = self.adce("branch")
+        self.assertEqual(opcodes(f), ['convert', 'ret'])
+        self.assertEqual(len(f.blocks), 1)
+        self.assertEqual(interp.run(f, args=[2, 3]), 2)
+
+    def test_live_branch(self):
+        f = self.adce("live_branch")
+        self.assertIn('cbranch', opcodes(f))
+        self.assertEqual(interp.run(f, args=[2, 3]), 1)
+        self.assertEqual(interp.run(f, args=[3, 2]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,7 +7,8 @@ import textwrap
 from pykit.analysis import cfa
 from pykit.parsing import from_c
 from pykit.transform import ret, inline
-from pykit.ir import opcodes, findallops, verify, interp
+from pykit.ir import (opcodes, findallops, verify, interp, profiling, Builder,
+                      Op)
 
 class TestInlining(unittest.TestCase):
 
@@ -69,6 +70,105 @@ class TestInlining(unittest.TestCase):
         result2 = interp.run(func)
         assert result == result2
 
+    def test_uses(self):
+        mod = from_c(textwrap.dedent("""
+        #include <pykit_ir.h>
+
+        Int32 callee(Int32 i) {
+            if (i < 0)
+                return -i;
+            return i * i;
+        }
+
+        Int32 caller(Int32 i) {
+            Int32 x = (Int32) call(callee, list(i)) + i;
+            return x;
+        }
+        """))
+        func = mod.get_function("caller")
+        [callsite] = findallops(func, 'call')
+        inline.inline(func, callsite)
+
+        values = list(func.args) + list(func.blocks) + list(func.ops)
+        uses = [set(value.uses) for value in values]
+        func.reset_uses()
+        self.assertEqual(uses, [set(value.uses) for value in values])
+
+
+source = textwrap.dedent("""
+    #include <pykit_ir.h>
+
+    Int32 helper(Int32 x) {
+        return x * x + x * 3 - x / 7 + (x - 1) * (x + 1);
+    }
+
+    Int32 f(Int32 n) {
+        Int32 i, s;
+        s = 0;
+        for (i = 0; i < n; i = i + 1)
+            s = s + (Int32) call(helper, list(i));
+        if (n < 0)
+            s = call(helper, list(s));
+        return s;
+    }
+
+    Int32 r(Int32 n) {
+        return n;
+    }
+
+    Int32 g(Int32 n) {
+        Int32 x = call(r, list(n));
+        return x;
+    }
+""")
+
+class TestInliner(unittest.TestCase):
+
+    def setUp(self):
+        self.mod = from_c(source)
+        for func in self.mod.functions.values():
+            cfa.run(func)
+        self.f = self.mod.get_function("f")
+        helper = self.mod.get_function("helper")
+        self.cost = inline.inline_cost(findallops(self.f, 'call')[0],
+                                       inline.function_size(helper))
+
+    def test_inline(self):
+        inline.run(self.f, {"inline.threshold": self.cost})
+        verify(self.f)
+        self.assertNotIn('call', opcodes(self.f))
+        self.assertEqual(interp.run(self.f, args=[5]), 85)
+
+    def test_threshold(self):
+        inline.run(self.f, {"inline.threshold": self.cost - 1})
+        self.assertEqual(opcodes(self.f).count('call'), 2)
+
+    def test_profile(self):
+        env = {"interp.profile": profiling.Profile()}
+        self.assertEqual(interp.run(self.f, env, args=[5]), 85)
+
+        # Only the call in the loop is hot enough
+        env["inline.threshold"] = self.cost / 2
+        inline.run(self.f, env)
+        verify(self.f)
+        self.assertEqual(opcodes(self.f).count('call'), 1)
+        self.assertEqual(interp.run(self.f, args=[5]), 85)
+
+    def test_recursion(self):
+        r, g = self.mod.get_function("r"), self.mod.get_function("g")
+        [retop] = findallops(r, 'ret')
+        call = Op('call', r.type.restype, [r, [retop.args[0]]],
+                  result=r.temp("call"))
+        call.insert_before(retop)
+        retop.set_args([call])
+
+        inline.run(g)
+        verify(r)
+        verify(g)
+        self.assertEqual(findallops(r, 'call'), [call])
+        [inlined] = findallops(g, 'call')
+        self.assertIs(inlined.args[0], r)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -6,33 +6,36 @@ Pykit types.
 
 from __future__ import print_function, division, absolute_import
 
-from itertools import starmap
 from collections import namedtuple
-from functools import partial
 from pykit.utils import invert, hashable, listitems
 
 alltypes = set()
 
 class Type(object):
-    """Base of types"""
+    """
+    Base of types. Types are values: they are hashed and compared by
+    structure, and must not be mutated once they are hashed or compared
+    (recursive structs are built by filling in their fields first).
+
+    Each type is canonicalized once, on first use (see intern()), after
+    which hashing and comparison take constant time. Typedefs compare and
+    hash equal to the types they alias.
+    """
+
+    _canonical = None   # canonical instance, see intern()
+    _equivalent = None  # canonical instance with typedefs resolved
+    _hash = None
+    _key = None         # structural key, if the type is not recursive
+    _typedefs = False   # whether the key contains typedefs
+    _generation = None  # value of _generation when interned
+    _encoding = None    # see pykit.ir.hashing
 
     def __eq__(self, other):
-        incompatible = (type(self) != type(other) and not (self.is_typedef or
-                                                           other.is_typedef))
-        if not isinstance(other, Type) or incompatible:
+        if self is other:
+            return True
+        elif not isinstance(other, Type):
             return False
-
-        self_recursive = recursive_terms(self)
-        other_recursive = recursive_terms(other)
-
-        if len(self_recursive) != len(other_recursive):
-            return False
-        elif self_recursive:
-            return compare_recursive(self_recursive, other_recursive, {}, self, other)
-        else:
-            return (super(Type, self).__eq__(other) or
-                    (self.is_typedef and self.type == other) or
-                    (other.is_typedef and other.type == self))
+        return equivalent(self) is equivalent(other)
 
     def __ne__(self, other):
         return not (self == other)
@@ -41,69 +44,193 @@ class Type(object):
         return True
 
     def __hash__(self):
-        if self.is_struct:
-            return 0 # TODO: better hashing
-        obj = tuple(tuple(c) if isinstance(c, list) else c for c in self)
-        return hash(obj)
-
-
-def compare_recursive(rec1, rec2, mapping, t1, t2):
-    """Structural comparison of recursive types"""
-    cmp = partial(compare_recursive, rec1, rec2, mapping)
-
-    sub1 = subterms(t1)
-    sub2 = subterms(t2)
-
-    if id(t1) in rec1:
-        if id(t1) in mapping:
-            return mapping[id(t1)] == id(t2)
-
-        mapping[id(t1)] = id(t2)
-
-    if bool(sub1) ^ bool(sub2) or type(t1) != type(t2):
-        return False
-    elif not sub1:
-        return t1 == t2 # Unit types
-    elif t1.is_struct:
-        return (t1.names == t2.names and
-                all(starmap(cmp, zip(t1.types, t2.types))))
-    elif t1.is_function:
-        return (t1.varargs == t2.varargs and
-                cmp(t1.restype, t2.restype) and
-                all(starmap(cmp, zip(t1.argtypes, t2.argtypes))))
-    elif t1.is_vector or t1.is_array:
-        return t1.count == t2.count and cmp(t1.base, t2.base)
-    elif t1.is_pointer:
-        return cmp(t1.base, t2.base)
-
-
-def subterms(type):
-    if type.is_struct:
-        return type.types
-    elif type.is_pointer or type.is_vector or type.is_array:
-        return [type.base]
-    elif type.is_function:
-        return [type.restype] + list(type.argtypes)
-    else:
-        return []
-
-
-def recursive_terms(type, seen=None, recursive=None):
-    """Find all recursive terms in a type"""
-    if seen is None:
-        seen = set()
-        recursive = set()
-
-    if id(type) in seen:
-        recursive.add(id(type))
-        return recursive
-
-    seen.add(id(type))
-    for subterm in subterms(type):
-        recursive_terms(subterm, seen, recursive)
-    seen.remove(id(type))
-
-    return recursive
+        if self._hash is None:
+            equivalent(self)
+        return self._hash
+
+    def __getstate__(self):
+        # Leave out the interning state when copying or pickling
+        return dict((k, v) for k, v in vars(self).items()
+                           if not k.startswith('_'))
+
+# ______________________________________________________________________
+# Interning
+
+# The tables keep their types alive (types are tuples, which cannot be weakly
+# referenced), so they are cleared when they grow past MAX_INTERNED. Types
+# interned before a clear are interned anew on their next use.
+
+MAX_INTERNED = 100000
+
+_interned = {}      # { key : type }
+_equivalents = {}   # { key with typedefs resolved : type }
+_generation = 0     # number of times the tables were cleared
+
+def clear_interned():
+    """Forget all canonical instances"""
+    global _generation
+    _interned.clear()
+    _equivalents.clear()
+    _generation += 1
+
+def intern(type):
+    """
+    Return the canonical instance of `type`. Structurally equal types,
+    recursive types included, intern to the same object. Typedefs are part
+    of the structure.
+    """
+    if type._canonical is None or type._generation != _generation:
+        if len(_interned) + len(_equivalents) >= MAX_INTERNED:
+            clear_interned()
+        state = {}
+        key = structural_key(type, resolve=False, state=state)
+        canonical = _interned.setdefault(key, type)
+        type._canonical = canonical
+        type._equivalent = None
+        type._generation = _generation
+        if not state.get('typedef'):
+            # Nothing to resolve
+            type._equivalent = _equivalents.setdefault(key, canonical)
+            type._hash = hash(key)
+    return type._canonical
+
+def equivalent(type):
+    """
+    Return the canonical instance of `type` with all typedefs resolved.
+    Types are equal if and only if their equivalents are identical, and
+    hash by the structure of their equivalent.
+    """
+    if type._equivalent is None or type._generation != _generation:
+        intern(type)
+    if type._equivalent is None:
+        key = structural_key(type, resolve=True)
+        type._equivalent = _equivalents.setdefault(key, type)
+        type._hash = hash(key)
+    return type._equivalent
+
+def structural_key(type, resolve=False, state=None, path=None):
+    """
+    Compute a hashable key describing the structure of `type`. References
+    to enclosing (recursive) types are encoded by their relative depth. With
+    `resolve`, typedefs are replaced by the types they alias.
+
+    Recursive types are keyed by their minimal form (see minimal_key()), so
+    the key does not depend on how far their cycles are written out.
+    """
+    if state is None:
+        state = {}
+    if path is None:
+        path = {}
+
+    if resolve:
+        while type.is_typedef:
+            type = type.type
+    elif type.is_typedef:
+        state['typedef'] = True
+
+    if type._key is not None and not (resolve and type._typedefs):
+        # Not recursive, so independent of the enclosing types
+        if type._typedefs:
+            state['typedef'] = True
+        return type._key
+    elif id(type) in path:
+        state['recursive'] = True
+        return ('<rec>', len(path) - path[id(type)])
+
+    path[id(type)] = len(path)
+    key = (type.__class__.__name__,) + tuple(
+        _fieldkey(field, resolve, state, path) for field in type)
+    del path[id(type)]
+
+    if not path and state.get('recursive'):
+        key = minimal_key(type, resolve)
+    elif not path and not resolve:
+        type._key = key
+        type._typedefs = bool(state.get('typedef'))
+    return key
+
+def _fieldkey(field, resolve, state, path):
+    if isinstance(field, Type):
+        return structural_key(field, resolve, state, path)
+    elif isinstance(field, (list, tuple)):
+        return (field.__class__.__name__,) + tuple(
+            _fieldkey(x, resolve, state, path) for x in field)
+    elif hashable(field):
+        return field
+    return ('<id>', id(field))
+
+def minimal_key(type, resolve=False):
+    """
+    Compute the structural key of `type` on its minimal graph, in which
+    types with the same (infinite) structure are merged. E.g. the key of
+    `s = Struct(['next'], [Pointer(s)])` is also the key of its copy with
+    the cycle written out twice, `s' = Struct(['next'], [Pointer(s'')])`
+    and `s'' = Struct(['next'], [Pointer(s')])`.
+    """
+    def node(type):
+        while resolve and type.is_typedef:
+            type = type.type
+        return type
+
+    # Collect the reachable types, with their structure without subtypes
+    labels = {}     # { id(type) : label }
+    children = {}   # { id(type) : [type] }
+    worklist = [node(type)]
+    while worklist:
+        t = worklist.pop()
+        if id(t) not in labels:
+            children[id(t)] = []
+            labels[id(t)] = (t.__class__.__name__,) + tuple(
+                _shape(field, children[id(t)]) for field in t)
+            children[id(t)] = [node(child) for child in children[id(t)]]
+            worklist.extend(children[id(t)])
+
+    # Refine the partition by label until the children agree (Moore)
+    block = _number(labels)
+    while True:
+        refined = _number(dict(
+            (k, (block[k], tuple(block[id(child)] for child in children[k])))
+                for k in block))
+        if len(set(refined.values())) == len(set(block.values())):
+            break
+        block = refined
+
+    # Write out the key, with references to enclosing blocks
+    def key(t, path):
+        t = node(t)
+        b = block[id(t)]
+        if b in path:
+            return ('<rec>', len(path) - path[b])
+        path[b] = len(path)
+        result = (t.__class__.__name__,) + tuple(
+            fieldkey(field, path) for field in t)
+        del path[b]
+        return result
+
+    def fieldkey(field, path):
+        if isinstance(field, Type):
+            return key(field, path)
+        elif isinstance(field, (list, tuple)):
+            return (field.__class__.__name__,) + tuple(
+                fieldkey(x, path) for x in field)
+        return _fieldkey(field, resolve, {}, path)
+
+    return key(type, {})
+
+def _shape(field, subtypes):
+    if isinstance(field, Type):
+        subtypes.append(field)
+        return '<type>'
+    elif isinstance(field, (list, tuple)):
+        return (field.__class__.__name__,) + tuple(
+            _shape(x, subtypes) for x in field)
+    return _fieldkey(field, False, {}, {})
+
+def _number(labels):
+    """Map each label to a number, equal labels to equal numbers"""
+    numbers = {}
+    return dict((k, numbers.setdefault(label, len(numbers)))
+                    for k, label in labels.items())
 
 def typetuple(name, elems):
     def __str__(self):
@@ -209,8 +336,9 @@ VirtualMethod = typetuple('VirtualMethod', ['obj_type'])
 # Parsing
 
 def parse_type(s):
-    from pykit.parsing import parser
-    return parser.build(parser.parse(s, parser.type_parser))
+    """Parse a type as printed by pykit.ir.pretty, e.g. 'Int32*'"""
+    from pykit.parsing import irparser
+    return irparser.parse_type(s)
 
 # ______________________________________________________________________
 # Typeof
@@ -245,8 +373,13 @@ def convert(value, dst_type):
 
 # ______________________________________________________________________
 
-type2name = dict((v, n) for n, v in globals().items() if hashable(v))
-typename = type2name.__getitem__
+# { structural key : name }. Typedefs are equal to the types they alias,
+# so we look up their structure, which includes the typedefs
+type2name = dict((structural_key(v), n) for n, v in list(globals().items())
+                                            if isinstance(v, Type))
+
+def typename(type):
+    return type2name[structural_key(type)]
 
 def resolve_typedef(type):
     while type.is_typedef:
@@ -128,30 +128,37 @@ def cached(limit=1000):
 
 # ______________________________________________________________________
 
-def make_temper():
-    """Return a function that returns temporary names"""
-    temps = collections.defaultdict(int)
-    seen = set()
+class Temper(object):
+    """
+    Callable that returns temporary names. Unlike a closure, the temper (and
+    therefore any Function or Module using it) can be pickled.
+    """
 
-    def temper(input=""):
+    def __init__(self, temps=None, seen=None):
+        self.temps = collections.defaultdict(int, temps or {})
+        self.seen = set(seen or ())
+
+    def __call__(self, input=""):
         name, dot, tail = input.rpartition('.')
         if tail.isdigit():
             varname = name
         else:
             varname = input
 
-        count = temps[varname]
-        temps[varname] += 1
+        count = self.temps[varname]
+        self.temps[varname] += 1
         if varname and count == 0:
             result = varname
         else:
             result = "%s.%d" % (varname, count)
 
-        assert result not in seen
-        seen.add(result)
+        assert result not in self.seen
+        self.seen.add(result)
 
         return result
 
-    return temper
+def make_temper():
+    """Return a function that returns temporary names"""
+    return Temper()
 
 # ______________________________________________________________________
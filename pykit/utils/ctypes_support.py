@@ -16,10 +16,8 @@ from pykit.utils import hashable
 # CTypes Types for Type Checking
 #===------------------------------------------------------------------===
 
-libc = ctypes.CDLL(ctypes.util.find_library('c'))
-
 _ctypes_scalar_type = type(ctypes.c_int)
-_ctypes_func_type = (type(ctypes.CFUNCTYPE(ctypes.c_int)), type(libc.printf))
+_ctypes_func_type = (type(ctypes.CFUNCTYPE(ctypes.c_int)), ctypes._CFuncPtr)
 _ctypes_pointer_type = type(ctypes.POINTER(ctypes.c_int))
 _ctypes_array_type = type(ctypes.c_int * 2)
 
@@ -154,4 +152,38 @@ def from_ctypes_value(ctypes_value):
     else:
         assert is_ctypes_pointer_type(ctype), ctype
         return Pointer(ctypes.cast(ctypes_value, ctypes.c_void_p).value,
-                       from_ctypes_type(ctype))
\ No newline at end of file
+                       from_ctypes_type(ctype))
+
+#===------------------------------------------------------------------===
+# Libraries
+#===------------------------------------------------------------------===
+
+_libc = None
+
+def get_libc():
+    """Load the C library on first use"""
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'))
+    return _libc
+
+class _LazyLibrary(object):
+    """Proxy for a ctypes library, which is loaded on first use"""
+
+    def __init__(self, load):
+        self._load = load
+
+    def __getattr__(self, name):
+        if name == '_load' or name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self._load(), name)
+
+    def __getitem__(self, name):
+        return self._load()[name]
+
+    def __repr__(self):
+        return "_LazyLibrary(%r)" % (self._load,)
+
+# The C library, loaded when first used
+libc = _LazyLibrary(get_libc)
+
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+"""
+Size-bounded key/value cache of byte strings on local disk, safe for
+concurrent use by multiple processes:
+
+    cache = DiskCache("~/.cache/pykit", maxsize=256 * 1024 * 1024)
+    data = cache.get(key)
+    if data is None:
+        data = compute()
+        cache.put(key, data)
+
+Entries are stored as one file per key. Writes go to a temporary file which
+is atomically renamed into place, so readers never see partial entries. A
+hit touches the entry, and when the cache grows beyond `maxsize` the least
+recently used entries are evicted. Eviction is serialized through a lock
+file where fcntl is available; readers tolerate entries disappearing.
+"""
+
+from __future__ import print_function, division, absolute_import
+import os
+import errno
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+suffix = ".entry"
+
+class DiskCache(object):
+    """
+    Cache byte strings in a directory, keyed by strings of hex digits
+    (e.g. a pykit.ir.hashing digest).
+    """
+
+    def __init__(self, directory, maxsize=256 * 1024 * 1024):
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.maxsize = maxsize
+        self.written = 0 # bytes written since the last eviction
+        _makedirs(self.directory)
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    # __________________________________________________________________
+
+    def get(self, key, default=None):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError) as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return default
+
+        _touch(path)
+        return data
+
+    def put(self, key, data):
+        path = self.path(key)
+        dirname = os.path.dirname(path)
+        _makedirs(dirname)
+
+        fd, tmp = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            _rename(tmp, path)
+        except:
+            _unlink(tmp)
+            raise
+
+        self.written += len(data)
+        if self.written > self.maxsize // 16:
+            self.evict()
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def __delitem__(self, key):
+        _unlink(self.path(key))
+
+    # __________________________________________________________________
+
+    def entries(self):
+        """Return [(mtime, size, path)] for all entries"""
+        result = []
+        for dirpath, dirnames, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith(suffix):
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue # evicted by another process
+                    result.append((st.st_mtime, st.st_size, path))
+        return result
+
+    def size(self):
+        return sum(size for mtime, size, path in self.entries())
+
+    def evict(self, maxsize=None):
+        """Remove least recently used entries until we fit in maxsize"""
+        maxsize = self.maxsize if maxsize is None else maxsize
+        with self.lock():
+            entries = sorted(self.entries())
+            total = sum(size for mtime, size, path in entries)
+            for mtime, size, path in entries:
+                if total <= maxsize:
+                    break
+                _unlink(path)
+                total -= size
+        self.written = 0
+
+    def clear(self):
+        self.evict(0)
+
+    def lock(self):
+        return _FileLock(os.path.join(self.directory, "lock"))
+
+    def __repr__(self):
+        return "DiskCache(%r)" % (self.directory,)
+
+#===------------------------------------------------------------------===
+# Helpers
+#===------------------------------------------------------------------===
+
+class _FileLock(object):
+    """Exclusive lock on a lock file, a no-op without fcntl"""
+
+    def __init__(self, path):
+        self.path = path
+        self.f = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.f = open(self.path, 'a')
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.f is not None:
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_UN)
+            self.f.close()
+            self.f = None
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+def _touch(path):
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass # evicted, or a read-only cache
+
+def _rename(src, dst):
+    try:
+        os.rename(src, dst)
+    except OSError:
+        # Windows does not replace existing files
+        if not os.path.exists(dst):
+            raise
+        _unlink(src)
@@ -6,6 +6,7 @@ import unittest
 
 from pykit import types
 from pykit import ir
+from pykit.utils import ctypes_support
 from pykit.utils.ctypes_support import from_ctypes_type, from_ctypes_value
 
 class MyStruct(ctypes.Structure):
@@ -20,6 +21,12 @@ class TestCTypes(unittest.TestCase):
         self.assertEqual(from_ctypes_type(MyStruct),
                          types.Struct(['x', 'y'], [types.Float32, types.Int64]))
 
+    def test_libc(self):
+        libc = ctypes_support.libc
+        self.assertTrue(ctypes_support.is_ctypes_function(libc.printf))
+        self.assertIs(libc._handle, ctypes_support.get_libc()._handle)
+        self.assertTrue(ctypes_support.is_ctypes_function(libc['abs']))
+
     def test_value(self):
         self.assertEqual(from_ctypes_value(ctypes.c_int32(10)),
                          ir.Const(10, types.Int32))
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from pykit.utils.diskcache import DiskCache
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_get_put(self):
+        cache = DiskCache(self.dir)
+        self.assertEqual(cache.get("ab12"), None)
+        cache.put("ab12", b"data")
+        self.assertIn("ab12", cache)
+        self.assertEqual(cache.get("ab12"), b"data")
+        cache.put("ab12", b"other")
+        self.assertEqual(cache.get("ab12"), b"other")
+
+        # Visible to other caches on the same directory
+        self.assertEqual(DiskCache(self.dir).get("ab12"), b"other")
+
+        del cache["ab12"]
+        self.assertNotIn("ab12", cache)
+        self.assertEqual(os.listdir(os.path.join(self.dir, "ab")), [])
+
+    def test_evict(self):
+        cache = DiskCache(self.dir, maxsize=30)
+        for i, key in enumerate(["aa", "bb", "cc"]):
+            cache.put(key, b"x" * 10)
+            os.utime(cache.path(key), (i, i))
+
+        cache.get("aa") # touch
+        cache.put("dd", b"y" * 10)
+        self.assertEqual(sorted(key for key in ["aa", "bb", "cc", "dd"]
+                                        if key in cache),
+                         ["aa", "cc", "dd"])
+        self.assertTrue(cache.size() <= 30)
+
+        cache.clear()
+        self.assertEqual(cache.size(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,7 +7,8 @@ from distutils.core import setup, Extension
 if sys.version_info[:2] < (2, 6):
     raise Exception('pykit requires Python 2.6 or greater.')
 
-from setup_helpers import find_packages, run_2to3, setup_args
+from setup_helpers import (find_packages, run_2to3, setup_args,
+                           cython_extensions, optional_build_ext)
 
 import pykit
 
@@ -17,6 +18,8 @@ cmdclass = {}
 if sys.version_info[0] >= 3:
     run_2to3(cmdclass)
 
+optional_build_ext(cmdclass)
+
 #===------------------------------------------------------------------===
 # setup
 #===------------------------------------------------------------------===
@@ -44,7 +47,7 @@ setup(
         'pykit': ['*.txt'],
         'pykit.ir': ['*.h'],
         },
-    ext_modules=[],
+    ext_modules=cython_extensions(),
     cmdclass=cmdclass,
     **setup_args
 )
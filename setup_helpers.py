@@ -59,4 +59,62 @@ def run_2to3(cmdclass):
     #         'xrange itertools itertools_imports long types'.split()
     # fixes = ['lib2to3.fixes.fix_' + fix for fix in fixes]
     # build_py.fixer_names = fixes
-    cmdclass["build_py"] = build_py
\ No newline at end of file
+    cmdclass["build_py"] = build_py
+
+#===------------------------------------------------------------------===
+# Optional Cython extensions
+#===------------------------------------------------------------------===
+
+# Modules compiled with Cython in pure Python mode, using the .pxd files next
+# to them. The pure Python modules are used when these are not compiled.
+cython_modules = [
+    'pykit/adt/linkedlist.py',
+    'pykit/ir/value.py',
+]
+
+def cython_extensions():
+    """
+    Return the extensions for the IR core, or [] when Cython is not
+    available or PYKIT_NO_CYTHON is set.
+    """
+    if os.environ.get('PYKIT_NO_CYTHON'):
+        return []
+
+    try:
+        from Cython.Build import cythonize
+    except ImportError:
+        print("Cython not found, using the pure Python IR core")
+        return []
+
+    return cythonize(cython_modules, language_level=sys.version_info[0],
+                     quiet=True)
+
+def optional_build_ext(cmdclass):
+    """
+    Install a build_ext command that skips extensions that fail to compile
+    (e.g. no compiler available), leaving the pure Python modules.
+    """
+    from distutils.command.build_ext import build_ext
+    from distutils.errors import (CCompilerError, DistutilsExecError,
+                                  DistutilsPlatformError)
+
+    errors = (CCompilerError, DistutilsExecError, DistutilsPlatformError)
+
+    def warn(name, e):
+        print("WARNING: could not compile %s (%s), using the pure Python "
+              "module instead" % (name, e))
+
+    class build_optional_ext(build_ext):
+        def run(self):
+            try:
+                build_ext.run(self)
+            except errors as e:
+                warn("extensions", e)
+
+        def build_extension(self, ext):
+            try:
+                build_ext.build_extension(self, ext)
+            except errors as e:
+                warn(ext.name, e)
+
+    cmdclass["build_ext"] = build_optional_ext